@@ -1,280 +1,844 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Blueprint, Flask, Response, g, request, jsonify
+import atexit
 import json
-import re
 import random
 import os
+import time
 
-app = Flask(__name__)
-CORS(app)
+from models.database import OrderStore
+from models.knowledge_store import KnowledgeStore
+from models.session_store import SessionStore, Turn
+from utils.admission import AdmissionController
+from utils.cache import MISSING, ResponseCache, SingleFlight
+from utils.metrics import ChatAnalytics, MetricsRegistry
+from utils.nlp_processor import GREETINGS, is_order_follow_up, normalize_order_number
+from utils.response_generator import (
+    SSE_HEADERS, GeneratorPool, HTTPAnswerGenerator, PreparedResponse, format_sse, response_events
+)
+from utils.startup import Startup
+
+# Import-time set-up is kept cheap; data and indexes load in the warm-up
+# steps registered below (see create_app)
+startup = Startup()
+
+# Chat API routes, registered on the app by create_app
+api = Blueprint('api', __name__)
 
 # Base directory for backend
 base_dir = os.path.dirname(__file__)
 knowledge_base_path = os.path.join(base_dir, 'data', 'knowledge_base.json')
 faqs_path = os.path.join(base_dir, 'data', 'faqs.json')
+config_path = os.path.join(base_dir, '..', 'config', 'config.json')
 
-# Load enhanced datasets using absolute paths
-try:
-    with open(knowledge_base_path, 'r') as f:
-        knowledge_base = json.load(f)
-    print("✅ Knowledge base loaded successfully")
-except FileNotFoundError:
-    print("❌ knowledge_base.json not found")
-    knowledge_base = {}
-
-try:
-    with open(faqs_path, 'r') as f:
-        faqs = json.load(f)
-    print("✅ FAQs loaded successfully")
-except FileNotFoundError:
-    print("❌ faqs.json not found")
-    faqs = {}
-
-# Sample order database (in real app, this would be a real database)
-sample_orders = {
-    "ORD-12345": {
-        "status": "shipped",
-        "product": "TechBook Pro TB2024",
-        "carrier": "UPS",
-        "tracking_number": "1Z999AA10123456784",
-        "estimated_delivery": "2024-01-15",
-        "shipping_address": "123 Main St, City, State 12345"
-    },
-    "ORD-67890": {
-        "status": "delivered", 
-        "product": "SmartPhone X SPX13",
-        "carrier": "FedEx",
-        "tracking_number": "789012345678",
-        "delivery_date": "2024-01-10",
-        "shipping_address": "456 Oak Ave, City, State 12345"
-    },
-    "ORD-11111": {
-        "status": "processing",
-        "product": "Wireless Earbuds WE300",
-        "carrier": "USPS",
-        "estimated_delivery": "2024-01-18",
-        "shipping_address": "789 Pine Rd, City, State 12345"
-    }
-}
+with startup.phase('config'):
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print("⚠️  config.json not found or invalid, using defaults")
+        config = {}
+
+faq_config = config.get('faq', {})
+
+# Available FAQ matchers: the keyword index, the TF-IDF retriever and
+# approximate nearest-neighbour search over n-gram embeddings
+FAQ_MATCHERS = ('keyword', 'tfidf', 'semantic')
+default_matcher = faq_config.get('matcher', 'keyword')
+# Edits tolerated when correcting misspelt words for the keyword matcher (0 disables)
+max_edit_distance = faq_config.get('max_edit_distance', 2)
+
+# Category routing: the intent classifier picks the categories worth
+# scoring once the corpus is big enough for a full scan to cost more
+routing_config = config.get('routing', {})
+routing_enabled = routing_config.get('enabled', True)
+ROUTING_MIN_FAQS = routing_config.get('min_faqs', 2000)
+ROUTING_MAX_CATEGORIES = routing_config.get('max_categories', 2)
+ROUTING_MIN_CONFIDENCE = routing_config.get('min_confidence', 0.8)
+
+# Largest number of messages accepted by /api/chat/batch
+max_batch_size = config.get('batch', {}).get('max_messages', 1000)
+
+# Default AI responses for unrecognized messages
+GENERAL_RESPONSES = [
+    "I understand you're asking about something. I can help you with order status, returns, technical issues, or general questions. Could you provide more details?",
+    "I'd love to help! I'm best at assisting with order tracking, returns, technical problems, or product questions. What specific issue can I help with?",
+    "I'm here to help with customer support questions. Could you tell me more about what you need assistance with?"
+]
+
+# FAQ match results for recently seen messages (order answers are not; see order_cache)
+cache_config = config.get('cache', {})
+response_cache = ResponseCache(
+    max_size=cache_config.get('max_size', 4096) if cache_config.get('enabled', True) else 0,
+    ttl=cache_config.get('ttl_seconds', 300)
+)
+
+# Live conversation counters behind /api/analytics
+analytics = ChatAnalytics()
+
+# Per-stage and per-route latency histograms behind /metrics
+metrics_config = config.get('metrics', {})
+metrics = MetricsRegistry(enabled=metrics_config.get('enabled', True))
+metrics.register_collector(analytics.collect)
+
+@metrics.register_collector
+def cache_metrics():
+    stats = response_cache.stats()
+    return [
+        ('response_cache_hits_total', 'counter', 'FAQ response cache hits', [({}, stats['hits'])]),
+        ('response_cache_misses_total', 'counter', 'FAQ response cache misses', [({}, stats['misses'])]),
+        ('response_cache_size', 'gauge', 'Entries in the FAQ response cache', [({}, stats['size'])])
+    ]
+
+# Answers for messages nothing else matched come from an LLM backend when
+# one is configured, on a bounded pool with a timeout so a slow backend
+# falls back to the canned replies instead of holding request threads
+generator_config = config.get('generator', {})
+generator_url = os.environ.get('LLM_API_URL') or generator_config.get('url')
+generator_timeout = generator_config.get('timeout_ms', 2000) / 1000
+hedge_after_ms = generator_config.get('hedge_after_ms')
+answer_pool = GeneratorPool(
+    HTTPAnswerGenerator(
+        generator_url,
+        model=os.environ.get('LLM_MODEL') or generator_config.get('model', 'gpt-3.5-turbo'),
+        api_key=os.environ.get('OPENAI_API_KEY'),
+        timeout=generator_timeout
+    ),
+    workers=generator_config.get('workers', 4),
+    max_pending=generator_config.get('max_pending', 16),
+    timeout=generator_timeout,
+    hedge_after=hedge_after_ms / 1000 if hedge_after_ms else None,
+    cache_size=generator_config.get('cache_size', 1024),
+    cache_ttl=generator_config.get('cache_ttl_seconds', 3600)
+) if generator_config.get('enabled', True) and generator_url else None
+
+if answer_pool is not None:
+    metrics.register_collector(answer_pool.collect)
+    atexit.register(answer_pool.close)
+
+# Per-client rate limits and an in-flight cap on the chat and order routes;
+# refused requests get 429/503 with Retry-After instead of queueing.
+# APP_ADMISSION=off (or on) overrides the config, e.g. for load tests
+admission_config = config.get('admission', {})
+admission_enabled = os.environ.get(
+    'APP_ADMISSION', 'on' if admission_config.get('enabled', True) else 'off').lower() != 'off'
+admission = AdmissionController(
+    rate=admission_config.get('rate_per_second', 20),
+    burst=admission_config.get('burst', 100),
+    max_in_flight=admission_config.get('max_in_flight', 64),
+    concurrency=admission_config.get('concurrency', 8),
+    latency_budget=admission_config.get('latency_budget_ms', 500) / 1000,
+    max_clients=admission_config.get('max_clients', 10000)
+) if admission_enabled else None
+
+# Path prefixes behind admission control; /health, /ready and /metrics never are
+ADMISSION_PREFIXES = ('/api/chat', '/api/order')
+# Header naming the real client behind a trusted proxy (e.g. X-Forwarded-For);
+# must be set behind a reverse proxy, or every client shares the proxy's bucket.
+# Matched case-insensitively; the ASGI app passes lower-cased header names
+admission_client_header = admission_config.get('client_header')
+
+if admission is not None:
+    metrics.register_collector(admission.collect)
+
+def admission_client(remote_addr, headers):
+    """Rate-limit key for a request: the first proxy-reported address, else the peer"""
+    if admission_client_header:
+        forwarded = headers.get(admission_client_header.lower(), '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return remote_addr or 'unknown'
+
+def admit_request():
+    """Refuse chat/order requests over a client's rate or the server's capacity"""
+    # CORS preflights are answered without spending a client's tokens
+    if admission is None or request.method == 'OPTIONS' or not request.path.startswith(ADMISSION_PREFIXES):
+        return None
+    rejection = admission.admit(admission_client(request.remote_addr, request.headers))
+    if rejection is not None:
+        return jsonify(rejection.body()), rejection.status, {'Retry-After': str(rejection.retry_after)}
+    g.admitted_at = time.perf_counter()
+    return None
+
+def release_request(exc=None):
+    admitted_at = g.pop('admitted_at', None)
+    if admitted_at is not None:
+        admission.release(time.perf_counter() - admitted_at)
+
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+def observe_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+# Load enhanced datasets using absolute paths. The store swaps in a fully
+# indexed snapshot whenever the files change, so requests always see
+# either the old or the new data.
+artifact_config = config.get('artifact', {})
+knowledge_store = KnowledgeStore(
+    knowledge_base_path,
+    faqs_path,
+    retriever_min_score=faq_config.get('tfidf_min_score', 0.3),
+    artifact_path=os.path.join(base_dir, artifact_config.get('path', 'data/faq_index.bin'))
+    if artifact_config.get('enabled', True) else None,
+    build_artifact=artifact_config.get('build', True),
+    semantic_min_similarity=faq_config.get('semantic_min_similarity', 0.3),
+    intent_model_path=os.path.join(base_dir, routing_config.get('model_path', 'data/intent_model.npz'))
+    if routing_enabled else None,
+    intent_min_faqs=ROUTING_MIN_FAQS
+)
+knowledge_store.on_swap(lambda snapshot: response_cache.invalidate())
+
+@startup.step('knowledge')
+def load_knowledge():
+    knowledge_store.load()
+    reload_config = config.get('reload', {})
+    if reload_config.get('watch', False):
+        knowledge_store.start_watcher(reload_config.get('interval_seconds', 5))
+
+def __getattr__(name):
+    """Expose the current snapshot's data as module attributes (faqs, knowledge_base, faq_index)"""
+    snapshot = knowledge_store.snapshot
+    if name in ('faqs', 'knowledge_base'):
+        return getattr(snapshot, name)
+    if name == 'faq_index':
+        return snapshot.index
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Order database (SQLite, created and seeded with the sample orders on first run)
+database_config = config.get('database', {})
+orders_db_path = os.environ.get('ORDERS_DB_PATH') or os.path.join(
+    base_dir, database_config.get('orders_path', '../database/orders.db'))
+order_store = OrderStore(orders_db_path, pool_size=database_config.get('pool_size', 8))
+startup.step('orders')(order_store.initialize)
+
+# Lookups of one order number share a single in-flight query, and results
+# (misses included) are reused for a few seconds, so a burst of customers
+# asking about the same orders costs one query per order, not per request
+order_cache = ResponseCache(
+    max_size=database_config.get('order_cache_size', 10000),
+    ttl=database_config.get('order_cache_ttl_seconds', 2)
+)
+order_flight = SingleFlight()
+
+@metrics.register_collector
+def order_lookup_metrics():
+    cache_stats = order_cache.stats()
+    flight_stats = order_flight.stats()
+    return [
+        ('order_cache_hits_total', 'counter', 'Order lookups answered from the cache', [({}, cache_stats['hits'])]),
+        ('order_queries_total', 'counter', 'Order lookups that queried the database', [({}, flight_stats['calls'])]),
+        ('order_queries_shared_total', 'counter', 'Order lookups that joined an in-flight query',
+         [({}, flight_stats['shared'])])
+    ]
+
+# Recent turns per chat session, kept in memory up to max_active sessions;
+# idle and least recently used sessions are spilled to the same database
+# and deleted once untouched for retention_seconds
+session_config = config.get('sessions', {})
+session_store = SessionStore(
+    orders_db_path,
+    max_active=session_config.get('max_active', 100000),
+    max_turns=session_config.get('max_turns', 8),
+    ttl=session_config.get('ttl_seconds', 1800),
+    retention=session_config.get('retention_seconds', 86400)
+) if session_config.get('enabled', True) else None
+# Session ids are chosen by the client, so reading history back is opt-in
+SESSION_HISTORY_ENABLED = session_config.get('history_endpoint', False)
+
+if session_store is not None:
+    @startup.step('sessions')
+    def load_sessions():
+        session_store.initialize()
+        interval = session_config.get('maintenance_interval_seconds', 60)
+        if interval:
+            session_store.start_maintenance(interval)
+
+# Longest accepted session id
+MAX_SESSION_ID_LENGTH = 128
+
+if session_store is not None:
+    @metrics.register_collector
+    def session_metrics():
+        stats = session_store.stats()
+        return [
+            ('chat_sessions_active', 'gauge', 'Chat sessions held in memory', [({}, stats['active'])]),
+            ('chat_sessions_spilled_total', 'counter', 'Chat sessions written to the database', [({}, stats['spilled'])]),
+            ('chat_sessions_restored_total', 'counter', 'Chat sessions restored from the database', [({}, stats['restored'])]),
+            ('chat_sessions_purged_total', 'counter', 'Spilled chat sessions deleted after retention', [({}, stats['purged'])])
+        ]
+
+def get_faq_retriever(snapshot=None):
+    """Return the TF-IDF retriever for the current data, building it on first use"""
+    snapshot = snapshot or knowledge_store.snapshot
+    return snapshot.retriever(knowledge_store.retriever_min_score)
+
+def get_semantic_matcher(snapshot=None):
+    """Return the embedding matcher for the current data, building it on first use"""
+    snapshot = snapshot or knowledge_store.snapshot
+    return snapshot.semantic(knowledge_store.semantic_min_similarity)
 
-def find_faq_answer(message):
+@startup.step('matchers')
+def warm_matchers():
+    """Build the default matcher's model now rather than on the first chat"""
+    snapshot = knowledge_store.snapshot
+    if default_matcher == 'tfidf':
+        get_faq_retriever(snapshot)
+    elif default_matcher == 'semantic':
+        get_semantic_matcher(snapshot)
+    elif max_edit_distance > 0:
+        snapshot.index.corrector(max_edit_distance)
+    if routing_enabled and len(snapshot.index) >= ROUTING_MIN_FAQS:
+        snapshot.intent_classifier()
+
+def find_faq_answer(message, matcher=None):
     """Find the best FAQ match for a user message"""
-    message_lower = message.lower().strip()
+    return find_faq_answers([message], matcher)[0]
+
+def find_faq_answers(messages, matcher=None):
+    """Find the best FAQ match for each message in a batch"""
+    return [entry[1] if entry else None for entry in match_faqs(messages, matcher)]
+
+def route_messages(snapshot, texts):
+    """Shards to score for each message, None meaning every FAQ"""
+    if not routing_enabled or len(snapshot.index) < ROUTING_MIN_FAQS:
+        return [None] * len(texts)
+    return [snapshot.route(text, ROUTING_MAX_CATEGORIES, ROUTING_MIN_CONFIDENCE) for text in texts]
+
+def match_faqs(messages, matcher=None):
+    """Best (category, faq) entry or None for each message in a batch"""
+    if matcher not in FAQ_MATCHERS:
+        matcher = default_matcher
     
-    # Don't match very short or generic messages
-    if len(message_lower) < 3 or message_lower in ['hello', 'hi', 'hey']:
-        return None
+    # Score each distinct normalized message once
+    unique = {}
+    for message in messages:
+        message_lower = message.lower().strip()
+        if len(message_lower) >= 3 and message_lower not in GREETINGS:
+            unique.setdefault(message_lower, None)
     
-    best_match = None
-    highest_score = 0
+    # Serve repeated phrasings from the cache, score the rest. The generation
+    # is read before the snapshot so results from replaced data are not stored.
+    generation = response_cache.generation
+    snapshot = knowledge_store.snapshot
+    texts = []
+    for text in unique:
+        cached = response_cache.get((matcher, text))
+        if cached is MISSING:
+            texts.append(text)
+        else:
+            unique[text] = cached
     
-    for category, questions in faqs.items():
-        for faq in questions:
-            score = 0
-            
-            # Check for exact phrase matches (higher weight)
-            question_words = faq['question'].lower().split()
-            if len(question_words) > 3:
-                # Check if significant portion of question is in message
-                matching_words = sum(1 for word in question_words[:5] if word in message_lower)
-                if matching_words >= 2:
-                    score += 3
-            
-            # Check keyword matches
-            keyword_matches = 0
-            for keyword in faq.get('keywords', []):
-                if keyword in message_lower:
-                    keyword_matches += 1
-                    score += 1
-            
-            # Boost score if we have multiple keyword matches
-            if keyword_matches >= 2:
-                score += 2
-            
-            # Penalize if message is very different from question
-            question_similarity = len(set(message_lower.split()) & set(faq['question'].lower().split()))
-            if question_similarity < 1:
-                score -= 2
-            
-            if score > highest_score and score >= 2:  # Minimum threshold
-                highest_score = score
-                best_match = faq
+    if texts:
+        if matcher == 'semantic':
+            matches = get_semantic_matcher(snapshot).best_many(texts)
+        else:
+            routes = route_messages(snapshot, texts)
+            if matcher == 'tfidf':
+                # Messages routed to the same shards are scored together
+                groups = {}
+                for i, route in enumerate(routes):
+                    groups.setdefault(None if route is None else tuple(route), []).append(i)
+                matches = [None] * len(texts)
+                for route, members in groups.items():
+                    found = get_faq_retriever(snapshot).best_many([texts[i] for i in members], route)
+                    for i, match in zip(members, found):
+                        matches[i] = match
+            else:
+                matches = [snapshot.index.match(text, max_edit_distance, route) for text, route in zip(texts, routes)]
+        for text, match in zip(texts, matches):
+            unique[text] = match
+            response_cache.set((matcher, text), unique[text], generation)
     
-    return best_match
+    return [unique.get(message.lower().strip()) for message in messages]
 
 def get_order_status(order_number):
-    """Get order status from database"""
-    if not order_number:
+    """Get order status from database, through the short-lived order cache"""
+    clean = normalize_order_number(order_number)
+    if not clean:
         return None
-        
-    # Clean and normalize order number
-    clean_order = order_number.upper().strip()
-    
-    # Remove common prefixes and clean up
-    clean_order = re.sub(r'^(ORDER|ORD|#)\s*', '', clean_order)
-    clean_order = clean_order.replace(' ', '')
-    
-    # Ensure it has the ORD- prefix
-    if not clean_order.startswith('ORD-'):
-        # If it's just numbers, add ORD- prefix
-        if clean_order.isdigit():
-            clean_order = f"ORD-{clean_order}"
-        else:
-            # If it has numbers but no prefix, try to format it
-            match = re.search(r'(\d+)', clean_order)
-            if match:
-                clean_order = f"ORD-{match.group(1)}"
-            else:
-                # If no numbers found, it's invalid
-                return None
-    
-    return sample_orders.get(clean_order, None)
+    order_info = order_cache.get(clean)
+    if order_info is MISSING:
+        generation = order_cache.generation
+        order_info = order_flight.do(clean, order_store.get, clean)
+        order_cache.set(clean, order_info, generation)
+    return order_info
+
+def get_order_statuses(order_numbers):
+    """Get the status of many orders with one batched query, keyed by raw input"""
+    normalized = {number: normalize_order_number(number) for number in order_numbers}
+    found = order_store.get_many(normalized.values())
+    return {number: found.get(clean) for number, clean in normalized.items()}
 
 # ========== ROUTES ==========
 
-@app.route('/')
+def json_response(response, status=200):
+    """JSON response for a dict, reusing the encoded body of a PreparedResponse"""
+    if isinstance(response, PreparedResponse):
+        return Response(response.body, status=status, mimetype='application/json')
+    result = jsonify(response)
+    result.status_code = status
+    return result
+
+# Static bodies are encoded once at startup
+HOME_RESPONSE = PreparedResponse({
+    'message': '🤖 Customer Support Bot API is running!',
+    'status': 'active',
+    'endpoints': {
+        'test': '/api/test (GET)',
+        'chat': '/api/chat (POST)',
+        'chat_batch': '/api/chat/batch (POST)',
+        'chat_stream': '/api/chat/stream (POST, Server-Sent Events)',
+        'analytics': '/api/analytics (GET)',
+        'order': '/api/order/<order_number> (GET)',
+        'orders_lookup': '/api/orders/lookup (POST)',
+        'session': '/api/session/<session_id> (GET)'
+    },
+    'example_usage': {
+        'chat': 'POST /api/chat with {"message": "your question"}',
+        'test_order': 'GET /api/order/ORD-12345'
+    }
+})
+
+TEST_RESPONSE = PreparedResponse({
+    'status': 'success',
+    'message': '✅ Backend API is working correctly!',
+    'timestamp': '2024-01-10 01:29:22'
+})
+
+@api.route('/')
 def home():
     """Root endpoint - shows API is working"""
-    return jsonify({
-        'message': '🤖 Customer Support Bot API is running!',
-        'status': 'active',
-        'endpoints': {
-            'test': '/api/test (GET)',
-            'chat': '/api/chat (POST)',
-            'analytics': '/api/analytics (GET)',
-            'order': '/api/order/<order_number> (GET)'
-        },
-        'example_usage': {
-            'chat': 'POST /api/chat with {"message": "your question"}',
-            'test_order': 'GET /api/order/ORD-12345'
-        }
-    })
+    return json_response(HOME_RESPONSE)
 
-@app.route('/api/test', methods=['GET'])
+@api.route('/api/test', methods=['GET'])
 def test_endpoint():
     """Test endpoint to verify API is working"""
-    return jsonify({
-        'status': 'success',
-        'message': '✅ Backend API is working correctly!',
-        'timestamp': '2024-01-10 01:29:22'
-    })
+    return json_response(TEST_RESPONSE)
 
-@app.route('/api/chat', methods=['POST', 'GET'])
-def chat():
-    """Main chat endpoint - handles user messages"""
-    if request.method == 'GET':
-        return jsonify({
-            'message': 'Use POST method to send chat messages',
-            'example': 'POST /api/chat with {"message": "Hello"}'
-        })
+def build_order_response(order_number, order_info):
+    """Build the chat response for a found order"""
+    if order_info['status'] == 'shipped':
+        response_text = f"Order {order_number} is shipped via {order_info['carrier']}. "
+        response_text += f"Tracking: {order_info['tracking_number']}. "
+        response_text += f"Estimated delivery: {order_info['estimated_delivery']}."
+    elif order_info['status'] == 'delivered':
+        response_text = f"Order {order_number} was delivered on {order_info['delivery_date']}. "
+        response_text += f"Product: {order_info['product']}"
+    else:
+        response_text = f"Order {order_number} is {order_info['status']}. "
+        response_text += f"Estimated delivery: {order_info['estimated_delivery']}."
     
-    data = request.get_json()
+    return {
+        'response': response_text,
+        'intent': 'order_status',
+        'confidence': 90,
+        'order_info': order_info
+    }
+
+def build_faq_response(faq_match):
+    """The chat response for a matched FAQ, encoded once per data snapshot"""
+    return knowledge_store.snapshot.faq_response(faq_match)
+
+def general_response(text=None):
+    """The chat response for a generated answer, or a canned reply without one"""
+    if text is None:
+        return {
+            'response': random.choice(GENERAL_RESPONSES),
+            'intent': 'general',
+            'confidence': 50
+        }
+    return {
+        'response': text,
+        'intent': 'general',
+        'confidence': 60,
+        'source': 'generator'
+    }
+
+def build_general_response(message=None):
+    """Build the fallback chat response for unrecognized messages"""
+    if answer_pool is None or not message:
+        return general_response()
+    return general_response(answer_pool.answer(message))
+
+# Metadata for an unrecognized message whose text is generated while streaming
+GENERAL_PENDING = {
+    'intent': 'general',
+    'confidence': 50
+}
+
+def general_answer_chunks(user_message, outcome):
+    """Pieces of the answer to an unrecognized message, as the generator produces them.
+
+    Falls back to a canned reply when there is no generator or it cannot
+    answer in time; outcome gets source/confidence when text was generated.
+    """
+    pieces = answer_pool.stream(user_message) if answer_pool is not None else None
+    if pieces is None:
+        yield random.choice(GENERAL_RESPONSES)
+        return
+    outcome.update(source='generator', confidence=60)
+    yield from pieces
+
+EMPTY_RESPONSE = {
+    'response': 'Please type a message so I can help you.',
+    'intent': 'empty',
+    'confidence': 0
+}
+
+def answer_with_context(user_message, matcher=None, context=None, generate=True):
+    """Answer one message given the previous turn; returns (response, faq_category, order_number).
+
+    With generate=False an unrecognized message gets GENERAL_PENDING, with
+    no text, so a stream can send it before general_answer_chunks runs.
+    """
+    # Extract order numbers and other entities in one pass over the message
+    with metrics.stage('entity_extraction'):
+        entities = knowledge_store.snapshot.extractor.extract(user_message)
+    
+    # Follow-ups like "and when will it arrive?" refer to the last turn's order
+    order_number = entities.order_number
+    if not order_number and context is not None and context.order_number:
+        if is_order_follow_up(entities.normalized):
+            order_number = context.order_number
+    
+    # Check for order status query first (before FAQ)
+    if order_number:
+        with metrics.stage('order_lookup'):
+            order_info = get_order_status(order_number)
+        if order_info:
+            return build_order_response(order_number, order_info), None, normalize_order_number(order_number)
+    
+    # Try to find FAQ match (optionally with a specific matcher)
+    with metrics.stage('faq_match'):
+        faq_entry = match_faqs([entities.normalized], matcher)[0]
+    if faq_entry:
+        return build_faq_response(faq_entry[1]), faq_entry[0], None
+    
+    # Generated (or canned) answer for unrecognized messages
+    if not generate:
+        return GENERAL_PENDING, None, None
+    with metrics.stage('answer_generation'):
+        response = build_general_response(user_message)
+    return response, None, None
+
+def answer_message(user_message, matcher=None, session_id=None, generate=True):
+    """Answer one non-empty chat message; returns (response, faq_category)"""
+    if session_id is None or session_store is None:
+        response, faq_category, _ = answer_with_context(user_message, matcher, generate=generate)
+        return response, faq_category
+    
+    session = session_store.get(session_id, create=True)
+    response, faq_category, order_number = answer_with_context(
+        user_message, matcher, session.last(), generate)
+    session_store.record(session_id, Turn(
+        user_message, response['intent'], order_number, faq_category, response.get('faq_question')))
+    return dict(response, session_id=session_id), faq_category
+
+CHAT_USAGE = {
+    'message': 'Use POST method to send chat messages',
+    'example': 'POST /api/chat with {"message": "Hello"}'
+}
+
+def handle_chat_request(data, generate=True):
+    """Answer a /api/chat JSON body; returns (response, faq_category)"""
     if not data:
-        return jsonify({
+        return {
             'response': 'Please provide JSON data with a message',
             'intent': 'error',
             'confidence': 0
-        })
+        }, None
     
     user_message = data.get('message', '').strip()
     
     # Don't process empty messages
     if not user_message:
+        return EMPTY_RESPONSE, None
+    
+    # Conversations that pass a session_id get contextual follow-ups
+    session_id = data.get('session_id')
+    if not isinstance(session_id, str) or not 0 < len(session_id) <= MAX_SESSION_ID_LENGTH:
+        session_id = None
+    
+    return answer_message(user_message, data.get('matcher'), session_id, generate)
+
+def chat_stream_events(data):
+    """Answer a /api/chat/stream request; returns (response, faq_category, events).
+
+    Matching runs here, so the meta event is ready at once; for an
+    unrecognized message the text is then generated as events are consumed.
+    """
+    response, faq_category = handle_chat_request(data, generate=False)
+    if 'response' in response:
+        return response, faq_category, response_events(response)
+    outcome = {}
+    chunks = general_answer_chunks(data['message'].strip(), outcome)
+    return response, faq_category, response_events(response, chunks, outcome)
+
+@api.route('/api/chat', methods=['POST', 'GET'])
+def chat():
+    """Main chat endpoint - handles user messages"""
+    if request.method == 'GET':
+        return jsonify(CHAT_USAGE)
+    
+    start = time.perf_counter()
+    with metrics.stage('parse_json'):
+        data = request.get_json()
+    response, faq_category = handle_chat_request(data)
+    analytics.record(response['intent'], time.perf_counter() - start, faq_category)
+    with metrics.stage('serialize'):
+        return json_response(response)
+
+@api.route('/api/chat/stream', methods=['POST', 'GET'])
+def chat_stream():
+    """Streaming chat endpoint - sends intent metadata, then the response text as SSE"""
+    start = time.perf_counter()
+    if request.method == 'GET':
+        # EventSource clients can only issue GET requests
+        data = {'message': request.args.get('message', ''), 'matcher': request.args.get('matcher')}
+    else:
+        data = request.get_json(silent=True)
+    response, faq_category, events = chat_stream_events(data if isinstance(data, dict) else None)
+    analytics.record(response['intent'], time.perf_counter() - start, faq_category)
+    events = (format_sse(event, payload) for event, payload in events)
+    return Response(events, mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@api.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Batch chat endpoint - handles many messages in one request"""
+    data = request.get_json(silent=True)
+    messages = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(messages, list):
         return jsonify({
-            'response': 'Please type a message so I can help you.',
-            'intent': 'empty',
-            'confidence': 0
-        })
+            'error': 'Please provide JSON data with a "messages" array',
+            'example': 'POST /api/chat/batch with {"messages": ["Hello", "Where is my order ORD-12345?"]}'
+        }), 400
+    if len(messages) > max_batch_size:
+        return jsonify({
+            'error': f'Too many messages in one batch (max {max_batch_size})'
+        }), 413
     
-    # Check for order status query first (before FAQ)
-    order_match = re.search(r'(?:order|ord)\s*(?:number)?\s*[#]?\s*([a-z0-9]{3,}-?[a-z0-9]+)', user_message, re.IGNORECASE)
-    if order_match:
-        order_number = order_match.group(1)
-        order_info = get_order_status(order_number)
+    results = [None] * len(messages)
+    pending = []
+    order_numbers = {}
+    extractor = knowledge_store.snapshot.extractor
+    
+    # Pass 1: empty messages and entity extraction for the whole batch
+    for i, message in enumerate(messages):
+        user_message = message.strip() if isinstance(message, str) else ''
+        if not user_message:
+            results[i] = EMPTY_RESPONSE
+            continue
+        entities = extractor.extract(user_message)
+        if entities.order_number:
+            order_numbers[i] = entities.order_number
+        pending.append((i, entities.normalized))
+    
+    # Pass 2: every distinct order number in one batched query
+    orders = get_order_statuses(set(order_numbers.values()))
+    
+    faq_pending = []
+    for i, user_message in pending:
+        order_number = order_numbers.get(i)
+        order_info = orders.get(order_number) if order_number else None
         if order_info:
-            if order_info['status'] == 'shipped':
-                response_text = f"Order {order_number} is shipped via {order_info['carrier']}. "
-                response_text += f"Tracking: {order_info['tracking_number']}. "
-                response_text += f"Estimated delivery: {order_info['estimated_delivery']}."
-            elif order_info['status'] == 'delivered':
-                response_text = f"Order {order_number} was delivered on {order_info['delivery_date']}. "
-                response_text += f"Product: {order_info['product']}"
-            else:
-                response_text = f"Order {order_number} is {order_info['status']}. "
-                response_text += f"Estimated delivery: {order_info['estimated_delivery']}."
-            
-            response = {
-                'response': response_text,
-                'intent': 'order_status',
-                'confidence': 90,
-                'order_info': order_info
-            }
-            return jsonify(response)
+            results[i] = build_order_response(order_number, order_info)
+        else:
+            faq_pending.append((i, user_message))
     
-    # Try to find FAQ match
-    faq_match = find_faq_answer(user_message)
-    if faq_match:
-        response = {
-            'response': faq_match['answer'],
-            'intent': 'faq',
-            'confidence': 85,
-            'source': 'faq_database',
-            'faq_question': faq_match['question']
-        }
-        return jsonify(response)
+    # Pass 3: FAQ scoring for everything left, as one batch
+    faq_categories = {}
+    general_pending = []
+    faq_entries = match_faqs([user_message for _, user_message in faq_pending], data.get('matcher'))
+    for (i, user_message), faq_entry in zip(faq_pending, faq_entries):
+        if faq_entry:
+            results[i] = build_faq_response(faq_entry[1])
+            faq_categories[i] = faq_entry[0]
+        else:
+            general_pending.append((i, user_message))
     
-    # Default AI response for unrecognized messages
-    responses = [
-        "I understand you're asking about something. I can help you with order status, returns, technical issues, or general questions. Could you provide more details?",
-        "I'd love to help! I'm best at assisting with order tracking, returns, technical problems, or product questions. What specific issue can I help with?",
-        "I'm here to help with customer support questions. Could you tell me more about what you need assistance with?"
-    ]
+    # Pass 4: generated answers for the rest, waiting on one shared deadline
+    if answer_pool is not None:
+        answers = answer_pool.answer_many([user_message for _, user_message in general_pending])
+    else:
+        answers = [None] * len(general_pending)
+    for (i, _), text in zip(general_pending, answers):
+        results[i] = general_response(text)
     
-    response = {
-        'response': random.choice(responses),
-        'intent': 'general',
-        'confidence': 50
-    }
+    for i, result in enumerate(results):
+        analytics.record(result['intent'], faq_category=faq_categories.get(i))
     
-    return jsonify(response)
+    return jsonify({'results': results, 'count': len(results)})
 
-@app.route('/api/analytics', methods=['GET'])
+@api.route('/api/analytics', methods=['GET'])
 def get_analytics():
     """Analytics endpoint - returns bot usage statistics"""
-    return jsonify({
-        'total_conversations': 1247,
-        'resolution_rate': 89,
-        'escalations': 137,
-        'satisfaction': 4.7,
-        'average_response_time': '2.3s',
-        'common_intents': {
-            'order_status': 45,
-            'technical_support': 30,
-            'refund_returns': 15,
-            'billing': 10
-        }
-    })
+    return jsonify(analytics.report(response_cache.stats()))
 
-@app.route('/api/order/<order_number>', methods=['GET'])
-def get_order(order_number):
-    """Order lookup endpoint - returns order status"""
+def order_lookup_response(order_number):
+    """Body and status code for /api/order/<order_number>"""
     order_info = get_order_status(order_number)
     if order_info:
-        return jsonify({
+        return {
             'found': True,
             'order_number': order_number,
             'details': order_info
-        })
+        }, 200
     else:
-        return jsonify({
+        return {
             'found': False,
             'message': 'Order not found. Try ORD-12345, ORD-67890, or ORD-11111'
-        }), 404
+        }, 404
+
+@api.route('/api/order/<order_number>', methods=['GET'])
+def get_order(order_number):
+    """Order lookup endpoint - returns order status"""
+    body, status = order_lookup_response(order_number)
+    return jsonify(body), status
+
+def session_response(session_id):
+    """Body and status code for /api/session/<session_id>"""
+    if not SESSION_HISTORY_ENABLED:
+        return {'found': False, 'message': 'Session history is not enabled'}, 404
+    session = session_store.get(session_id) if session_store is not None else None
+    if session is None:
+        return {'found': False, 'message': 'Session not found'}, 404
+    return {
+        'found': True,
+        'session_id': session_id,
+        'turns': [turn.to_dict() for turn in session.history()]
+    }, 200
 
-# Health check endpoint
-@app.route('/health', methods=['GET'])
+@api.route('/api/session/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Session endpoint - returns the recent turns of a conversation"""
+    body, status = session_response(session_id)
+    return jsonify(body), status
+
+@api.route('/api/orders/lookup', methods=['POST'])
+def lookup_orders():
+    """Bulk order lookup endpoint - resolves many order numbers at once"""
+    data = request.get_json(silent=True)
+    orders = data.get('orders') if isinstance(data, dict) else None
+    if not isinstance(orders, list):
+        return jsonify({
+            'error': 'Please provide JSON data with an "orders" array',
+            'example': 'POST /api/orders/lookup with {"orders": ["ORD-12345", "#67890"]}'
+        }), 400
+    if len(orders) > max_batch_size:
+        return jsonify({
+            'error': f'Too many orders in one lookup (max {max_batch_size})'
+        }), 413
+    
+    raw_orders = [order if isinstance(order, str) else '' for order in orders]
+    normalized = [normalize_order_number(order) for order in raw_orders]
+    found = order_store.get_many(normalized)
+    
+    results = []
+    for raw, clean in zip(raw_orders, normalized):
+        details = found.get(clean)
+        result = {'input': raw, 'order_number': clean, 'found': details is not None}
+        if details is not None:
+            result['details'] = details
+        results.append(result)
+    
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'found': sum(1 for result in results if result['found'])
+    })
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of latency histograms and counters"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+HEALTH_RESPONSE = PreparedResponse({'status': 'healthy', 'service': 'customer-support-bot'})
+
+# Health check endpoint: answers as soon as the process is up
+@api.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'customer-support-bot'})
+    return json_response(HEALTH_RESPONSE)
+
+def readiness_response():
+    """Body and status code for /ready: 200 once data and indexes are loaded"""
+    report = startup.report()
+    report['faq_count'] = len(knowledge_store.snapshot.index)
+    return report, 200 if report['ready'] else 503
+
+@api.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness endpoint - flips to 200 when warm-up has finished"""
+    body, status = readiness_response()
+    return jsonify(body), status
+
+# Routes that never wait for warm-up
+READINESS_EXEMPT = ('/health', '/ready', '/metrics')
+
+startup_config = config.get('startup', {})
+# Longest a request waits for a warm-up in progress before getting a 503
+WARMUP_WAIT_SECONDS = startup_config.get('wait_seconds', 10)
+
+NOT_READY_RESPONSE = {'error': 'Service is starting up'}
+
+def ensure_ready():
+    """Wait for warm-up (running it here in lazy mode); False if it is still going or failed"""
+    if startup.ready.is_set():
+        return True
+    if startup.error is not None:
+        return False
+    try:
+        startup.warm_up()
+    except Exception:
+        return False
+    return startup.wait(WARMUP_WAIT_SECONDS)
+
+def wait_until_ready():
+    """Hold requests until warm-up has finished"""
+    if request.path in READINESS_EXEMPT or ensure_ready():
+        return None
+    return jsonify(NOT_READY_RESPONSE), 503, {'Retry-After': '1'}
+
+def create_app(warmup=None):
+    """Create the Flask app.
+
+    warmup is 'sync' (load data and indexes before returning), 'background'
+    (return at once and load on a thread; /health answers meanwhile and
+    /ready reports 503) or 'lazy' (load on the first request that needs
+    it). Defaults to startup.warmup in config.json, else 'sync'.
+    """
+    with startup.phase('app'):
+        from flask_cors import CORS
+        from routes.admin import admin_bp
+        
+        flask_app = Flask(__name__)
+        CORS(flask_app)
+        flask_app.register_blueprint(api)
+        flask_app.register_blueprint(admin_bp)
+        flask_app.extensions['knowledge_store'] = knowledge_store
+        flask_app.extensions['startup'] = startup
+        flask_app.before_request(wait_until_ready)
+        if metrics.enabled:
+            flask_app.before_request(start_request_timer)
+            flask_app.after_request(observe_request_time)
+        flask_app.before_request(admit_request)
+        flask_app.teardown_request(release_request)
+    
+    mode = warmup or startup_config.get('warmup', 'sync')
+    if mode == 'sync':
+        startup.warm_up()
+    elif mode == 'background':
+        startup.start()
+    return flask_app
+
+# Importing the module warms up synchronously unless APP_WARMUP or
+# startup.warmup selects 'background' or 'lazy'
+app = create_app(os.environ.get('APP_WARMUP'))
 
 if __name__ == '__main__':
     print("🚀 Customer Support Bot Backend Starting...")
@@ -0,0 +1,269 @@
+"""Async (ASGI) serving mode for the chat API.
+
+Serves the same JSON contract as the Flask app for /, /api/test,
+/api/chat, /api/chat/stream, /api/order/<order_number>,
+/api/session/<session_id>, /api/analytics, /metrics, /health and
+/ready, but an in-flight request only costs a coroutine. Matching and
+order lookups run on a bounded thread pool so the event loop stays free
+to accept connections while they work.
+
+    pip install uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import (
+    ADMISSION_PREFIXES, CHAT_USAGE, HEALTH_RESPONSE, HOME_RESPONSE, NOT_READY_RESPONSE, READINESS_EXEMPT,
+    TEST_RESPONSE, admission, admission_client, analytics, answer_pool, chat_stream_events, config,
+    ensure_ready, handle_chat_request, metrics, order_lookup_response, readiness_response, response_cache,
+    session_response, startup
+)
+from utils.response_generator import SSE_HEADERS, PreparedResponse, format_sse
+
+# Request bodies larger than this are rejected with 413
+MAX_BODY_BYTES = 1024 * 1024
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS')
+]
+
+# Paths served as-is, and prefixes of the routes that take a parameter
+STATIC_ROUTES = frozenset((
+    '/', '/api/test', '/api/chat', '/api/chat/stream', '/api/analytics', '/health', '/ready', '/metrics'
+))
+PARAMETER_ROUTES = (
+    ('/api/order/', '/api/order/<order_number>'),
+    ('/api/session/', '/api/session/<session_id>')
+)
+
+
+def route_label(path):
+    """Metrics label for a path: its route template or 'unmatched', never the raw path"""
+    if path in STATIC_ROUTES:
+        return path
+    for prefix, template in PARAMETER_ROUTES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return template
+    return 'unmatched'
+
+
+class ChatASGIApp:
+    """ASGI application wrapping the chat handlers from app.py"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='chat-worker')
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._admitted(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Accept connections at once; /ready flips when warm-up is done
+                if not startup.ready.is_set():
+                    startup.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                if answer_pool is not None:
+                    answer_pool.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _run(self, func, *args):
+        """Run a blocking call on the worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _admitted(self, scope, receive, send):
+        """Apply admission control to chat and order routes, then serve the request"""
+        # CORS preflights are answered without spending a client's tokens
+        if admission is None or scope['method'] == 'OPTIONS' or not scope['path'].startswith(ADMISSION_PREFIXES):
+            await self._http(scope, receive, send)
+            return
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers') or []}
+        rejection = admission.admit(admission_client((scope.get('client') or (None,))[0], headers))
+        if rejection is not None:
+            await self._respond(send, rejection.status, rejection.body(),
+                                extra_headers=[(b'retry-after', str(rejection.retry_after).encode())])
+            metrics.observe_request(route_label(scope['path']), scope['method'], rejection.status, 0.0)
+            return
+        start = time.perf_counter()
+        try:
+            await self._http(scope, receive, send)
+        finally:
+            admission.release(time.perf_counter() - start)
+
+    async def _http(self, scope, receive, send):
+        start = time.perf_counter()
+        method = scope['method']
+        path = scope['path']
+        route, status, body, content_type = 'unmatched', 404, {'error': 'Not found'}, b'application/json'
+        extra_headers = []
+
+        if (path not in READINESS_EXEMPT and method != 'OPTIONS' and not startup.ready.is_set()
+                and not await self._run(ensure_ready)):
+            await self._respond(send, 503, NOT_READY_RESPONSE, extra_headers=[(b'retry-after', b'1')])
+            metrics.observe_request(route_label(path), method, 503, time.perf_counter() - start)
+            return
+
+        if method == 'OPTIONS':
+            route, status, body = route_label(path), 200, None
+            # Allow the headers the preflight asks for (Content-Type on JSON POSTs), as Flask-CORS does
+            requested = dict(scope.get('headers') or []).get(b'access-control-request-headers')
+            if requested:
+                extra_headers.append((b'access-control-allow-headers', requested))
+        elif path == '/api/chat':
+            route = path
+            if method == 'GET':
+                status, body = 200, CHAT_USAGE
+            elif method == 'POST':
+                status, body = await self._chat(scope, receive)
+            else:
+                status, body = 405, {'error': 'Method not allowed'}
+        elif path == '/api/chat/stream' and method in ('GET', 'POST'):
+            status = await self._chat_stream(scope, receive, send)
+            metrics.observe_request(path, method, status, time.perf_counter() - start)
+            return
+        elif path.startswith('/api/order/') and len(path) > len('/api/order/') and method == 'GET':
+            route = '/api/order/<order_number>'
+            body, status = await self._run(order_lookup_response, path[len('/api/order/'):])
+        elif path.startswith('/api/session/') and len(path) > len('/api/session/') and method == 'GET':
+            route = '/api/session/<session_id>'
+            body, status = await self._run(session_response, path[len('/api/session/'):])
+        elif method == 'GET' and path == '/api/analytics':
+            route, status, body = path, 200, analytics.report(response_cache.stats())
+        elif method == 'GET' and path == '/health':
+            route, status, body = path, 200, HEALTH_RESPONSE
+        elif method == 'GET' and path == '/ready':
+            route = path
+            body, status = readiness_response()
+        elif method == 'GET' and path == '/metrics' and metrics.enabled:
+            route, status, body, content_type = path, 200, metrics.render(), b'text/plain; version=0.0.4'
+        elif method == 'GET' and path in ('/', '/api/test'):
+            route, status, body = path, 200, HOME_RESPONSE if path == '/' else TEST_RESPONSE
+
+        await self._respond(send, status, body, content_type, extra_headers)
+        metrics.observe_request(route, method, status, time.perf_counter() - start)
+
+    async def _chat_body(self, scope, receive):
+        """Read and parse a chat request body; returns (status, data or error body)"""
+        headers = dict(scope.get('headers') or [])
+        if not headers.get(b'content-type', b'').split(b';')[0].strip().endswith(b'json'):
+            return 415, {'error': 'Content-Type must be application/json'}
+        raw = await self._read_body(receive)
+        if raw is None:
+            return 413, {'error': f'Request body too large (max {MAX_BODY_BYTES} bytes)'}
+        with metrics.stage('parse_json'):
+            try:
+                data = json.loads(raw) if raw else None
+            except ValueError:
+                return 400, {'error': 'Request body is not valid JSON'}
+        return 200, data if isinstance(data, dict) else None
+
+    async def _chat(self, scope, receive):
+        """Parse a chat request body and answer it on the worker pool.
+
+        Returns (status, response); response is an error body unless status is 200.
+        """
+        start = time.perf_counter()
+        status, data = await self._chat_body(scope, receive)
+        if status != 200:
+            return status, data
+        response, faq_category = await self._run(handle_chat_request, data)
+        analytics.record(response['intent'], time.perf_counter() - start, faq_category)
+        return 200, response
+
+    async def _chat_stream(self, scope, receive, send):
+        """Answer /api/chat/stream as Server-Sent Events; returns the status.
+
+        meta goes out as soon as matching is done; a generated answer is
+        relayed piece by piece, each fetched on the worker pool.
+        """
+        start = time.perf_counter()
+        if scope['method'] == 'GET':
+            # EventSource clients can only issue GET requests
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            data = {'message': query.get('message', [''])[0], 'matcher': query.get('matcher', [None])[0]}
+        else:
+            status, data = await self._chat_body(scope, receive)
+            if status != 200:
+                await self._respond(send, status, data)
+                return status
+        response, faq_category, events = await self._run(chat_stream_events, data)
+        analytics.record(response['intent'], time.perf_counter() - start, faq_category)
+        headers = [(b'content-type', b'text/event-stream; charset=utf-8')]
+        headers += [(name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items()]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers + CORS_HEADERS})
+        while True:
+            item = await self._run(next, events, None)
+            if item is None:
+                break
+            await send({'type': 'http.response.body', 'body': format_sse(*item).encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+        return 200
+
+    async def _read_body(self, receive):
+        """Read the whole request body, or None when it exceeds MAX_BODY_BYTES"""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def _respond(self, send, status, body, content_type=b'application/json', extra_headers=()):
+        if body is None:
+            payload = b''
+        elif isinstance(body, str):
+            payload = body.encode('utf-8')
+        elif isinstance(body, PreparedResponse):
+            payload = body.body
+        else:
+            with metrics.stage('serialize'):
+                payload = json.dumps(body).encode('utf-8')
+        headers = [(b'content-type', content_type), (b'content-length', str(len(payload)).encode())]
+        headers += list(extra_headers)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers + CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': payload})
+
+
+app = ChatASGIApp(workers=config.get('asgi', {}).get('workers'))
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn is not installed: pip install uvicorn")
+    else:
+        print("🚀 Customer Support Bot async backend starting on http://localhost:5000")
+        uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,49 @@
+"""Compile faqs.json and knowledge_base.json into the binary FAQ artifact,
+and train the intent classifier that routes messages to FAQ categories.
+
+Run after editing the data files (or as a deploy step):
+
+    python build_index.py [--output data/faq_index.bin] [--intent-model data/intent_model.npz]
+
+Workers memory-map the artifact at startup instead of parsing and indexing
+the JSON. A stale or missing artifact is ignored and the JSON is used; a
+stale or missing intent model turns category routing off.
+"""
+import argparse
+import json
+import os
+import time
+
+from models.faq_artifact import build_artifact, source_fingerprint
+from models.nlp_model import IntentClassifier
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the compiled FAQ artifact')
+    parser.add_argument('--faqs', default=os.path.join(base_dir, 'data', 'faqs.json'))
+    parser.add_argument('--knowledge-base', default=os.path.join(base_dir, 'data', 'knowledge_base.json'))
+    parser.add_argument('--output', default=os.path.join(base_dir, 'data', 'faq_index.bin'))
+    parser.add_argument('--intent-model', default=os.path.join(base_dir, 'data', 'intent_model.npz'),
+                        help="where to save the intent classifier ('' to skip training)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = build_artifact(args.faqs, args.knowledge_base, args.output)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"✅ Built {result['path']}: {result['faq_count']} FAQs, {result['size']} bytes in {elapsed:.1f}ms")
+
+    if args.intent_model:
+        start = time.perf_counter()
+        with open(args.faqs, 'r') as f:
+            faqs = json.load(f)
+        classifier = IntentClassifier.train(faqs, sources={'faqs': source_fingerprint(args.faqs)})
+        classifier.save(args.intent_model)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✅ Trained {args.intent_model}: {len(classifier.categories)} categories, "
+              f"{len(classifier.rows)} features in {elapsed:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
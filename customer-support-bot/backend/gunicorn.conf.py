@@ -0,0 +1,53 @@
+"""Gunicorn settings for running the API with pre-forked workers.
+
+    cd backend && gunicorn -c gunicorn.conf.py app:app
+
+The master builds the compiled FAQ artifact (and trains the intent model
+used for category routing) once before forking. Each
+worker then memory-maps that same file, so the index pages live once in
+the page cache however many workers there are. The app is deliberately
+not preloaded: each worker starts its own data watcher thread, and a
+rebuilt artifact (os.replace) is remapped by every worker on its next
+check.
+"""
+import os
+import sys
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, base_dir)
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = False
+
+
+def on_starting(server):
+    import json
+    from models.faq_artifact import ensure_artifact
+
+    try:
+        with open(os.path.join(base_dir, '..', 'config', 'config.json'), 'r') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        config = {}
+    artifact_config = config.get('artifact', {})
+    routing_config = config.get('routing', {})
+    if not artifact_config.get('enabled', True):
+        return
+
+    output = os.path.join(base_dir, artifact_config.get('path', 'data/faq_index.bin'))
+    data_dir = os.path.join(base_dir, 'data')
+    if ensure_artifact(os.path.join(data_dir, 'faqs.json'), os.path.join(data_dir, 'knowledge_base.json'), output):
+        server.log.info('Built FAQ artifact %s', output)
+
+    if routing_config.get('enabled', True):
+        with open(os.path.join(data_dir, 'faqs.json'), 'r') as f:
+            faq_count = sum(len(questions) for questions in json.load(f).values())
+        # Smaller corpora are never routed, so skip the numpy/sklearn import
+        if faq_count >= routing_config.get('min_faqs', 2000):
+            from models.nlp_model import ensure_intent_model
+
+            model = os.path.join(base_dir, routing_config.get('model_path', 'data/intent_model.npz'))
+            if ensure_intent_model(os.path.join(data_dir, 'faqs.json'), model):
+                server.log.info('Trained intent model %s', model)
@@ -0,0 +1,172 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+database_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'database')
+SCHEMA_PATH = os.path.join(database_dir, 'schema.sql')
+SAMPLE_DATA_PATH = os.path.join(database_dir, 'sample_data.sql')
+
+# Order columns returned to callers, in table order
+ORDER_FIELDS = (
+    'status', 'product', 'carrier', 'tracking_number',
+    'estimated_delivery', 'delivery_date', 'shipping_address'
+)
+
+SELECT_ORDER = f"SELECT {', '.join(ORDER_FIELDS)} FROM orders WHERE order_number = ?"
+# Bulk lookups use IN lists padded to one of these sizes, so only a handful
+# of distinct statements ever enter the prepared statement cache
+IN_LIST_SIZES = (8, 32, 128, 512)
+
+INSERT_ORDER = (
+    f"INSERT OR REPLACE INTO orders (order_number, {', '.join(ORDER_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(ORDER_FIELDS) + 1))})"
+)
+
+
+class DatabaseError(Exception):
+    """The database could not serve a request"""
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections, one checked out per thread at a time.
+
+    Connections are opened in WAL mode so readers never block each other or
+    the writer, and keep sqlite3's prepared statement cache between
+    requests. A thread that already holds a connection reuses it.
+    """
+
+    def __init__(self, path, max_size=8, timeout=5.0):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except sqlite3.Error:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise DatabaseError('No database connection available')
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+
+def _row_to_order(row):
+    """Order dict with only the columns that are set, like the old sample data"""
+    return {field: value for field, value in zip(ORDER_FIELDS, row) if value is not None}
+
+
+class OrderStore:
+    """SQLite-backed order lookups keyed on the normalized order number"""
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self.pool = ConnectionPool(path, max_size=pool_size)
+
+    def initialize(self, seed_sample_data=True):
+        """Create the schema and load the sample orders into an empty table"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self.pool.connection() as conn:
+            with open(SCHEMA_PATH, 'r') as f:
+                conn.executescript(f.read())
+            if seed_sample_data and self.count() == 0:
+                with open(SAMPLE_DATA_PATH, 'r') as f:
+                    conn.executescript(f.read())
+        return self
+
+    def count(self):
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+
+    def get(self, order_number):
+        """Return the order dict for a normalized order number, or None"""
+        if not order_number:
+            return None
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_ORDER, (order_number,)).fetchone()
+        return _row_to_order(row) if row else None
+
+    def get_many(self, order_numbers):
+        """Return {order_number: order} for the normalized numbers that exist"""
+        wanted = list(dict.fromkeys(number for number in order_numbers if number))
+        found = {}
+        if not wanted:
+            return found
+        with self.pool.connection() as conn:
+            chunk_size = IN_LIST_SIZES[-1]
+            for start in range(0, len(wanted), chunk_size):
+                chunk = wanted[start:start + chunk_size]
+                size = next(size for size in IN_LIST_SIZES if size >= len(chunk))
+                params = chunk + [chunk[-1]] * (size - len(chunk))
+                query = (
+                    f"SELECT order_number, {', '.join(ORDER_FIELDS)} FROM orders "
+                    f"WHERE order_number IN ({', '.join('?' * size)})"
+                )
+                for row in conn.execute(query, params):
+                    found[row[0]] = _row_to_order(row[1:])
+        return found
+
+    def insert_many(self, orders):
+        """Insert or replace (order_number, {field: value}) pairs in one transaction"""
+        rows = (
+            (order_number,) + tuple(order.get(field) for field in ORDER_FIELDS)
+            for order_number, order in orders
+        )
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany(INSERT_ORDER, rows)
+
+    def close(self):
+        self.pool.close()
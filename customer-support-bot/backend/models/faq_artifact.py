@@ -0,0 +1,266 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+from utils.nlp_processor import FAQIndex
+from utils.response_generator import encode_json, faq_response_fields
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not coordinated between processes
+    fcntl = None
+
+# File layout: MAGIC, format version and header length, the JSON header,
+# then every section aligned to 8 bytes. The header records where each
+# section lives and fingerprints of the JSON sources it was built from.
+MAGIC = b'CSBFAQ\x00\x00'
+FORMAT_VERSION = 5
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 8
+INT_ITEMSIZE = array('i').itemsize
+
+
+def source_fingerprint(path):
+    """Size, mtime and SHA-256 of a source file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return {
+        'size': len(data),
+        'mtime_ns': os.stat(path).st_mtime_ns,
+        'sha256': hashlib.sha256(data).hexdigest()
+    }
+
+
+def source_is_fresh(recorded, path):
+    """Cheap size/mtime check first, content hash only when the mtime moved"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if recorded is None or recorded['size'] != stat.st_size:
+        return False
+    if recorded['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    return source_fingerprint(path)['sha256'] == recorded['sha256']
+
+
+class LazyEntries:
+    """(category, faq) records decoded from the artifact on first access.
+
+    Artifacts also hold each FAQ's encoded /api/chat response; body(position)
+    returns it. Each entry is decoded once: when two threads race on one
+    position the first result is kept and both get that same object.
+    """
+
+    def __init__(self, blob, offsets, body_blob=None, body_offsets=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.body_blob = body_blob
+        self.body_offsets = body_offsets
+        self._decoded = [None] * (len(offsets) - 1)
+        # id(faq) -> position for the entries decoded so far; those dicts
+        # stay referenced from _decoded, so their ids are never reused
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._decoded)
+
+    def __getitem__(self, position):
+        entry = self._decoded[position]
+        if entry is None:
+            raw = bytes(self.blob[self.offsets[position]:self.offsets[position + 1]])
+            category, faq = json.loads(raw)
+            with self._lock:
+                entry = self._decoded[position]
+                if entry is None:
+                    entry = self._decoded[position] = (category, faq)
+                    self._positions[id(faq)] = position
+        return entry
+
+    def position(self, faq):
+        """Position of a FAQ dict decoded from this table, or None for any other dict"""
+        position = self._positions.get(id(faq))
+        if position is None or self._decoded[position][1] is not faq:
+            return None
+        return position
+
+    def body(self, position):
+        """Pre-encoded response body for the FAQ at position, or None"""
+        if self.body_blob is None:
+            return None
+        return bytes(self.body_blob[self.body_offsets[position]:self.body_offsets[position + 1]])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+
+def build_artifact(faqs_path, knowledge_base_path, output_path):
+    """Compile the JSON data files and their FAQ index into a binary artifact"""
+    with open(faqs_path, 'r') as f:
+        faqs = json.load(f)
+    with open(knowledge_base_path, 'r') as f:
+        knowledge_base = json.load(f)
+
+    index = FAQIndex.from_faqs(faqs)
+    sections = dict(index.arrays())
+
+    record_offsets = array('i', [0])
+    records = []
+    for entry in index.entries:
+        records.append(json.dumps(list(entry), separators=(',', ':')).encode('utf-8'))
+        record_offsets.append(record_offsets[-1] + len(records[-1]))
+    sections['entry_blob'] = b''.join(records)
+    sections['entry_offsets'] = record_offsets
+
+    # Response bodies are encoded here once instead of on every FAQ hit
+    body_offsets = array('i', [0])
+    bodies = []
+    for _, faq in index.entries:
+        bodies.append(encode_json(faq_response_fields(faq)))
+        body_offsets.append(body_offsets[-1] + len(bodies[-1]))
+    sections['response_blob'] = b''.join(bodies)
+    sections['response_offsets'] = body_offsets
+    sections['knowledge_base'] = json.dumps(knowledge_base, separators=(',', ':')).encode('utf-8')
+
+    layout = {}
+    payload = []
+    offset = 0
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else bytes(data)
+        padding = -len(raw) % ALIGNMENT
+        layout[name] = [offset, len(raw), 'i' if isinstance(data, array) else 'B']
+        payload.append(raw + b'\x00' * padding)
+        offset += len(raw) + padding
+
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'int_itemsize': INT_ITEMSIZE,
+        'built_at': time.time(),
+        'faq_count': len(index.entries),
+        'categories': list(faqs),
+        'category_sizes': [len(questions) for questions in faqs.values()],
+        'sources': {
+            'faqs': source_fingerprint(faqs_path),
+            'knowledge_base': source_fingerprint(knowledge_base_path)
+        },
+        'sections': layout
+    }).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+
+    # Write next to the target and rename so readers never map a partial file
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for chunk in payload:
+            f.write(chunk)
+    os.replace(tmp_path, output_path)
+    return {'path': output_path, 'faq_count': len(index.entries), 'size': PREAMBLE.size + len(header) + offset}
+
+
+class ArtifactError(Exception):
+    """The artifact is missing, stale or unreadable"""
+
+
+def _parse_header(buffer, faqs_path, knowledge_base_path):
+    """Validate the preamble and header at the start of buffer; returns (header, header_end)"""
+    if len(buffer) < PREAMBLE.size:
+        raise ArtifactError('truncated artifact')
+    magic, version, header_length = PREAMBLE.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ArtifactError('unknown artifact format')
+
+    header_end = PREAMBLE.size + header_length
+    try:
+        header = json.loads(bytes(buffer[PREAMBLE.size:header_end]))
+    except ValueError:
+        raise ArtifactError('corrupt artifact header')
+    if header.get('byteorder') != sys.byteorder or header.get('int_itemsize') != INT_ITEMSIZE:
+        raise ArtifactError('artifact built on an incompatible platform')
+    sources = header.get('sources', {})
+    if not (source_is_fresh(sources.get('faqs'), faqs_path)
+            and source_is_fresh(sources.get('knowledge_base'), knowledge_base_path)):
+        raise ArtifactError('artifact is stale')
+    return header, header_end
+
+
+def read_header(path, faqs_path, knowledge_base_path):
+    """Header of a usable artifact, without mapping the sections.
+
+    Raises ArtifactError like load_artifact.
+    """
+    try:
+        with open(path, 'rb') as f:
+            preamble = f.read(PREAMBLE.size)
+            if len(preamble) == PREAMBLE.size:
+                preamble += f.read(PREAMBLE.unpack(preamble)[2])
+    except OSError as e:
+        raise ArtifactError(f'cannot read {path}: {e}')
+    return _parse_header(preamble, faqs_path, knowledge_base_path)[0]
+
+
+@contextmanager
+def build_lock(output_path):
+    """Hold an exclusive lock on a file next to output_path.
+
+    When many workers start (or notice a data change) at once, one builds
+    while the rest wait, then find the fresh file and simply use it.
+    """
+    with open(f'{output_path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def ensure_artifact(faqs_path, knowledge_base_path, output_path):
+    """Build the artifact unless an up-to-date one exists; returns True when built"""
+    with build_lock(output_path):
+        try:
+            read_header(output_path, faqs_path, knowledge_base_path)
+            return False
+        except ArtifactError:
+            build_artifact(faqs_path, knowledge_base_path, output_path)
+            return True
+
+
+def load_artifact(path, faqs_path, knowledge_base_path):
+    """Map an artifact and return (index, knowledge_base, header).
+
+    Raises ArtifactError when the file is missing, was built by another
+    format version or platform, or no longer matches the JSON sources.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f'cannot map {path}: {e}')
+
+    buffer = memoryview(mapped)
+    header, header_end = _parse_header(buffer, faqs_path, knowledge_base_path)
+
+    sections = {}
+    for name, (offset, length, typecode) in header['sections'].items():
+        start = header_end + offset
+        if start + length > len(buffer):
+            raise ArtifactError('truncated artifact')
+        view = buffer[start:start + length]
+        sections[name] = view.cast('i') if typecode == 'i' else view
+
+    entries = LazyEntries(sections.pop('entry_blob'), sections.pop('entry_offsets'),
+                          sections.pop('response_blob', None), sections.pop('response_offsets', None))
+    knowledge_base = json.loads(bytes(sections.pop('knowledge_base')))
+    return FAQIndex(entries, sections), knowledge_base, header
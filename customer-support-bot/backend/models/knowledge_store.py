@@ -0,0 +1,373 @@
+import json
+import os
+import threading
+import time
+
+from models.faq_artifact import ArtifactError, LazyEntries, ensure_artifact, load_artifact
+from utils.nlp_processor import EntityExtractor, FAQIndex
+from utils.response_generator import PreparedResponse, faq_response_fields
+
+
+class DataSnapshot:
+    """Immutable FAQ/knowledge base data together with the indexes built from it.
+
+    Request handlers take one snapshot reference and use it for the whole
+    request, so a reload never exposes a half-built index.
+    """
+
+    def __init__(self, faqs, knowledge_base, version=0, sources=None, index=None, origin='json', header=None,
+                 intent_model_path=None, faqs_path=None):
+        # faqs may be None when a precompiled index is supplied; it is then
+        # rebuilt from the index entries on first access
+        self._faqs = faqs
+        self.knowledge_base = knowledge_base
+        self.version = version
+        self.sources = sources or {}
+        self.origin = origin
+        # Header of the artifact the index is mapped from, if any
+        self.header = header or {}
+        self.loaded_at = time.time()
+        self.index = index if index is not None else FAQIndex.from_faqs(faqs)
+        self.extractor = EntityExtractor(knowledge_base)
+        # position -> PreparedResponse; an artifact's come encoded from the
+        # file and are filled in on first hit, JSON data is encoded up front
+        self._faq_responses = {}
+        self._json_positions = {}
+        if not isinstance(self.index.entries, LazyEntries):
+            for position, (_, faq) in enumerate(self.index.entries):
+                self._json_positions[id(faq)] = position
+                self._faq_responses[position] = PreparedResponse(faq_response_fields(faq))
+        self._retriever = None
+        self._retriever_lock = threading.Lock()
+        self._semantic = None
+        self._semantic_lock = threading.Lock()
+        # Intent classifier saved for these FAQs, loaded on first route()
+        self.intent_model_path = intent_model_path
+        self.faqs_path = faqs_path
+        self.intent_error = None
+        self._intents = None
+        self._intents_loaded = False
+        self._intents_lock = threading.Lock()
+        self._shards = None
+
+    @property
+    def faqs(self):
+        """FAQs in the {category: [faq, ...]} layout of faqs.json"""
+        if self._faqs is None:
+            faqs = {}
+            for category, faq in self.index.entries:
+                faqs.setdefault(category, []).append(faq)
+            self._faqs = faqs
+        return self._faqs
+
+    @property
+    def categories(self):
+        """FAQ category names, without decoding a mapped artifact's entries"""
+        if self._faqs is None and 'categories' in self.header:
+            return list(self.header['categories'])
+        return list(self.faqs)
+
+    @property
+    def shards(self):
+        """category -> (start, end) range of its FAQ positions"""
+        if self._shards is None:
+            if self._faqs is None and 'category_sizes' in self.header:
+                sizes = zip(self.header['categories'], self.header['category_sizes'])
+            else:
+                sizes = [(category, len(questions)) for category, questions in self.faqs.items()]
+            shards = {}
+            start = 0
+            for category, size in sizes:
+                shards[category] = (start, start + size)
+                start += size
+            self._shards = shards
+        return self._shards
+
+    @property
+    def entries(self):
+        """(category, faq) pairs in matching order"""
+        return self.index.entries
+
+    def faq_position(self, faq):
+        """Position of one of this snapshot's FAQ dicts, or None for any other dict"""
+        entries = self.index.entries
+        if isinstance(entries, LazyEntries):
+            return entries.position(faq)
+        position = self._json_positions.get(id(faq))
+        if position is None or entries[position][1] is not faq:
+            return None
+        return position
+
+    def faq_response(self, faq):
+        """The shared, pre-encoded chat response for a FAQ of this snapshot"""
+        position = self.faq_position(faq)
+        if position is None:
+            # A FAQ from a replaced snapshot is answered but not remembered
+            return PreparedResponse(faq_response_fields(faq))
+        response = self._faq_responses.get(position)
+        if response is None:
+            response = PreparedResponse(faq_response_fields(faq), self.index.entries.body(position))
+            response = self._faq_responses.setdefault(position, response)
+        return response
+
+    def retriever(self, min_score=0.3):
+        """Return the TF-IDF retriever for this snapshot, building it on first use"""
+        if self._retriever is None:
+            with self._retriever_lock:
+                if self._retriever is None:
+                    from models.nlp_model import FAQRetriever
+                    self._retriever = FAQRetriever(self.entries, min_score)
+        return self._retriever
+
+    def has_retriever(self):
+        return self._retriever is not None
+
+    def semantic(self, min_similarity=0.3):
+        """Return the embedding matcher for this snapshot, building it on first use"""
+        if self._semantic is None:
+            with self._semantic_lock:
+                if self._semantic is None:
+                    from models.nlp_model import SemanticMatcher
+                    self._semantic = SemanticMatcher(self.entries, min_similarity)
+        return self._semantic
+
+    def has_semantic(self):
+        return self._semantic is not None
+
+    def intent_classifier(self):
+        """Return the saved intent classifier for these FAQs, or None when there is no usable one"""
+        if not self._intents_loaded:
+            with self._intents_lock:
+                if not self._intents_loaded:
+                    if self.intent_model_path:
+                        from models.nlp_model import IntentClassifier
+                        try:
+                            self._intents = IntentClassifier.load(self.intent_model_path, self.faqs_path)
+                        except ArtifactError as e:
+                            self.intent_error = str(e)
+                    self._intents_loaded = True
+        return self._intents
+
+    def has_intent_classifier(self):
+        return self._intents is not None
+
+    def route(self, message, max_categories=2, min_confidence=0.8):
+        """Position ranges of the categories a message is routed to, or None for a full scan"""
+        classifier = self.intent_classifier()
+        if classifier is None:
+            return None
+        categories = classifier.route(message, max_categories, min_confidence)
+        if categories is None:
+            return None
+        shards = self.shards
+        if not all(category in shards for category in categories):
+            # Trained on other categories than these FAQs have
+            return None
+        return sorted(shards[category] for category in categories)
+
+
+def _file_signature(path):
+    """(mtime_ns, size) of a file, or None when it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class KnowledgeStore:
+    """Loads faqs.json/knowledge_base.json and hot-swaps them when they change.
+
+    New data is parsed and indexed on the caller's thread (the watcher or
+    an admin request) and published with a single reference assignment.
+    Listeners registered with on_swap run after every successful swap.
+
+    With build_artifact, the compiled artifact is (re)built when stale and
+    every process maps that one file, so pre-forked workers share a single
+    copy of the index through the page cache. The artifact's own mtime is
+    watched too: replacing it (os.replace by any process or build step)
+    makes every worker remap the new file on its next check.
+    """
+
+    def __init__(self, knowledge_base_path, faqs_path, retriever_min_score=0.3, artifact_path=None,
+                 build_artifact=False, semantic_min_similarity=0.3, intent_model_path=None, intent_min_faqs=0):
+        self.knowledge_base_path = knowledge_base_path
+        self.faqs_path = faqs_path
+        self.artifact_path = artifact_path
+        self.build_artifact = build_artifact and artifact_path is not None
+        self.intent_model_path = intent_model_path
+        # Smaller corpora are always scanned in full, so they need no model
+        self.intent_min_faqs = intent_min_faqs
+        self.artifact_error = None
+        self.retriever_min_score = retriever_min_score
+        self.semantic_min_similarity = semantic_min_similarity
+        self.snapshot = DataSnapshot({}, {})
+        self.last_error = None
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def on_swap(self, listener):
+        """Register listener(snapshot) to run after each swap"""
+        self._listeners.append(listener)
+        return listener
+
+    def signatures(self):
+        signatures = {
+            'knowledge_base': _file_signature(self.knowledge_base_path),
+            'faqs': _file_signature(self.faqs_path)
+        }
+        if self.artifact_path:
+            signatures['artifact'] = _file_signature(self.artifact_path)
+        return signatures
+
+    def _prepare_artifact(self):
+        """Build the artifact if it is stale (one process builds, the others wait)"""
+        if not self.build_artifact:
+            return
+        try:
+            if ensure_artifact(self.faqs_path, self.knowledge_base_path, self.artifact_path):
+                print(f"🔄 Built {os.path.basename(self.artifact_path)}")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.artifact_error = f'build failed: {type(e).__name__}: {e}'
+
+    def _prepare_intent_model(self):
+        """Train the intent model if it is stale, like the artifact"""
+        from models.nlp_model import ensure_intent_model
+        try:
+            if ensure_intent_model(self.faqs_path, self.intent_model_path):
+                print(f"🔄 Trained {os.path.basename(self.intent_model_path)}")
+        except Exception as e:
+            # Routing is optional: on any failure it is skipped and every
+            # message gets a full scan, rather than failing the load
+            print(f"⚠️  Intent model not trained: {type(e).__name__}: {e}")
+
+    def _new_snapshot(self, faqs, knowledge_base, version, sources, **kwargs):
+        snapshot = DataSnapshot(faqs, knowledge_base, version, sources, intent_model_path=self.intent_model_path,
+                                faqs_path=self.faqs_path, **kwargs)
+        if self.build_artifact and self.intent_model_path and len(snapshot.index) >= self.intent_min_faqs:
+            self._prepare_intent_model()
+        return snapshot
+
+    def _read_json(self, path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _load_artifact(self, version, sources):
+        """Snapshot from the compiled artifact, or None when it cannot be used"""
+        if not self.artifact_path:
+            return None
+        try:
+            index, knowledge_base, header = load_artifact(self.artifact_path, self.faqs_path, self.knowledge_base_path)
+        except ArtifactError as e:
+            self.artifact_error = str(e)
+            return None
+        self.artifact_error = None
+        return self._new_snapshot(None, knowledge_base, version, sources, index=index, origin='artifact', header=header)
+
+    def load(self):
+        """Initial load; missing files fall back to empty data"""
+        self._prepare_artifact()
+        sources = self.signatures()
+        snapshot = self._load_artifact(self.snapshot.version + 1, sources)
+        if snapshot is not None:
+            print(f"✅ FAQ index loaded from {os.path.basename(self.artifact_path)}")
+            self._swap(snapshot)
+            return self.snapshot
+        if self.artifact_path:
+            print(f"⚠️  FAQ artifact not used ({self.artifact_error}), loading JSON")
+
+        try:
+            knowledge_base = self._read_json(self.knowledge_base_path)
+            print("✅ Knowledge base loaded successfully")
+        except FileNotFoundError:
+            print("❌ knowledge_base.json not found")
+            knowledge_base = {}
+
+        try:
+            faqs = self._read_json(self.faqs_path)
+            print("✅ FAQs loaded successfully")
+        except FileNotFoundError:
+            print("❌ faqs.json not found")
+            faqs = {}
+
+        self._swap(self._new_snapshot(faqs, knowledge_base, self.snapshot.version + 1, sources))
+        return self.snapshot
+
+    def reload(self, force=False):
+        """Re-read the data files if they changed; returns True when swapped"""
+        with self._reload_lock:
+            sources = self.signatures()
+            if not force and sources == self.snapshot.sources:
+                return False
+            self._prepare_artifact()
+            sources = self.signatures()
+            try:
+                snapshot = self._load_artifact(self.snapshot.version + 1, sources)
+                if snapshot is None:
+                    knowledge_base = self._read_json(self.knowledge_base_path)
+                    faqs = self._read_json(self.faqs_path)
+                    snapshot = self._new_snapshot(faqs, knowledge_base, self.snapshot.version + 1, sources)
+                if self.snapshot.has_retriever():
+                    # Keep the TF-IDF path warm if it is in use
+                    snapshot.retriever(self.retriever_min_score)
+                if self.snapshot.has_semantic():
+                    snapshot.semantic(self.semantic_min_similarity)
+                if self.snapshot.has_intent_classifier():
+                    snapshot.intent_classifier()
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                # Keep serving the old snapshot; a half-written file is retried next time
+                self.last_error = f'{type(e).__name__}: {e}'
+                print(f"❌ Reload failed, keeping version {self.snapshot.version}: {self.last_error}")
+                return False
+            self._swap(snapshot)
+            print(f"🔄 FAQ data reloaded (version {snapshot.version})")
+            return True
+
+    def install(self, snapshot):
+        """Publish a snapshot built elsewhere (tests, benchmarks, build steps)"""
+        with self._reload_lock:
+            snapshot.version = self.snapshot.version + 1
+            self._swap(snapshot)
+
+    def _swap(self, snapshot):
+        self.snapshot = snapshot
+        self.last_error = None
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def start_watcher(self, interval=5.0):
+        """Poll the data files' mtime/size in a daemon thread"""
+        if self._watcher is not None:
+            return self._watcher
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=watch, name='knowledge-store-watcher', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self):
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version,
+            'loaded_at': snapshot.loaded_at,
+            'faq_count': len(snapshot.index),
+            'origin': snapshot.origin,
+            'artifact_error': self.artifact_error,
+            'artifact_built_at': snapshot.header.get('built_at'),
+            'categories': snapshot.categories,
+            'intent_model': snapshot.has_intent_classifier(),
+            'watching': self._watcher is not None,
+            'last_error': self.last_error
+        }
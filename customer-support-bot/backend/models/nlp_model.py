@@ -0,0 +1,366 @@
+import json
+import os
+import re
+
+import numpy as np
+
+from models.faq_artifact import ArtifactError, build_lock, source_fingerprint, source_is_fresh
+
+# Hash buckets per n-gram family before projection
+HASH_FEATURES = 2 ** 18
+
+# Intent classifier: words it reads, vocabulary size, inverse L2
+# regularization strength and saved file format
+INTENT_TOKEN = re.compile(r'[a-z0-9]+')
+INTENT_MAX_FEATURES = 20000
+INTENT_REGULARIZATION = 10.0
+INTENT_FORMAT_VERSION = 1
+
+
+class FAQRetriever:
+    """TF-IDF retrieval engine over FAQ questions and keywords.
+
+    Every FAQ is compiled into one row of an L2-normalised sparse TF-IDF
+    matrix, so scoring a message against the whole corpus is a single
+    sparse matrix-vector product and the scores are cosine similarities.
+    """
+
+    def __init__(self, entries, min_score=0.3):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # entries: list of (category, faq) in the same order as FAQIndex
+        self.entries = entries
+        self.min_score = min_score
+        self.vectorizer = TfidfVectorizer(
+            lowercase=True,
+            stop_words='english',
+            ngram_range=(1, 2),
+            sublinear_tf=True
+        )
+        documents = [self._document(faq) for _, faq in entries]
+        try:
+            self.matrix = self.vectorizer.fit_transform(documents).tocsr()
+        except ValueError:
+            # Empty corpus or nothing but stop words: nothing can match
+            self.matrix = None
+        # (start, end) -> rows of the matrix for one shard of positions
+        self._shards = {}
+
+    @staticmethod
+    def _document(faq):
+        return ' '.join([faq['question']] + list(faq.get('keywords', [])))
+
+    def _top_k(self, scores, positions, k):
+        if len(scores) == 0:
+            return []
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            scores, positions = scores[keep], positions[keep]
+        order = np.argsort(-scores, kind='stable')
+        return [(int(positions[i]), float(scores[i])) for i in order if scores[i] > 0]
+
+    def search(self, message, k=3, shards=None):
+        """Return up to k (position, score) pairs for a message, best first"""
+        return self.search_many([message], k, shards)[0]
+
+    def _shard(self, start, end):
+        matrix = self._shards.get((start, end))
+        if matrix is None:
+            matrix = self._shards[(start, end)] = self.matrix[start:end]
+        return matrix
+
+    def search_many(self, messages, k=3, shards=None):
+        """Score a batch of messages with one sparse matrix product per shard.
+
+        shards optionally limits the search to those [start, end) position ranges.
+        """
+        if self.matrix is None or not messages:
+            return [[] for _ in messages]
+        queries = self.vectorizer.transform(messages)
+        blocks = [(0, self.matrix)] if shards is None else [(start, self._shard(start, end)) for start, end in shards]
+        # (batch x vocab) . (vocab x faqs) keeps only FAQs sharing a term
+        results = [(offset, (queries @ matrix.T).tocsr()) for offset, matrix in blocks]
+        hits = []
+        for row in range(len(messages)):
+            scores = []
+            positions = []
+            for offset, result in results:
+                start, end = result.indptr[row], result.indptr[row + 1]
+                scores.append(result.data[start:end])
+                positions.append(result.indices[start:end] + offset)
+            hits.append(self._top_k(np.concatenate(scores), np.concatenate(positions), k))
+        return hits
+
+    def best(self, message, shards=None):
+        """Return the best (category, faq) entry above min_score, or None"""
+        return self.best_many([message], shards)[0]
+
+    def best_many(self, messages, shards=None):
+        """Best entry above min_score for each message in a batch"""
+        matches = []
+        for hits in self.search_many(messages, k=1, shards=shards):
+            if hits and hits[0][1] >= self.min_score:
+                matches.append(self.entries[hits[0][0]])
+            else:
+                matches.append(None)
+        return matches
+
+
+class SemanticMatcher:
+    """Approximate nearest-neighbour FAQ matching on hashed n-gram embeddings.
+
+    Needs no trained model or network: character and word n-grams are
+    hashed, IDF-weighted over the FAQ corpus and folded into a small dense
+    vector by a fixed random signed projection, so paraphrases and typos
+    that share most n-grams land close together. Small corpora are scanned
+    exactly; larger ones are bucketed in SimHash LSH tables (random
+    hyperplanes, probing every one-bit neighbour of the query's bucket) and
+    only those candidates are ranked by cosine similarity.
+    """
+
+    def __init__(self, entries, min_similarity=0.3, dim=128, tables=8, bits=None, exact_limit=4096, seed=13):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.entries = entries
+        self.min_similarity = min_similarity
+        self.dim = dim
+        self.words = HashingVectorizer(
+            analyzer='word', stop_words='english', ngram_range=(1, 2),
+            n_features=HASH_FEATURES, alternate_sign=False, norm=None
+        )
+        self.chars = HashingVectorizer(
+            analyzer='char_wb', ngram_range=(3, 5),
+            n_features=HASH_FEATURES, alternate_sign=False, norm=None
+        )
+        # The random projection sends every hash bucket to one output
+        # dimension with a random sign; folded together with the IDF weight
+        rng = np.random.default_rng(seed)
+        self.columns = rng.integers(0, dim, size=2 * HASH_FEATURES).astype(np.int32)
+        signs = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=2 * HASH_FEATURES)
+
+        counts = self._counts([FAQRetriever._document(faq) for _, faq in entries])
+        features = np.concatenate([matrix.indices + offset for offset, matrix in counts])
+        document_frequency = np.bincount(features, minlength=2 * HASH_FEATURES)
+        idf = np.log((1 + len(entries)) / (1 + document_frequency)) + 1
+        self.weights = (signs * idf).astype(np.float32)
+        self.embeddings = self._embed_counts(counts)
+
+        # LSH only pays off once a full scan gets expensive
+        self.tables = 0
+        if len(entries) > exact_limit:
+            if bits is None:
+                # Aim for a handful of FAQs per bucket
+                bits = int(min(24, max(8, np.log2(len(entries) / 8))))
+            rng = np.random.default_rng(seed + 1)
+            self.planes = rng.standard_normal((dim, tables * bits)).astype(np.float32)
+            self.tables = tables
+            self.bits = bits
+            # Query bucket plus every bucket one bit away, in every table
+            flips = np.array([0] + [1 << bit for bit in range(bits)], dtype=np.int64)
+            self.probes = (np.arange(tables, dtype=np.int64)[:, None] << bits, flips)
+            # All tables share one sorted array: table number in the high bits
+            keys = (self._keys(self.embeddings) | self.probes[0].T).T.ravel()
+            order = np.argsort(keys, kind='stable')
+            self.sorted_keys = keys[order]
+            self.order = (order % len(entries)).astype(np.int32)
+
+    def _counts(self, texts):
+        """(feature offset, CSR counts) for the word and character n-grams of texts"""
+        return [(0, self.words.transform(texts)), (HASH_FEATURES, self.chars.transform(texts))]
+
+    def _embed_counts(self, counts):
+        rows = len(counts[0][1].indptr) - 1
+        embeddings = np.zeros(rows * self.dim)
+        for offset, matrix in counts:
+            features = matrix.indices + offset
+            cells = np.repeat(np.arange(rows, dtype=np.int64) * self.dim, np.diff(matrix.indptr))
+            cells += self.columns[features]
+            # Sublinear term frequency times the signed IDF weight
+            values = (1 + np.log(matrix.data)) * self.weights[features]
+            embeddings += np.bincount(cells, weights=values, minlength=rows * self.dim)
+        embeddings = embeddings.reshape(rows, self.dim).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    def embed(self, texts):
+        """Unit-length embeddings for a list of texts (zero rows for empty ones)"""
+        return self._embed_counts(self._counts(texts))
+
+    def _keys(self, embeddings):
+        """SimHash bucket key of each embedding in every table"""
+        signs = (embeddings @ self.planes) > 0
+        weights = (1 << np.arange(self.bits, dtype=np.int64))
+        return signs.reshape(len(embeddings), -1, self.bits).astype(np.int64) @ weights
+
+    def _candidates(self, key_row):
+        """Positions of every FAQ sharing a probed bucket with the query"""
+        tables, flips = self.probes
+        probes = (tables | (key_row[:, None] ^ flips)).ravel()
+        starts = np.searchsorted(self.sorted_keys, probes, 'left')
+        lengths = np.searchsorted(self.sorted_keys, probes, 'right') - starts
+        # Expand the [start, start + length) ranges into one index array
+        ends = np.cumsum(lengths)
+        steps = np.arange(ends[-1]) - np.repeat(ends - lengths - starts, lengths)
+        return np.unique(self.order[steps])
+
+    def search_many(self, messages, k=3):
+        """Up to k (position, similarity) pairs per message, best first"""
+        if not messages or not len(self.entries):
+            return [[] for _ in messages]
+        queries = self.embed(messages)
+        keys = self._keys(queries) if self.tables else None
+        hits = []
+        for row, query in enumerate(queries):
+            if self.tables:
+                positions = self._candidates(keys[row])
+                similarities = self.embeddings[positions] @ query
+            else:
+                positions = np.arange(len(self.entries))
+                similarities = self.embeddings @ query
+            if len(positions) > k:
+                keep = np.argpartition(-similarities, k - 1)[:k]
+                positions, similarities = positions[keep], similarities[keep]
+            # Ties go to the FAQ listed first
+            order = np.lexsort((positions, -similarities))
+            hits.append([(int(positions[i]), float(similarities[i])) for i in order if similarities[i] > 0])
+        return hits
+
+    def search(self, message, k=3):
+        return self.search_many([message], k)[0]
+
+    def best(self, message):
+        """Return the best (category, faq) entry above min_similarity, or None"""
+        return self.best_many([message])[0]
+
+    def best_many(self, messages):
+        """Best entry above min_similarity for each message in a batch"""
+        matches = []
+        for hits in self.search_many(messages, k=1):
+            if hits and hits[0][1] >= self.min_similarity:
+                matches.append(self.entries[hits[0][0]])
+            else:
+                matches.append(None)
+        return matches
+
+
+class IntentClassifier:
+    """Predicts which FAQ categories a message is about.
+
+    A multinomial logistic regression over the words and word pairs of
+    every FAQ's question and keywords, trained offline (build_index.py, or
+    when the artifact is rebuilt) and saved as a compact .npz holding the
+    vocabulary and a (vocabulary x categories) weight matrix. Predicting
+    is a dict lookup per word plus one small row sum, so it costs far less
+    than scoring the FAQs it lets the matchers skip.
+    """
+
+    def __init__(self, categories, vocabulary, weights, intercept, sources=None):
+        self.categories = list(categories)
+        self.rows = {gram: row for row, gram in enumerate(vocabulary)}
+        self.weights = weights
+        self.intercept = intercept
+        # Fingerprints of the data files the model was trained on
+        self.sources = sources or {}
+
+    @staticmethod
+    def grams(text):
+        """Lowercased words and adjacent word pairs of a text"""
+        words = INTENT_TOKEN.findall(text.lower())
+        return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+    @classmethod
+    def train(cls, faqs, max_features=INTENT_MAX_FEATURES, sources=None):
+        """Fit on the {category: [faq, ...]} layout of faqs.json"""
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        texts = []
+        labels = []
+        for category, questions in faqs.items():
+            for faq in questions:
+                keywords = ' '.join(faq.get('keywords', []))
+                for text in (faq['question'], keywords, f"{faq['question']} {keywords}"):
+                    texts.append(text)
+                    labels.append(category)
+        if len(set(labels)) < 2:
+            raise ValueError('intent classifier needs at least two FAQ categories')
+
+        vectorizer = CountVectorizer(analyzer=cls.grams, binary=True, max_features=max_features)
+        features = vectorizer.fit_transform(texts)
+        model = LogisticRegression(C=INTENT_REGULARIZATION, max_iter=500)
+        model.fit(features, labels)
+
+        vocabulary = vectorizer.get_feature_names_out()
+        coef, intercept = model.coef_, model.intercept_
+        if len(model.classes_) == 2:
+            # A binary fit has one column for the second class; split it in
+            # half across both so the softmax in predict() gives the same
+            # probabilities as the sigmoid
+            coef = np.vstack([-coef / 2, coef / 2])
+            intercept = np.concatenate([-intercept / 2, intercept / 2])
+        # Rows follow the faqs.json category order, not sklearn's sorted one
+        order = [list(model.classes_).index(category) for category in faqs if category in model.classes_]
+        categories = [model.classes_[i] for i in order]
+        return cls(categories, vocabulary, coef[order].T.astype(np.float32),
+                   intercept[order].astype(np.float32), sources)
+
+    def save(self, path):
+        vocabulary = sorted(self.rows, key=self.rows.get)
+        meta = json.dumps({'format': INTENT_FORMAT_VERSION, 'categories': self.categories, 'sources': self.sources})
+        # Write next to the target and rename so readers never load a partial file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(meta), vocabulary=np.array(vocabulary, dtype=str),
+                                weights=self.weights, intercept=self.intercept)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, faqs_path=None):
+        """Read a saved model; raises ArtifactError when it is missing, unreadable or stale"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('format') != INTENT_FORMAT_VERSION:
+                    raise ArtifactError('unknown intent model format')
+                classifier = cls(meta['categories'], data['vocabulary'].tolist(), data['weights'],
+                                 data['intercept'], meta.get('sources'))
+        except (OSError, ValueError, KeyError) as e:
+            raise ArtifactError(f'cannot read {path}: {e}')
+        if faqs_path is not None and not source_is_fresh(classifier.sources.get('faqs'), faqs_path):
+            raise ArtifactError('intent model is stale')
+        return classifier
+
+    def predict(self, message):
+        """(category, probability) pairs for a message, most likely first"""
+        rows = [row for row in map(self.rows.get, set(self.grams(message))) if row is not None]
+        scores = self.intercept + self.weights[rows].sum(axis=0) if rows else self.intercept.copy()
+        scores = np.exp(scores - scores.max())
+        scores /= scores.sum()
+        return sorted(zip(self.categories, scores.tolist()), key=lambda pair: -pair[1])
+
+    def route(self, message, max_categories=2, min_confidence=0.8):
+        """The fewest top categories (up to max_categories) jointly holding
+        min_confidence of the probability, or None when that needs more
+        """
+        chosen = []
+        total = 0.0
+        for category, probability in self.predict(message)[:max_categories]:
+            chosen.append(category)
+            total += probability
+            if total >= min_confidence:
+                return chosen
+        return None
+
+
+def ensure_intent_model(faqs_path, output_path):
+    """Train and save the intent model unless an up-to-date one exists; returns True when trained"""
+    with build_lock(output_path):
+        try:
+            IntentClassifier.load(output_path, faqs_path)
+            return False
+        except ArtifactError:
+            with open(faqs_path, 'r') as f:
+                faqs = json.load(f)
+            IntentClassifier.train(faqs, sources={'faqs': source_fingerprint(faqs_path)}).save(output_path)
+            return True
@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from models.database import SCHEMA_PATH, ConnectionPool
+
+# Longest message text kept per turn
+MAX_MESSAGE_CHARS = 500
+
+SPILL_SESSION = 'INSERT OR REPLACE INTO sessions (session_id, updated_at, turns) VALUES (?, ?, ?)'
+RESTORE_SESSION = 'SELECT turns FROM sessions WHERE session_id = ?'
+PURGE_SESSIONS = 'DELETE FROM sessions WHERE updated_at < ?'
+
+
+class Turn:
+    """One answered message in a conversation"""
+
+    __slots__ = ('timestamp', 'message', 'intent', 'order_number', 'faq_category', 'faq_question')
+
+    def __init__(self, message, intent, order_number=None, faq_category=None, faq_question=None, timestamp=None):
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.message = message[:MAX_MESSAGE_CHARS]
+        self.intent = intent
+        self.order_number = order_number
+        self.faq_category = faq_category
+        self.faq_question = faq_question
+
+    def to_row(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row):
+        timestamp, message, intent, order_number, faq_category, faq_question = row
+        return cls(message, intent, order_number, faq_category, faq_question, timestamp)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+
+class Session:
+    """Most recent turns of one conversation in a fixed-size ring buffer"""
+
+    __slots__ = ('turns', 'head', 'size', 'last_seen')
+
+    def __init__(self, max_turns, last_seen=0.0):
+        self.turns = [None] * max_turns
+        # Index of the oldest turn and number of turns held
+        self.head = 0
+        self.size = 0
+        self.last_seen = last_seen
+
+    def append(self, turn):
+        capacity = len(self.turns)
+        self.turns[(self.head + self.size) % capacity] = turn
+        if self.size < capacity:
+            self.size += 1
+        else:
+            self.head = (self.head + 1) % capacity
+
+    def last(self):
+        """The most recent turn, or None"""
+        if not self.size:
+            return None
+        return self.turns[(self.head + self.size - 1) % len(self.turns)]
+
+    def history(self):
+        """Turns from oldest to newest"""
+        capacity = len(self.turns)
+        return [self.turns[(self.head + i) % capacity] for i in range(self.size)]
+
+
+class SessionStore:
+    """Bounded in-memory conversation sessions backed by SQLite.
+
+    Sessions live in an LRU-ordered dict. Ones idle for longer than ttl, or
+    the least recently used once max_active is exceeded, are written to the
+    sessions table and dropped from memory; the next request for that id
+    restores them. Memory therefore stays bounded by max_active * max_turns
+    no matter how many users have ever chatted. Spilled sessions not
+    updated for `retention` seconds are deleted by purge(); the maintenance
+    thread runs expire() and purge() periodically.
+    """
+
+    def __init__(self, path, max_active=100000, max_turns=8, ttl=1800, pool_size=4, retention=86400,
+                 clock=time.monotonic, wall_clock=time.time):
+        self.path = path
+        self.max_active = max_active
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.retention = retention
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.pool = ConnectionPool(path, max_size=pool_size)
+        self._sessions = OrderedDict()
+        # Evicted sessions not yet written; reads check here before SQLite
+        self._spilling = {}
+        self._lock = threading.Lock()
+        # Spills are written one at a time, so an older copy of a session
+        # never overwrites a newer one
+        self._spill_lock = threading.Lock()
+        self._maintenance = None
+        self._stop_maintenance = threading.Event()
+        self.spilled = 0
+        self.restored = 0
+        self.purged = 0
+
+    def initialize(self):
+        """Create the sessions table if needed"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.pool.connection() as conn:
+            with open(SCHEMA_PATH, 'r') as f:
+                conn.executescript(f.read())
+        return self
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, create=False):
+        """Return the session for an id (restoring it from SQLite), or None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_seen = self.clock()
+                return session
+            session = self._spilling.get(session_id)
+
+        if session is None:
+            session = self._restore(session_id)
+        if session is None and not create:
+            return None
+
+        with self._lock:
+            # Another request may have admitted the session meanwhile
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                session = existing
+            elif session is None:
+                session = Session(self.max_turns)
+            session.last_seen = self.clock()
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            evicted = self._evict()
+        self._spill(evicted)
+        return session
+
+    def record(self, session_id, turn):
+        """Append a turn to a session, creating or restoring it if needed.
+
+        The turn is only appended under the lock to the session currently
+        held in memory, so an eviction either copies it or happened first
+        and the session is admitted again before the append.
+        """
+        while True:
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is not None:
+                    self._sessions.move_to_end(session_id)
+                    session.last_seen = self.clock()
+                    session.append(turn)
+                    return session
+            self.get(session_id, create=True)
+
+    def _evict(self):
+        """Pop expired and over-capacity sessions; caller holds the lock"""
+        evicted = []
+        cutoff = self.clock() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_active and session.last_seen >= cutoff:
+                break
+            del self._sessions[session_id]
+            self._spilling[session_id] = session
+            evicted.append((session_id, session))
+        return evicted
+
+    def expire(self):
+        """Spill every session idle for longer than ttl"""
+        with self._lock:
+            evicted = self._evict()
+        self._spill(evicted)
+        return len(evicted)
+
+    def _spill(self, evicted):
+        if not evicted:
+            return
+        with self._spill_lock:
+            now = self.wall_clock()
+            with self._lock:
+                rows = [
+                    (session_id, now, json.dumps([turn.to_row() for turn in session.history()]))
+                    for session_id, session in evicted
+                ]
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.executemany(SPILL_SESSION, rows)
+            with self._lock:
+                for session_id, session in evicted:
+                    if self._spilling.get(session_id) is session:
+                        del self._spilling[session_id]
+                self.spilled += len(evicted)
+
+    def purge(self):
+        """Delete spilled sessions not updated for longer than retention"""
+        if not self.retention:
+            return 0
+        with self._spill_lock:
+            with self.pool.connection() as conn:
+                with conn:
+                    purged = conn.execute(PURGE_SESSIONS, (self.wall_clock() - self.retention,)).rowcount
+        with self._lock:
+            self.purged += purged
+        return purged
+
+    def start_maintenance(self, interval=60.0):
+        """Expire idle sessions and purge old spilled ones in a daemon thread"""
+        if self._maintenance is not None:
+            return self._maintenance
+        self._stop_maintenance.clear()
+
+        def maintain():
+            while not self._stop_maintenance.wait(interval):
+                try:
+                    self.expire()
+                    self.purge()
+                except Exception as e:
+                    print(f"⚠️  Session maintenance failed: {e}")
+
+        self._maintenance = threading.Thread(target=maintain, name='session-maintenance', daemon=True)
+        self._maintenance.start()
+        return self._maintenance
+
+    def stop_maintenance(self):
+        self._stop_maintenance.set()
+        if self._maintenance is not None:
+            self._maintenance.join()
+            self._maintenance = None
+
+    def _restore(self, session_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(RESTORE_SESSION, (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = Session(self.max_turns)
+        for turn in json.loads(row[0]):
+            session.append(Turn.from_row(turn))
+        with self._lock:
+            self.restored += 1
+        return session
+
+    def flush(self):
+        """Write every in-memory session to SQLite (they stay in memory)"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        self._spill(sessions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_active': self.max_active,
+                'spilled': self.spilled,
+                'restored': self.restored,
+                'purged': self.purged
+            }
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,42 @@
+import hmac
+import os
+
+from flask import Blueprint, current_app, jsonify, request
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+# Without ADMIN_TOKEN, only requests from the machine itself are let through
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _authorized():
+    """Check the X-Admin-Token header, or require a loopback client when no token is configured"""
+    token = current_app.config.get('ADMIN_TOKEN') or os.environ.get('ADMIN_TOKEN')
+    if not token:
+        return request.remote_addr in LOOPBACK_ADDRESSES
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+@admin_bp.route('/reload', methods=['POST'])
+def reload_data():
+    """Re-read faqs.json and knowledge_base.json and swap in the new data.
+
+    Unchanged files are skipped unless ?force=true asks for a full rebuild.
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid admin token'}), 403
+
+    store = current_app.extensions['knowledge_store']
+    force = request.args.get('force', 'false').lower() == 'true'
+    reloaded = store.reload(force=force)
+    status = store.status()
+    status['reloaded'] = reloaded
+    return jsonify(status), 200 if reloaded or not status['last_error'] else 500
+
+
+@admin_bp.route('/status', methods=['GET'])
+def data_status():
+    """Current data version and load state"""
+    if not _authorized():
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return jsonify(current_app.extensions['knowledge_store'].status())
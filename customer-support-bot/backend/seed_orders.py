@@ -0,0 +1,70 @@
+"""Seed the local SQLite order database with synthetic orders.
+
+    python seed_orders.py --count 1000000 [--db ../database/orders.db]
+
+The schema and the three sample orders are always created; --count adds
+generated orders ORD-100000, ORD-100001, ... on top of them.
+"""
+import argparse
+import os
+import random
+import time
+
+from models.database import OrderStore
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+STATUSES = ('processing', 'shipped', 'delivered')
+PRODUCTS = (
+    'TechBook Pro TB2023', 'TechBook Pro TB2024', 'GamerX Laptop GX15', 'GamerX Laptop GX17 Pro',
+    'SmartPhone X SPX12', 'SmartPhone X SPX13 Pro', 'Wireless Earbuds WE100', 'Wireless Earbuds WE300 Pro'
+)
+CARRIERS = ('UPS', 'FedEx', 'USPS', 'DHL')
+STREETS = ('Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln')
+
+
+def synthetic_orders(count, start=100000, seed=42):
+    """Yield (order_number, order) pairs shaped like the sample orders"""
+    rng = random.Random(seed)
+    for number in range(start, start + count):
+        status = rng.choice(STATUSES)
+        order = {
+            'status': status,
+            'product': rng.choice(PRODUCTS),
+            'carrier': rng.choice(CARRIERS),
+            'shipping_address': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, City, State {rng.randint(10000, 99999)}"
+        }
+        day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        if status == 'delivered':
+            order['delivery_date'] = day
+        else:
+            order['estimated_delivery'] = day
+        if status != 'processing':
+            order['tracking_number'] = f"1Z{rng.randrange(16 ** 16):016X}"
+        yield f"ORD-{number}", order
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed the local order database')
+    parser.add_argument('--db', default=os.environ.get('ORDERS_DB_PATH') or os.path.join(base_dir, '..', 'database', 'orders.db'))
+    parser.add_argument('--count', type=int, default=0, help='number of synthetic orders to add')
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    store = OrderStore(args.db).initialize()
+    start = time.perf_counter()
+    batch = []
+    for item in synthetic_orders(args.count):
+        batch.append(item)
+        if len(batch) >= args.batch_size:
+            store.insert_many(batch)
+            batch = []
+    if batch:
+        store.insert_many(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {store.count()} orders in {args.db} ({args.count} generated in {elapsed:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Reasons a request is shed, as reported in the counters
+RATE_LIMITED = 'rate_limited'
+OVERLOADED = 'overloaded'
+
+# Weight of the newest request in the moving average of service time
+LATENCY_SMOOTHING = 0.2
+
+
+class Rejection:
+    """Why a request was turned away and when the client may retry"""
+
+    __slots__ = ('status', 'reason', 'retry_after')
+
+    def __init__(self, status, reason, retry_after):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def body(self):
+        if self.reason == RATE_LIMITED:
+            return {'error': 'Too many requests, slow down', 'retry_after': self.retry_after}
+        return {'error': 'Server is busy, try again shortly', 'retry_after': self.retry_after}
+
+
+class AdmissionController:
+    """Admission control in front of the chat and order routes.
+
+    Each client gets a token bucket (rate tokens per second, up to burst);
+    a client with an empty bucket gets 429. Across all clients at most
+    max_in_flight requests run at once. Beyond `concurrency` in-flight
+    requests the rest are queued behind the workers, so a request is also
+    refused with 503 when the expected wait (queued requests times the
+    moving average service time, spread over the workers) exceeds
+    latency_budget. Refusing at once keeps the latency of admitted
+    requests bounded during spikes instead of every client slowing down.
+
+    Buckets are kept for the max_clients most recently seen clients.
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_in_flight=64, concurrency=8, latency_budget=0.5,
+                 max_clients=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.concurrency = concurrency
+        self.latency_budget = latency_budget
+        self.max_clients = max_clients
+        self.clock = clock
+        self.in_flight = 0
+        self.average_latency = 0.0
+        self.admitted = 0
+        self.shed = {RATE_LIMITED: 0, OVERLOADED: 0}
+        # client -> (tokens, last refill time), least recently seen first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _take_token(self, client, now):
+        """Spend one of the client's tokens; returns seconds until one is available, or 0"""
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def _expected_wait(self):
+        queued = self.in_flight + 1 - self.concurrency
+        if queued <= 0:
+            return 0.0
+        return queued * self.average_latency / self.concurrency
+
+    def admit(self, client):
+        """Admit a request (call release() when it finishes), or return a Rejection"""
+        with self._lock:
+            now = self.clock()
+            if self.rate > 0:
+                wait = self._take_token(client, now)
+                if wait:
+                    self.shed[RATE_LIMITED] += 1
+                    return Rejection(429, RATE_LIMITED, max(1, math.ceil(wait)))
+            expected_wait = self._expected_wait()
+            if self.in_flight >= self.max_in_flight or expected_wait > self.latency_budget:
+                self.shed[OVERLOADED] += 1
+                return Rejection(503, OVERLOADED, max(1, math.ceil(expected_wait)))
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+
+    def release(self, seconds=None):
+        """Mark an admitted request finished, folding its duration into the average"""
+        with self._lock:
+            self.in_flight -= 1
+            if seconds is not None:
+                if self.average_latency:
+                    self.average_latency += LATENCY_SMOOTHING * (seconds - self.average_latency)
+                else:
+                    self.average_latency = seconds
+
+    def reset(self):
+        """Forget every client's bucket, e.g. between tests sharing one address"""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'shed': dict(self.shed),
+                'average_latency_ms': round(self.average_latency * 1000, 3),
+                'clients': len(self._buckets)
+            }
+
+    def collect(self):
+        """Metric families for MetricsRegistry.register_collector"""
+        stats = self.stats()
+        return [
+            ('admission_in_flight', 'gauge', 'Admitted requests currently running', [({}, stats['in_flight'])]),
+            ('admission_admitted_total', 'counter', 'Requests admitted', [({}, stats['admitted'])]),
+            ('admission_shed_total', 'counter', 'Requests refused by admission control',
+             [({'reason': reason}, count) for reason, count in sorted(stats['shed'].items())])
+        ]
@@ -0,0 +1,339 @@
+import itertools
+import math
+import threading
+import time
+from bisect import bisect_left
+
+# Number of independently locked shards per metric
+DEFAULT_STRIPES = 16
+
+_stripe_ids = itertools.count()
+_thread_state = threading.local()
+
+
+def _stripe_index(stripes):
+    """Stable shard index for the calling thread, assigned round-robin"""
+    index = getattr(_thread_state, 'stripe', None)
+    if index is None:
+        index = _thread_state.stripe = next(_stripe_ids)
+    return index % stripes
+
+
+class StripedCounter:
+    """Named counters spread over lock stripes.
+
+    Each thread always writes to the same stripe, so concurrent requests
+    rarely contend for a lock; reads add the stripes together.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+
+    def incr(self, name, amount=1):
+        lock, counts = self._stripes[_stripe_index(len(self._stripes))]
+        with lock:
+            counts[name] = counts.get(name, 0) + amount
+
+    def values(self):
+        totals = {}
+        for lock, counts in self._stripes:
+            with lock:
+                for name, value in counts.items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def get(self, name):
+        return self.values().get(name, 0)
+
+
+class LatencySketch:
+    """Streaming quantile sketch with fixed memory and bounded relative error.
+
+    Values fall into logarithmic buckets (DDSketch style), so any quantile
+    is reported within relative_accuracy of the true value. Values outside
+    [min_value, max_value] are clamped to the end buckets.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-5, max_value=100.0, stripes=DEFAULT_STRIPES):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.bucket_count = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 1
+        self._stripes = [
+            (threading.Lock(), [0] * self.bucket_count, [0, 0.0])
+            for _ in range(stripes)
+        ]
+
+    def _bucket(self, value):
+        if value <= self.min_value:
+            return 0
+        index = int(math.ceil(math.log(value / self.min_value) / self._log_gamma))
+        return min(index, self.bucket_count - 1)
+
+    def record(self, value):
+        bucket = self._bucket(value)
+        lock, buckets, totals = self._stripes[_stripe_index(len(self._stripes))]
+        with lock:
+            buckets[bucket] += 1
+            totals[0] += 1
+            totals[1] += value
+
+    def _merged(self):
+        merged = [0] * self.bucket_count
+        count = 0
+        total = 0.0
+        for lock, buckets, totals in self._stripes:
+            with lock:
+                for i, value in enumerate(buckets):
+                    if value:
+                        merged[i] += value
+                count += totals[0]
+                total += totals[1]
+        return merged, count, total
+
+    def _bucket_value(self, index):
+        if index == 0:
+            return self.min_value
+        # Midpoint of (min * gamma^(i-1), min * gamma^i] in relative terms
+        return self.min_value * 2 * self.gamma ** index / (self.gamma + 1)
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        """Return count, mean and the requested quantiles (in recorded units)"""
+        merged, count, total = self._merged()
+        result = {'count': count, 'mean': total / count if count else 0.0}
+        for q in quantiles:
+            result[q] = 0.0
+        if not count:
+            return result
+        for q in quantiles:
+            rank = q * (count - 1)
+            seen = 0
+            for index, value in enumerate(merged):
+                seen += value
+                if seen > rank:
+                    result[q] = self._bucket_value(index)
+                    break
+        return result
+
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS, stripes=DEFAULT_STRIPES):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+
+    def observe(self, labels, value):
+        """Record value (seconds) for a tuple of label values"""
+        bucket = bisect_left(self.buckets, value)
+        lock, series = self._stripes[_stripe_index(len(self._stripes))]
+        with lock:
+            counts = series.get(labels)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the running sum
+                counts = series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def collect(self):
+        """Return {labels: (cumulative bucket counts, sum, count)}"""
+        merged = {}
+        for lock, series in self._stripes:
+            with lock:
+                for labels, counts in series.items():
+                    target = merged.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+                    for i, value in enumerate(counts):
+                        target[i] += value
+        result = {}
+        for labels, counts in merged.items():
+            cumulative = list(itertools.accumulate(counts[:-1]))
+            result[labels] = (cumulative, counts[-1], cumulative[-1])
+        return result
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (cumulative, total, count) in sorted(self.collect().items()):
+            for bound, value in zip(self.buckets + (math.inf,), cumulative):
+                le = ('le', _format_value(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {value}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class _StageTimer:
+    """Times one pipeline stage into a histogram"""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(self.labels, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """Stand-in timer used while metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Stage and route latency histograms exposed in Prometheus text format.
+
+    When disabled, stage() hands back a shared no-op timer and nothing is
+    recorded, so instrumented code costs one attribute check.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.stages = Histogram(
+            'chat_stage_duration_seconds', 'Time spent in each chat pipeline stage', ('stage',), buckets)
+        self.requests = Histogram(
+            'http_request_duration_seconds', 'HTTP request latency by route', ('route', 'method', 'status'), buckets)
+        self._collectors = []
+
+    def stage(self, name):
+        """Context manager timing a pipeline stage"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self.stages, (name,))
+
+    def observe_request(self, route, method, status, seconds):
+        if self.enabled:
+            self.requests.observe((route, method, str(status)), seconds)
+
+    def register_collector(self, collector):
+        """Add collector() -> [(name, type, help, [(labels dict, value)])] to the exposition"""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = self.stages.render() + self.requests.render()
+        for collector in self._collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# FAQ categories reported under the dashboard's topic names
+TOPIC_BY_FAQ_CATEGORY = {
+    'order_related': 'order_status',
+    'technical_support': 'technical_support',
+    'return_refund': 'refund_returns',
+    'billing_payment': 'billing',
+    'account_management': 'account',
+    'product_questions': 'product_questions'
+}
+
+CHAT_INTENTS = ('order_status', 'faq', 'general', 'empty', 'error')
+
+
+class ChatAnalytics:
+    """Live conversation counters and response latency for /api/analytics"""
+
+    def __init__(self):
+        self.counters = StripedCounter()
+        self.latency = LatencySketch()
+
+    def record(self, intent, latency=None, faq_category=None):
+        """Count one answered message; latency in seconds when known"""
+        self.counters.incr('conversations')
+        self.counters.incr(f'intent:{intent}')
+        if intent == 'order_status':
+            self.counters.incr('topic:order_status')
+        elif faq_category is not None:
+            self.counters.incr(f"topic:{TOPIC_BY_FAQ_CATEGORY.get(faq_category, faq_category)}")
+        if latency is not None:
+            self.latency.record(latency)
+
+    def collect(self):
+        """Conversation counters for the /metrics exposition"""
+        counts = self.counters.values()
+        return [(
+            'chat_messages_total', 'counter', 'Chat messages answered, by intent',
+            [({'intent': intent}, counts.get(f'intent:{intent}', 0)) for intent in CHAT_INTENTS]
+        )]
+
+    def report(self, cache_stats=None):
+        """Aggregate counters in the /api/analytics response shape"""
+        counts = self.counters.values()
+        total = counts.get('conversations', 0)
+        intents = {intent: counts.get(f'intent:{intent}', 0) for intent in CHAT_INTENTS}
+        resolved = intents['order_status'] + intents['faq']
+        topics = dict.fromkeys(('order_status', 'technical_support', 'refund_returns', 'billing'), 0)
+        for name, value in counts.items():
+            if name.startswith('topic:'):
+                topics[name[len('topic:'):]] = value
+        topic_total = sum(topics.values())
+        latency = self.latency.summary()
+
+        return {
+            'total_conversations': total,
+            'resolution_rate': round(resolved * 100 / total, 1) if total else 0,
+            # Messages the bot could not resolve and would hand to an agent
+            'escalations': intents['general'],
+            # No customer ratings are collected yet
+            'satisfaction': 0,
+            'average_response_time': f"{latency['mean']:.3f}s",
+            'response_time_ms': {
+                'p50': round(latency[0.5] * 1000, 3),
+                'p95': round(latency[0.95] * 1000, 3),
+                'p99': round(latency[0.99] * 1000, 3)
+            },
+            # Share of topic-tagged messages per topic, in whole percent
+            'common_intents': {
+                topic: round(value * 100 / topic_total) if topic_total else 0
+                for topic, value in topics.items()
+            },
+            'intent_counts': topics,
+            'intents': intents,
+            'cache': cache_stats or {}
+        }
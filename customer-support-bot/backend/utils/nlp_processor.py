@@ -0,0 +1,660 @@
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# Greetings and very short messages never match a FAQ
+GREETINGS = ('hello', 'hi', 'hey')
+
+# Number of leading question words checked against the message
+QUESTION_PREFIX_WORDS = 5
+
+# Order number mentioned in a chat message; the id is captured in a
+# lookahead so the extractor keeps scanning the id for other entities
+ORDER_MENTION = r'(?:order|ord)\s*(?:number)?\s*[#]?\s*(?=(?P<order>[a-z0-9]{3,}-?[a-z0-9]+))'
+
+EMAIL_MENTION = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+
+URGENCY_KEYWORDS = ('urgent', 'urgently', 'asap', 'emergency', 'immediately', 'right away', 'critical')
+
+# Issue categories follow technical_support.common_issues in knowledge_base.json
+ISSUE_KEYWORDS = {
+    'device_not_turning_on': ('wont turn on', "won't turn on", 'not turning on', 'not starting', 'no power', 'dead'),
+    'slow_performance': ('slow', 'lagging', 'freezing', 'frozen', 'unresponsive'),
+    'connectivity_issues': ('wifi', 'internet', 'connection', 'bluetooth', 'not connecting', 'network'),
+    'battery_drain': ('battery', 'draining', 'not charging'),
+    'crashing': ('crash', 'crashes', 'crashing', 'keeps restarting'),
+    'physical_damage': ('broken', 'cracked', 'damaged', 'water damage')
+}
+
+# Generic device words that count as a product mention
+DEVICE_KEYWORDS = ('laptop', 'computer', 'phone', 'smartphone', 'earbuds', 'headphones', 'device', 'tablet')
+
+# Follow-ups about the order from the previous turn ("and when will it
+# arrive?") refer back to it and mention an order topic
+FOLLOW_UP_REFERENCE = re.compile(
+    r"^(?:and|so|also|but|ok|okay|then)\b|\b(?:it|it's|its|that one|this one|the order|my order|the package)\b")
+ORDER_TOPIC = re.compile(r'\b(?:arriv\w*|deliver\w*|ship(?:s|ped|ping)?|track\w*|status|carrier|eta)\b')
+
+# Order number clean-up rules
+ORDER_PREFIX_PATTERN = re.compile(r'^(ORDER|ORD|#)\s*')
+DIGITS_PATTERN = re.compile(r'(\d+)')
+
+
+def normalize_order_number(order_number):
+    """Normalize a raw order reference to the ORD-<digits> form, or None"""
+    if not order_number:
+        return None
+
+    # Clean and normalize order number
+    clean_order = order_number.upper().strip()
+
+    # Remove common prefixes and clean up
+    clean_order = ORDER_PREFIX_PATTERN.sub('', clean_order)
+    clean_order = clean_order.replace(' ', '')
+
+    # Ensure it has the ORD- prefix
+    if not clean_order.startswith('ORD-'):
+        # If it's just numbers, add ORD- prefix
+        if clean_order.isdigit():
+            clean_order = f"ORD-{clean_order}"
+        else:
+            # If it has numbers but no prefix, try to format it
+            match = DIGITS_PATTERN.search(clean_order)
+            if match:
+                clean_order = f"ORD-{match.group(1)}"
+            else:
+                # If no numbers found, it's invalid
+                return None
+
+    return clean_order
+
+
+def is_order_follow_up(normalized):
+    """True when a lower-cased message asks about a previously mentioned order"""
+    return bool(FOLLOW_UP_REFERENCE.search(normalized) and ORDER_TOPIC.search(normalized))
+
+
+class StringTable:
+    """Sorted, immutable table of strings stored as one UTF-8 blob plus offsets"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array('i', [0])
+        encoded = []
+        total = 0
+        for value in strings:
+            data = value.encode('utf-8')
+            encoded.append(data)
+            total += len(data)
+            offsets.append(total)
+        return cls(b''.join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return bytes(self.blob[self.offsets[position]:self.offsets[position + 1]]).decode('utf-8')
+
+    def find(self, value):
+        """Return the position of value in the table, or -1"""
+        position = bisect_left(self, value)
+        if position < len(self) and self[position] == value:
+            return position
+        return -1
+
+
+# Shortest message word considered for spelling correction, and the
+# shortest allowed a second edit
+MIN_CORRECTION_LENGTH = 4
+TWO_EDIT_LENGTH = 8
+
+# Edits covered by the delete index compiled into every FAQIndex; larger
+# max_edit_distance settings are capped to it
+MAX_CORRECTION_DISTANCE = 2
+
+# Lowest FAQ score accepted for the regular and the spell-corrected
+# message; a corrected match is a guess, so it must score higher
+MIN_MATCH_SCORE = 2
+CORRECTED_MIN_SCORE = 3
+
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+# General English words, which are left alone even when they sit a couple
+# of edits from a FAQ keyword ("service" is not a typo for "device")
+COMMON_WORDS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'common_words.txt')
+_common_words = None
+
+
+def common_words():
+    """The general word list, read on first use (empty when the file is missing)"""
+    global _common_words
+    if _common_words is None:
+        try:
+            with open(COMMON_WORDS_PATH, 'r') as f:
+                _common_words = frozenset(line.strip() for line in f if line.strip())
+        except OSError:
+            _common_words = frozenset()
+    return _common_words
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between a and b, or limit + 1 when it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+def _deletes(word, distance):
+    """Every string reachable from word by deleting up to distance characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        found |= frontier
+    return found
+
+
+class SpellingCorrector:
+    """SymSpell-style correction of message words to the FAQ vocabulary.
+
+    Every vocabulary word is indexed under all the strings obtained by
+    deleting up to MAX_CORRECTION_DISTANCE of its characters (FAQIndex
+    compiles that table). A misspelt word then only needs its own deletes
+    looked up: two words within max_distance edits always share one, so
+    candidates come from a few table probes rather than a comparison
+    against every keyword. Candidates are checked with a bounded edit
+    distance; the closest wins, then the word used by the most FAQs, then
+    the alphabetically first. Words in dictionary are real words and never
+    corrected.
+
+    vocabulary and deletes are StringTables; delete_offsets/delete_words
+    list the vocabulary rows under each delete, so the corrector only
+    reads the index's flat arrays and can share a mapped artifact.
+    """
+
+    def __init__(self, vocabulary, counts, deletes, delete_offsets, delete_words, max_distance=2,
+                 dictionary=frozenset()):
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.deletes = deletes
+        self.delete_offsets = delete_offsets
+        self.delete_words = delete_words
+        self.max_distance = min(max_distance, MAX_CORRECTION_DISTANCE)
+        self.dictionary = dictionary
+
+    def correct_word(self, word):
+        """The vocabulary word closest to word, or None when nothing is close enough"""
+        if len(word) < MIN_CORRECTION_LENGTH or word in self.dictionary:
+            return None
+        limit = self.max_distance if len(word) >= TWO_EDIT_LENGTH else min(1, self.max_distance)
+        best = None
+        best_key = None
+        seen = set()
+        for variant in _deletes(word, limit):
+            row = self.deletes.find(variant)
+            if row < 0:
+                continue
+            for position in self.delete_words[self.delete_offsets[row]:self.delete_offsets[row + 1]]:
+                if position in seen:
+                    continue
+                seen.add(position)
+                candidate = self.vocabulary[position]
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                key = (distance, -self.counts[position], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    def correct(self, text):
+        """text with every unknown word replaced by its correction, or None when nothing changed"""
+        changed = False
+
+        def replace(match):
+            nonlocal changed
+            word = match.group()
+            if self.vocabulary.find(word) >= 0:
+                return word
+            correction = self.correct_word(word)
+            if correction is None:
+                return word
+            changed = True
+            return correction
+
+        corrected = WORD_PATTERN.sub(replace, text)
+        return corrected if changed else None
+
+
+def _postings(values, lo, hi, shards=None):
+    """Slices of the ascending positions values[lo:hi] inside the [start, end) ranges of shards"""
+    if shards is None:
+        return (values[lo:hi],)
+    return [values[bisect_left(values, start, lo, hi):bisect_left(values, end, lo, hi)] for start, end in shards]
+
+
+def _csr(rows, size):
+    """Flatten a {row: [values]} mapping into (offsets, values) arrays"""
+    offsets = array('i', [0])
+    values = array('i')
+    for row in range(size):
+        values.extend(rows.get(row, ()))
+        offsets.append(len(values))
+    return offsets, values
+
+
+class FAQIndex:
+    """Precompiled index for FAQ matching.
+
+    Keywords and leading question words are compiled into an Aho-Corasick
+    automaton, so every substring test of the original scoring loop is
+    answered by a single pass over the message. Question tokens go into a
+    token -> FAQ postings table for the word-overlap check. Scores follow
+    the same rules as the original loop: +3 when at least two of the first
+    five question words appear in a message (questions longer than three
+    words only), +1 per keyword, +2 for two or more keywords and -2 when no
+    message word is shared with the question. Only FAQs reaching 2 count.
+
+    The words of every question and keyword also form a vocabulary for
+    typo tolerance: match() can retry a message that found nothing with
+    its misspelt words corrected (see SpellingCorrector). The delete index
+    the corrector probes is compiled here too, so it is mapped with the
+    rest of an artifact instead of being rebuilt in every worker.
+
+    All structures are flat integer arrays so the index can be written to
+    disk and read back without rebuilding it. Postings list FAQ positions
+    in ascending order, so scoring can be limited to shards (position
+    ranges, e.g. the categories an intent classifier picked) by bisecting
+    each list instead of walking all of it.
+    """
+
+    # Flat arrays making up a compiled index, in serialization order
+    ARRAY_FIELDS = (
+        'edge_offsets', 'edge_chars', 'edge_targets', 'fail', 'output_link', 'state_pattern',
+        'keyword_offsets', 'keyword_faqs', 'question_offsets', 'question_faqs',
+        'token_offsets', 'token_faqs', 'token_string_offsets', 'always_keywords',
+        'vocabulary_offsets', 'vocabulary_counts', 'delete_string_offsets', 'delete_offsets', 'delete_words'
+    )
+    BYTES_FIELDS = ('long_questions', 'token_blob', 'vocabulary_blob', 'delete_blob')
+
+    def __init__(self, entries, arrays=None):
+        # entries: sequence of (category, faq) in matching order
+        self.entries = entries
+        if arrays is None:
+            self._build()
+        else:
+            # Precompiled arrays, e.g. memoryviews over a mapped artifact
+            for name in self.ARRAY_FIELDS + self.BYTES_FIELDS:
+                setattr(self, name, arrays[name])
+            self.pattern_count = len(self.keyword_offsets) - 1
+        self.tokens = StringTable(self.token_blob, self.token_string_offsets)
+        self.vocabulary = StringTable(self.vocabulary_blob, self.vocabulary_offsets)
+        self.deletes = StringTable(self.delete_blob, self.delete_string_offsets)
+        # max edit distance -> SpellingCorrector, built on first use
+        self._correctors = {}
+
+    def arrays(self):
+        """Return the compiled structures by name, for serialization"""
+        return {name: getattr(self, name) for name in self.ARRAY_FIELDS + self.BYTES_FIELDS}
+
+    @classmethod
+    def from_faqs(cls, faqs):
+        """Build an index from the {category: [faq, ...]} layout of faqs.json"""
+        entries = [(category, faq) for category, questions in faqs.items() for faq in questions]
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _build(self):
+        patterns = {}
+        keyword_postings = {}
+        question_postings = {}
+        token_postings = {}
+        vocabulary = {}
+        always_keywords = array('i')
+        long_questions = bytearray()
+
+        def pattern_id(text):
+            if text not in patterns:
+                patterns[text] = len(patterns)
+            return patterns[text]
+
+        for position, (_, faq) in enumerate(self.entries):
+            question_words = faq['question'].lower().split()
+            is_long = len(question_words) > 3
+            long_questions.append(1 if is_long else 0)
+            if is_long:
+                for word in question_words[:QUESTION_PREFIX_WORDS]:
+                    question_postings.setdefault(pattern_id(word), []).append(position)
+            for keyword in faq.get('keywords', []):
+                if not keyword:
+                    # An empty keyword is a substring of every message
+                    always_keywords.append(position)
+                    continue
+                keyword_postings.setdefault(pattern_id(keyword), []).append(position)
+            for word in set(question_words):
+                token_postings.setdefault(word, []).append(position)
+            text = ' '.join([faq['question'].lower()] + faq.get('keywords', []))
+            for word in set(WORD_PATTERN.findall(text)):
+                vocabulary[word] = vocabulary.get(word, 0) + 1
+
+        self.pattern_count = len(patterns)
+        self.always_keywords = always_keywords
+        self.long_questions = bytes(long_questions)
+        self.keyword_offsets, self.keyword_faqs = _csr(keyword_postings, self.pattern_count)
+        self.question_offsets, self.question_faqs = _csr(question_postings, self.pattern_count)
+
+        tokens = sorted(token_postings)
+        table = StringTable.from_strings(tokens)
+        self.token_blob = table.blob
+        self.token_string_offsets = table.offsets
+        self.token_offsets, self.token_faqs = _csr(
+            {row: token_postings[token] for row, token in enumerate(tokens)}, len(tokens))
+
+        words = sorted(vocabulary)
+        table = StringTable.from_strings(words)
+        self.vocabulary_blob = table.blob
+        self.vocabulary_offsets = table.offsets
+        self.vocabulary_counts = array('i', [vocabulary[word] for word in words])
+        self._build_deletes(words)
+
+        self._build_automaton(patterns)
+
+    def _build_deletes(self, words):
+        """Delete strings of the vocabulary (sorted) and the vocabulary rows under each"""
+        postings = {}
+        for row, word in enumerate(words):
+            for variant in _deletes(word, MAX_CORRECTION_DISTANCE):
+                postings.setdefault(variant, []).append(row)
+        variants = sorted(postings)
+        table = StringTable.from_strings(variants)
+        self.delete_blob = table.blob
+        self.delete_string_offsets = table.offsets
+        self.delete_offsets, self.delete_words = _csr(
+            {row: postings[variant] for row, variant in enumerate(variants)}, len(variants))
+
+    def _build_automaton(self, patterns):
+        goto = [{}]
+        state_pattern = [-1]
+        for text, pid in patterns.items():
+            state = 0
+            for char in text:
+                code = ord(char)
+                if code not in goto[state]:
+                    goto[state][code] = len(goto)
+                    goto.append({})
+                    state_pattern.append(-1)
+                state = goto[state][code]
+            state_pattern[state] = pid
+
+        fail = [0] * len(goto)
+        output_link = [-1] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for code, target in goto[state].items():
+                queue.append(target)
+                fallback = fail[state]
+                while fallback and code not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[target] = goto[fallback].get(code, 0)
+                suffix = fail[target]
+                output_link[target] = suffix if state_pattern[suffix] >= 0 else output_link[suffix]
+
+        edges = {state: sorted(transitions.items()) for state, transitions in enumerate(goto)}
+        self.edge_offsets = array('i', [0])
+        self.edge_chars = array('i')
+        self.edge_targets = array('i')
+        for state in range(len(goto)):
+            for code, target in edges[state]:
+                self.edge_chars.append(code)
+                self.edge_targets.append(target)
+            self.edge_offsets.append(len(self.edge_chars))
+        self.fail = array('i', fail)
+        self.output_link = array('i', output_link)
+        self.state_pattern = array('i', state_pattern)
+
+    def _step(self, state, code):
+        edge_offsets = self.edge_offsets
+        edge_chars = self.edge_chars
+        while True:
+            lo = edge_offsets[state]
+            hi = edge_offsets[state + 1]
+            if lo < hi:
+                position = bisect_left(edge_chars, code, lo, hi)
+                if position < hi and edge_chars[position] == code:
+                    return self.edge_targets[position]
+            if state == 0:
+                return 0
+            state = self.fail[state]
+
+    def scan(self, text):
+        """Return the set of pattern ids occurring anywhere in text"""
+        found = set()
+        state = 0
+        state_pattern = self.state_pattern
+        output_link = self.output_link
+        for char in text:
+            state = self._step(state, ord(char))
+            hit = state if state_pattern[state] >= 0 else output_link[state]
+            while hit >= 0 and state_pattern[hit] not in found:
+                found.add(state_pattern[hit])
+                hit = output_link[hit]
+        return found
+
+    def scores(self, text, shards=None):
+        """Score every FAQ that can reach the threshold for a lowercased message.
+
+        shards optionally limits scoring to FAQs in those [start, end) position ranges.
+        """
+        keyword_hits = {}
+        question_hits = {}
+        for postings in _postings(self.always_keywords, 0, len(self.always_keywords), shards):
+            for position in postings:
+                keyword_hits[position] = keyword_hits.get(position, 0) + 1
+        for pid in self.scan(text):
+            for postings in _postings(self.keyword_faqs, self.keyword_offsets[pid], self.keyword_offsets[pid + 1], shards):
+                for position in postings:
+                    keyword_hits[position] = keyword_hits.get(position, 0) + 1
+            for postings in _postings(self.question_faqs, self.question_offsets[pid], self.question_offsets[pid + 1], shards):
+                for position in postings:
+                    question_hits[position] = question_hits.get(position, 0) + 1
+
+        overlapping = set()
+        for token in set(text.split()):
+            row = self.tokens.find(token)
+            if row >= 0:
+                for postings in _postings(self.token_faqs, self.token_offsets[row], self.token_offsets[row + 1], shards):
+                    overlapping.update(postings)
+
+        # FAQs outside these three sets score -2 and can never match
+        scores = {}
+        for position in keyword_hits.keys() | question_hits.keys() | overlapping:
+            score = 0
+            if self.long_questions[position] and question_hits.get(position, 0) >= 2:
+                score += 3
+            keyword_matches = keyword_hits.get(position, 0)
+            score += keyword_matches
+            if keyword_matches >= 2:
+                score += 2
+            if position not in overlapping:
+                score -= 2
+            scores[position] = score
+        return scores
+
+    def best(self, text, shards=None, min_score=MIN_MATCH_SCORE):
+        """Return the position of the best FAQ for a lowercased message, or None"""
+        best_position = None
+        highest_score = 0
+        for position, score in self.scores(text, shards).items():
+            if score < min_score:
+                continue
+            # Ties go to the FAQ listed first, as in the original scan
+            if score > highest_score or (score == highest_score and position < best_position):
+                highest_score = score
+                best_position = position
+        return best_position
+
+    def corrector(self, max_distance):
+        """SpellingCorrector over this index's vocabulary and compiled delete table"""
+        corrector = self._correctors.get(max_distance)
+        if corrector is None:
+            corrector = self._correctors[max_distance] = SpellingCorrector(
+                self.vocabulary, self.vocabulary_counts, self.deletes, self.delete_offsets, self.delete_words,
+                max_distance, common_words())
+        return corrector
+
+    def match(self, message, max_edit_distance=0, shards=None):
+        """Return the best (category, faq) entry for a user message, or None.
+
+        With max_edit_distance, a message that matches nothing is scored
+        again with misspelt words corrected to the FAQ vocabulary, and must
+        then reach CORRECTED_MIN_SCORE. shards limits the search to those
+        position ranges.
+        """
+        message_lower = message.lower().strip()
+        # Don't match very short or generic messages
+        if len(message_lower) < 3 or message_lower in GREETINGS:
+            return None
+        position = self.best(message_lower, shards)
+        if position is None and max_edit_distance > 0:
+            corrected = self.corrector(max_edit_distance).correct(message_lower)
+            if corrected is not None:
+                position = self.best(corrected, shards, CORRECTED_MIN_SCORE)
+        if position is None:
+            return None
+        return self.entries[position]
+
+
+def _alternation(terms):
+    """Regex alternation of literal terms, longest first, on word boundaries"""
+    ordered = sorted({term.lower() for term in terms if term}, key=len, reverse=True)
+    if not ordered:
+        return r'(?!)'
+    words = [r'\s+'.join(re.escape(word) for word in term.split()) for term in ordered]
+    return r'\b(?:' + '|'.join(words) + r')\b'
+
+
+class Entities:
+    """Entities found in one message by EntityExtractor"""
+
+    __slots__ = ('normalized', 'order_number', 'order_numbers', 'emails',
+                 'products', 'models', 'devices', 'issues', 'urgent')
+
+    def __init__(self, normalized):
+        self.normalized = normalized
+        self.order_number = None
+        self.order_numbers = []
+        self.emails = []
+        self.products = []
+        self.models = []
+        self.devices = []
+        self.issues = []
+        self.urgent = False
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'normalized'}
+
+
+class EntityExtractor:
+    """Pulls order numbers, emails, products, issues and urgency from a message.
+
+    All patterns are compiled into one alternation and found with a single
+    finditer pass. The order number is captured inside a lookahead so the
+    characters after "order" are still scanned for other entities. An
+    email consumes its whole span, so order mentions starting inside one
+    ("order12345@shop.com") are looked for separately; the first order
+    mention is therefore the same one the old inline regex found.
+    """
+
+    def __init__(self, knowledge_base=None):
+        products = {}
+        models = {}
+        for items in (knowledge_base or {}).get('products', {}).values():
+            for product in items:
+                products[product['name'].lower()] = product['name']
+                for model in product.get('models', []):
+                    models[model.lower()] = (product['name'], model)
+
+        self.products = products
+        self.models = models
+        self.issue_terms = {
+            term: category for category, terms in ISSUE_KEYWORDS.items() for term in terms
+        }
+        self.pattern = re.compile(
+            '|'.join([
+                r'(?P<email>' + EMAIL_MENTION + r')',
+                ORDER_MENTION,
+                r'(?P<model>' + _alternation(models) + r')',
+                r'(?P<product>' + _alternation(products) + r')',
+                r'(?P<device>' + _alternation(DEVICE_KEYWORDS) + r')',
+                r'(?P<issue>' + _alternation(self.issue_terms) + r')',
+                r'(?P<urgency>' + _alternation(URGENCY_KEYWORDS) + r')'
+            ]),
+            re.IGNORECASE
+        )
+        self.order_pattern = re.compile(ORDER_MENTION, re.IGNORECASE)
+
+    def _orders_in(self, message, start, end):
+        """Order numbers of the mentions starting in message[start:end]"""
+        found = []
+        for match in self.order_pattern.finditer(message, start):
+            if match.start() >= end:
+                break
+            found.append(match.group('order'))
+        return found
+
+    def extract(self, message):
+        """Scan a message once and return its Entities"""
+        entities = Entities(message.lower().strip())
+        for match in self.pattern.finditer(message):
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'order':
+                if value not in entities.order_numbers:
+                    entities.order_numbers.append(value)
+            elif kind == 'email':
+                entities.emails.append(value)
+                if 'ord' in value.lower():
+                    for order in self._orders_in(message, match.start(), match.end()):
+                        if order not in entities.order_numbers:
+                            entities.order_numbers.append(order)
+            elif kind == 'model':
+                name, model = self.models[' '.join(value.lower().split())]
+                if model not in entities.models:
+                    entities.models.append(model)
+                if name not in entities.products:
+                    entities.products.append(name)
+            elif kind == 'product':
+                name = self.products[' '.join(value.lower().split())]
+                if name not in entities.products:
+                    entities.products.append(name)
+            elif kind == 'device':
+                entities.devices.append(value.lower())
+            elif kind == 'issue':
+                category = self.issue_terms[' '.join(value.lower().split())]
+                if category not in entities.issues:
+                    entities.issues.append(category)
+            else:
+                entities.urgent = True
+        if entities.order_numbers:
+            entities.order_number = entities.order_numbers[0]
+        return entities
@@ -0,0 +1,380 @@
+import json
+import queue
+import re
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.cache import MISSING, ResponseCache
+
+# Longest piece of response text sent in one stream event
+CHUNK_CHARS = 48
+
+# A word and the whitespace after it, so joined chunks rebuild the text
+WORD_PATTERN = re.compile(r'\s*\S+\s*')
+
+# Instructions sent with every question to a chat completions backend
+SYSTEM_PROMPT = (
+    "You are a customer support agent. Answer the customer's question in two or three "
+    "short sentences. For order status, returns or technical issues, ask for the details "
+    "you need (such as the order number) instead of guessing."
+)
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stop nginx and similar proxies from buffering the stream
+    'X-Accel-Buffering': 'no'
+}
+
+
+def encode_json(data):
+    """Compact UTF-8 JSON body, laid out like Flask's jsonify"""
+    return json.dumps(data, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def faq_response_fields(faq):
+    """The /api/chat response for a matched FAQ"""
+    return {
+        'response': faq['answer'],
+        'intent': 'faq',
+        'confidence': 85,
+        'source': 'faq_database',
+        'faq_question': faq['question']
+    }
+
+
+class PreparedResponse(dict):
+    """A response dict that carries its JSON encoding, built once and reused.
+
+    Shared between requests, so it must not be modified; copy it with
+    dict(response, ...) to add fields.
+    """
+
+    __slots__ = ('body',)
+
+    def __init__(self, fields, body=None):
+        super().__init__(fields)
+        self.body = body if body is not None else encode_json(fields)
+
+
+def split_chunks(text, max_chars=CHUNK_CHARS):
+    """Yield word-boundary pieces of text of at most max_chars (longer words stay whole)"""
+    chunk = ''
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group()
+        if chunk and len(chunk) + len(word) > max_chars:
+            yield chunk
+            chunk = ''
+        chunk += word
+    if chunk:
+        yield chunk
+
+
+def response_events(response, chunks=None, done_fields=None):
+    """Yield (event, data) pairs for a chat response: meta, text chunks, done.
+
+    meta carries everything except the text (intent, confidence, order
+    details...) so clients can render it before the first chunk arrives.
+    chunks may be any iterable of text pieces, e.g. tokens from an answer
+    generator as they are produced; by default the finished text is split.
+    done_fields is merged into the done event once the chunks have run,
+    for details only known at the end (such as whether text was generated).
+    """
+    yield 'meta', {key: value for key, value in response.items() if key != 'response'}
+    parts = []
+    for piece in split_chunks(response.get('response', '')) if chunks is None else chunks:
+        if piece:
+            parts.append(piece)
+            yield 'chunk', {'text': piece}
+    yield 'done', dict(done_fields or {}, response=''.join(parts))
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_sse(text):
+    """Split an SSE stream back into (event, data) pairs"""
+    events = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields.get('data', 'null'))))
+    return events
+
+
+def normalize_question(question):
+    """Cache key for a question: lowercased with whitespace collapsed"""
+    return ' '.join(question.lower().split())
+
+
+class AnswerGenerator(ABC):
+    """Produces free-text answers for messages no FAQ or order matched.
+
+    Subclasses implement generate(); it may block and may raise, since
+    GeneratorPool runs it on its own threads with a timeout.
+    """
+
+    name = 'generator'
+
+    @abstractmethod
+    def generate(self, question):
+        """Return the answer text for a question"""
+
+    def stream(self, question):
+        """Yield the answer in pieces as it is produced; by default all at once"""
+        yield self.generate(question)
+
+
+class HTTPAnswerGenerator(AnswerGenerator):
+    """Answers from an OpenAI-compatible /chat/completions endpoint"""
+
+    name = 'llm'
+
+    def __init__(self, url, model='gpt-3.5-turbo', api_key=None, timeout=2.0, max_tokens=200):
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+
+    def _request(self, question, stream=False):
+        payload = {
+            'model': self.model,
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': question}
+            ],
+            'max_tokens': self.max_tokens
+        }
+        if stream:
+            payload['stream'] = True
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        req = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'), headers=headers)
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def generate(self, question):
+        with self._request(question) as response:
+            data = json.loads(response.read())
+        return data['choices'][0]['message']['content'].strip()
+
+    def stream(self, question):
+        """Yield content deltas from a streamed completion (SSE data lines)"""
+        with self._request(question, stream=True) as response:
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                # Backends without streaming answer with the whole completion
+                yield json.loads(response.read())['choices'][0]['message']['content'].strip()
+                return
+            for line in response:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                delta = json.loads(data)['choices'][0].get('delta', {})
+                if delta.get('content'):
+                    yield delta['content']
+
+
+# Marks the end of a streamed answer on GeneratorPool's piece queue
+_END = object()
+
+
+class GeneratorPool:
+    """Runs an AnswerGenerator on a bounded pool with timeouts and a cache.
+
+    At most `workers` calls run at once and at most `max_pending` are
+    accepted (running or queued); past that, answer() returns None at once
+    instead of waiting. Callers wait at most `timeout` seconds and get None
+    on a timeout or error, so the caller falls back to a canned reply and
+    a slow backend never holds request threads for longer than that. With
+    hedge_after set, a second attempt starts if the first has not answered
+    after that many seconds, and the first answer wins. Answers are cached
+    by normalized question; failures are not.
+    """
+
+    def __init__(self, generator, workers=4, max_pending=16, timeout=2.0, hedge_after=None,
+                 cache_size=1024, cache_ttl=3600):
+        self.generator = generator
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_pending = max_pending
+        self.cache = ResponseCache(max_size=cache_size, ttl=cache_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer-generator')
+        self.counts = {'generated': 0, 'timeouts': 0, 'errors': 0, 'rejected': 0, 'hedged': 0}
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _spawn(self, func, question):
+        """Run func(question) on the pool, or return None when it is full or closed"""
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            return None
+        try:
+            future = self.executor.submit(func, question)
+        except RuntimeError:
+            # close() was called; callers fall back as if the pool were full
+            self._slots.release()
+            self._count('rejected')
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _submit(self, question):
+        """Start one generate() call, or return None when the pool is full"""
+        return self._spawn(self.generator.generate, question)
+
+    def _result(self, futures, deadline):
+        """First successful answer among futures before deadline, or None"""
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                self._count('timeouts')
+                return None
+            for future in done:
+                if future.exception() is None and future.result():
+                    return future.result()
+        self._count('errors')
+        return None
+
+    def answer(self, question):
+        """Generated answer for question, or None when the caller should fall back"""
+        key = normalize_question(question)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+        generation = self.cache.generation
+        deadline = time.monotonic() + self.timeout
+        first = self._submit(question)
+        if first is None:
+            return None
+        futures = [first]
+        if self.hedge_after is not None and self.hedge_after < self.timeout:
+            wait(futures, timeout=self.hedge_after)
+            if not first.done() or first.exception() is not None:
+                second = self._submit(question)
+                if second is not None:
+                    self._count('hedged')
+                    futures.append(second)
+        text = self._result(futures, deadline)
+        if text is not None:
+            self._count('generated')
+            self.cache.set(key, text, generation)
+        return text
+
+    def stream(self, question):
+        """Iterator over pieces of a generated answer, or None when the caller should fall back.
+
+        Waits up to timeout for the first piece; after that each piece may
+        take up to timeout, and a stalled stream simply ends. Streams are
+        not hedged. A completed answer is cached like answer()'s.
+        """
+        key = normalize_question(question)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return iter((cached,))
+        generation = self.cache.generation
+        pieces = queue.Queue()
+
+        def produce(question):
+            try:
+                for piece in self.generator.stream(question):
+                    if piece:
+                        pieces.put(piece)
+                pieces.put(_END)
+            except Exception as e:
+                pieces.put(e)
+
+        if self._spawn(produce, question) is None:
+            return None
+        first = self._next_piece(pieces)
+        if first is _END:
+            self._count('errors')
+        if first is None or first is _END:
+            return None
+        return self._relay(key, generation, first.lstrip(), pieces)
+
+    def _next_piece(self, pieces):
+        """Next piece from a producer, _END when it finished, or None on an error or timeout"""
+        try:
+            piece = pieces.get(timeout=self.timeout)
+        except queue.Empty:
+            self._count('timeouts')
+            return None
+        if isinstance(piece, Exception):
+            self._count('errors')
+            return None
+        return piece
+
+    def _relay(self, key, generation, first, pieces):
+        """Yield the pieces; only an answer that finished is counted and cached"""
+        yield first
+        parts = [first]
+        while True:
+            piece = self._next_piece(pieces)
+            if piece is None:
+                return
+            if piece is _END:
+                break
+            parts.append(piece)
+            yield piece
+        self._count('generated')
+        self.cache.set(key, ''.join(parts).strip(), generation)
+
+    def answer_many(self, questions):
+        """Answers for many questions sharing one deadline; None where unavailable"""
+        deadline = time.monotonic() + self.timeout
+        generation = self.cache.generation
+        answers = {}
+        futures = {}
+        for question in questions:
+            key = normalize_question(question)
+            if key in answers or key in futures:
+                continue
+            cached = self.cache.get(key)
+            if cached is not MISSING:
+                answers[key] = cached
+                continue
+            future = self._submit(question)
+            if future is not None:
+                futures[key] = future
+        for key, future in futures.items():
+            answers[key] = self._result([future], deadline)
+            if answers[key] is not None:
+                self._count('generated')
+                self.cache.set(key, answers[key], generation)
+        return [answers.get(normalize_question(question)) for question in questions]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts['cache'] = self.cache.stats()
+        return counts
+
+    def collect(self):
+        """Metric families for MetricsRegistry.register_collector"""
+        stats = self.stats()
+        return [
+            ('answer_generator_calls_total', 'counter', 'Answer generator outcomes',
+             [({'outcome': outcome}, stats[outcome])
+              for outcome in ('generated', 'timeouts', 'errors', 'rejected')]),
+            ('answer_generator_hedged_total', 'counter', 'Hedged second attempts', [({}, stats['hedged'])]),
+            ('answer_generator_cache_hits_total', 'counter', 'Answers served from the cache',
+             [({}, stats['cache']['hits'])])
+        ]
+
+    def close(self):
+        """Drop queued generations and wait for running ones to finish"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
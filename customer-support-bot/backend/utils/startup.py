@@ -0,0 +1,88 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Startup:
+    """Timed start-up phases and the readiness flag behind /ready.
+
+    Cheap set-up runs at import inside phase(); loading data and warming
+    indexes are registered as steps and run once by warm_up(), either
+    before the app serves (sync), on a background thread, or on the first
+    request that needs them.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.ready = threading.Event()
+        # Set once warm-up has ended, whether it succeeded or failed
+        self.finished = threading.Event()
+        self.error = None
+        self._steps = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as one start-up phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def step(self, name):
+        """Decorator registering a warm-up step; steps run in registration order"""
+        def register(func):
+            self._steps.append((name, func))
+            return func
+        return register
+
+    def warm_up(self):
+        """Run every warm-up step once; calls after the first return at once"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        try:
+            for name, func in self._steps:
+                with self.phase(name):
+                    func()
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}'
+            print(f"❌ Warm-up failed: {self.error}")
+            self.finished.set()
+            raise
+        self.ready.set()
+        self.finished.set()
+        print(f"⏱️  {self.summary()}")
+
+    def start(self):
+        """Warm up on a background thread; a failure is kept in error, not raised"""
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=run, name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        """Block until warm-up has ended; returns False on timeout or failure"""
+        self.finished.wait(timeout)
+        return self.ready.is_set()
+
+    def summary(self):
+        total = sum(seconds for _, seconds in self.phases) * 1000
+        breakdown = ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in self.phases)
+        return f'Startup {total:.1f}ms ({breakdown})'
+
+    def report(self):
+        return {
+            'ready': self.ready.is_set(),
+            'phases_ms': {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+            'total_ms': round(sum(seconds for _, seconds in self.phases) * 1000, 2),
+            'error': self.error
+        }
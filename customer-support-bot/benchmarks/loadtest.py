@@ -0,0 +1,313 @@
+"""HTTP load generator for the chat API.
+
+Drives a running server (or one it starts locally) with a configurable mix
+of /api/chat, /api/order/<id>, /api/analytics and /health requests from
+asyncio workers over keep-alive connections, then reports throughput,
+error rate and a latency histogram per endpoint.
+
+    python benchmarks/loadtest.py --start-server --concurrency 32 --duration 30
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --requests 5000 \\
+        --mix chat=70,order=20,analytics=5,health=5 --ramp-up 10 --output load.json
+
+Fixed-duration mode (--duration) runs until the time is up; otherwise
+--requests sets the total. --ramp-up starts the workers gradually over
+the given number of seconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(benchmarks_dir, '..', 'backend')
+
+# Latency histogram bucket upper bounds in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+DEFAULT_MIX = 'chat=60,order=25,analytics=10,health=5'
+
+CHAT_MESSAGES = [
+    'How can I track my order?',
+    'What is your return policy?',
+    'How long does shipping take?',
+    'My laptop wont turn on',
+    'Where is my order ORD-12345?',
+    'track order ORD-67890',
+    'Do you ship internationally?',
+    'How do I reset my password?',
+    'Tell me a joke',
+    'I want a refund for my earbuds'
+]
+ORDER_IDS = ['ORD-12345', 'ORD-67890', 'ORD-11111', 'ORD-99999']
+
+
+def parse_mix(text):
+    """'chat=60,order=25' -> {'chat': 60.0, 'order': 25.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip():
+            mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {'chat', 'order', 'analytics', 'health'}
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def build_request(endpoint, rng):
+    """Return (method, path, body bytes or None) for one request of an endpoint"""
+    if endpoint == 'chat':
+        body = json.dumps({'message': rng.choice(CHAT_MESSAGES)}).encode('utf-8')
+        return 'POST', '/api/chat', body
+    if endpoint == 'order':
+        return 'GET', f'/api/order/{rng.choice(ORDER_IDS)}', None
+    if endpoint == 'analytics':
+        return 'GET', '/api/analytics', None
+    return 'GET', '/health', None
+
+
+class EndpointStats:
+    """Latency samples and outcome counts for one endpoint"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, status, latency_ms):
+        self.latencies_ms.append(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        # 404 is the documented answer for unknown orders, not a failure
+        if status is None or status >= 500 or (status >= 400 and status != 404):
+            self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies_ms)
+        count = len(latencies)
+
+        def pct(q):
+            return round(latencies[min(count - 1, int(q * (count - 1)))], 3) if count else 0.0
+
+        histogram = {}
+        position = 0
+        for bound in HISTOGRAM_BUCKETS_MS:
+            while position < count and latencies[position] <= bound:
+                position += 1
+            histogram[f'<={bound}ms'] = position
+        histogram['+Inf'] = count
+
+        return {
+            'requests': count,
+            'throughput_per_sec': round(count / elapsed, 1) if elapsed else 0.0,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'statuses': {str(status): value for status, value in sorted(self.statuses.items(), key=str)},
+            'latency_ms': {'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'max': pct(1.0)},
+            'histogram': histogram
+        }
+
+
+class HTTPConnection:
+    """Minimal asyncio HTTP/1.1 client connection with keep-alive"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Send one request and return (status, body bytes)"""
+        if self.writer is None:
+            await self._connect()
+        headers = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive']
+        if body is not None:
+            headers += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        version, status = status_line.split(b' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            payload = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            payload = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            payload = await self.reader.read()
+            await self.close()
+            return int(status), payload
+
+        if version == b'HTTP/1.0' or response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return int(status), payload
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+async def run_load(base_url, mix, concurrency=16, requests=None, duration=None, ramp_up=0.0, seed=1):
+    """Run the load test and return the per-endpoint report"""
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    stats = {name: EndpointStats() for name in endpoints}
+    remaining = [requests if requests is not None else float('inf')]
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(number):
+        if ramp_up and concurrency > 1:
+            await asyncio.sleep(ramp_up * number / concurrency)
+        rng = random.Random(seed * 1000 + number)
+        connection = HTTPConnection(host, port)
+        try:
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+                endpoint = rng.choices(endpoints, weights)[0]
+                method, path, body = build_request(endpoint, rng)
+                start = time.perf_counter()
+                try:
+                    status, _ = await connection.request(method, path, body)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+                    status = None
+                    await connection.close()
+                stats[endpoint].record(status, (time.perf_counter() - start) * 1000)
+        finally:
+            await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(endpoint.latencies_ms) for endpoint in stats.values())
+    errors = sum(endpoint.errors for endpoint in stats.values())
+    return {
+        'target': base_url,
+        'concurrency': concurrency,
+        'ramp_up_seconds': ramp_up,
+        'elapsed_seconds': round(elapsed, 3),
+        'total_requests': total,
+        'throughput_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'endpoints': {name: endpoint.summary(elapsed) for name, endpoint in stats.items()}
+    }
+
+
+def start_server(port):
+    """Start backend/app.py on a local port with the threaded Werkzeug server.
+
+    Admission control is off unless APP_ADMISSION says otherwise: all load
+    comes from one address, so per-client limits would reject most of it.
+    """
+    code = (
+        'import app; '
+        f'app.app.run(host="127.0.0.1", port={port}, threaded=True, debug=False, use_reloader=False)'
+    )
+    env = dict(os.environ)
+    env.setdefault('APP_ADMISSION', 'off')
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=backend_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen(f'{url}/health', timeout=1):
+                return process, url
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('Server did not start')
+
+
+def print_report(report):
+    print(f"\n🎯 {report['target']}  concurrency={report['concurrency']}  "
+          f"{report['total_requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_per_sec']}/s, error rate {report['error_rate']:.2%})")
+    for name, summary in report['endpoints'].items():
+        latency = summary['latency_ms']
+        print(f"  {name:<10} {summary['requests']:>7} req {summary['throughput_per_sec']:>8}/s  "
+              f"err {summary['error_rate']:.2%}  p50 {latency['p50']}ms  p95 {latency['p95']}ms  "
+              f"p99 {latency['p99']}ms  max {latency['max']}ms")
+        print('             ' + '  '.join(f"{bucket}:{count}" for bucket, count in summary['histogram'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the chat API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of a running server')
+    parser.add_argument('--start-server', action='store_true', help='start backend/app.py locally first')
+    parser.add_argument('--port', type=int, default=5055, help='port for --start-server')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='total requests (ignored with --duration)')
+    parser.add_argument('--duration', type=float, help='run for this many seconds instead of a request count')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='seconds over which workers start')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint weights, e.g. chat=60,order=25')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.start_server:
+        process, url = start_server(args.port)
+    try:
+        report = asyncio.run(run_load(
+            url,
+            parse_mix(args.mix),
+            concurrency=args.concurrency,
+            requests=None if args.duration else args.requests,
+            duration=args.duration,
+            ramp_up=args.ramp_up
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
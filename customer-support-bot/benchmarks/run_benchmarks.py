@@ -0,0 +1,203 @@
+"""Benchmark suite for the chat backend.
+
+Generates synthetic FAQ corpora and an order table, replays a realistic
+message mix through find_faq_answer, get_order_status and the Flask test
+client, and writes throughput and latency percentiles to a JSON file.
+
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json --max-regression 20
+
+With --baseline, any benchmark whose p95 latency grew by more than
+--max-regression percent is reported and the script exits with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(benchmarks_dir, '..', 'backend')
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, benchmarks_dir)
+
+from synthetic import message_mix, synthetic_faqs
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[rank]
+
+
+def measure(name, call, inputs, **details):
+    """Run call(item) for every input and summarise per-call latency"""
+    timings = []
+    started = time.perf_counter()
+    for item in inputs:
+        start = time.perf_counter_ns()
+        call(item)
+        timings.append(time.perf_counter_ns() - start)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    to_ms = 1e-6
+    result = {
+        'name': name,
+        'operations': len(timings),
+        'seconds': round(elapsed, 4),
+        'throughput_per_sec': round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(timings) / len(timings) * to_ms, 4) if timings else 0.0,
+            'p50': round(percentile(timings, 0.50) * to_ms, 4),
+            'p95': round(percentile(timings, 0.95) * to_ms, 4),
+            'p99': round(percentile(timings, 0.99) * to_ms, 4),
+            'max': round(timings[-1] * to_ms, 4) if timings else 0.0
+        }
+    }
+    result.update(details)
+    print(f"  {name:<28} {str(details):<40} {result['throughput_per_sec']:>10.1f}/s  "
+          f"p50 {result['latency_ms']['p50']:.3f}ms  p99 {result['latency_ms']['p99']:.3f}ms")
+    return result
+
+
+def prepare_orders(path, count):
+    """Create an order database with the sample orders plus `count` synthetic ones"""
+    from models.database import OrderStore
+    from seed_orders import synthetic_orders
+
+    store = OrderStore(path).initialize()
+    batch = []
+    for item in synthetic_orders(count):
+        batch.append(item)
+        if len(batch) >= 50000:
+            store.insert_many(batch)
+            batch = []
+    if batch:
+        store.insert_many(batch)
+    store.close()
+    return [f'ORD-{100000 + i}' for i in range(count)] or ['ORD-12345']
+
+
+def run(sizes, message_count, order_count, matchers, seed=1):
+    """Run every benchmark and return the result document"""
+    workdir = tempfile.mkdtemp(prefix='csb-bench-')
+    os.environ['ORDERS_DB_PATH'] = os.path.join(workdir, 'orders.db')
+    # http_chat measures answering, not the rate limiter turning one client away
+    os.environ.setdefault('APP_ADMISSION', 'off')
+    print(f"📦 Seeding {order_count} orders...")
+    order_numbers = prepare_orders(os.environ['ORDERS_DB_PATH'], order_count)
+
+    import app as app_module
+    from models.knowledge_store import DataSnapshot
+
+    # Benchmarks install their own corpora, so stop watching the data files
+    app_module.knowledge_store.stop_watcher()
+
+    # Measure matching itself, not the response cache
+    app_module.response_cache.max_size = 0
+    app_module.response_cache.invalidate()
+
+    rng = random.Random(seed)
+    sample_orders = [rng.choice(order_numbers) for _ in range(min(message_count, 10000))]
+    results = []
+
+    print("🔎 Order lookups")
+    results.append(measure('get_order_status', app_module.get_order_status, sample_orders, orders=order_count))
+    results.append(measure('get_order_status_miss', app_module.get_order_status,
+                           [f'ORD-{9000000 + i}' for i in range(len(sample_orders))], orders=order_count))
+
+    for size in sizes:
+        print(f"📚 FAQ corpus of {size}")
+        faqs = synthetic_faqs(size, seed=seed)
+        messages = message_mix(faqs, message_count, order_numbers[:1000], seed=seed)
+
+        start = time.perf_counter()
+        snapshot = DataSnapshot(faqs, app_module.knowledge_base)
+        build_seconds = time.perf_counter() - start
+        app_module.knowledge_store.install(snapshot)
+        results.append({'name': 'index_build', 'faqs': size, 'seconds': round(build_seconds, 4)})
+        print(f"  {'index_build':<28} {str({'faqs': size}):<40} {build_seconds:.2f}s")
+
+        for matcher in matchers:
+            if matcher in ('tfidf', 'semantic'):
+                start = time.perf_counter()
+                if matcher == 'tfidf':
+                    snapshot.retriever(app_module.knowledge_store.retriever_min_score)
+                else:
+                    snapshot.semantic(app_module.knowledge_store.semantic_min_similarity)
+                results.append({'name': f'{matcher}_build', 'faqs': size,
+                                'seconds': round(time.perf_counter() - start, 4)})
+            results.append(measure('find_faq_answer', lambda m, matcher=matcher: app_module.find_faq_answer(m, matcher),
+                                   messages, faqs=size, matcher=matcher))
+
+        client = app_module.app.test_client()
+        results.append(measure('http_chat', lambda m: client.post('/api/chat', json={'message': m}),
+                               messages, faqs=size))
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'messages': message_count,
+            'orders': order_count
+        },
+        'results': results
+    }
+
+
+def _key(result):
+    return (result['name'], result.get('faqs'), result.get('matcher'), result.get('orders'))
+
+
+def compare(current, baseline, max_regression):
+    """Return descriptions of benchmarks whose p95 latency regressed"""
+    previous = {_key(result): result for result in baseline['results'] if 'latency_ms' in result}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(_key(result))
+        if old is None or 'latency_ms' not in result or not old['latency_ms']['p95']:
+            continue
+        change = (result['latency_ms']['p95'] - old['latency_ms']['p95']) / old['latency_ms']['p95'] * 100
+        if change > max_regression:
+            regressions.append(f"{result['name']} {_key(result)[1:]}: p95 "
+                               f"{old['latency_ms']['p95']}ms -> {result['latency_ms']['p95']}ms (+{change:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the chat backend benchmark suite')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated FAQ corpus sizes')
+    parser.add_argument('--messages', type=int, default=2000, help='messages replayed per corpus')
+    parser.add_argument('--orders', type=int, default=100000, help='synthetic orders in the order table')
+    parser.add_argument('--matchers', default='keyword,tfidf,semantic', help='FAQ matchers to benchmark')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    parser.add_argument('--max-regression', type=float, default=20.0, help='allowed p95 increase in percent')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    matchers = [matcher for matcher in args.matchers.split(',') if matcher]
+    document = run(sizes, args.messages, args.orders, matchers)
+
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(document, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Synthetic FAQ corpora, order tables and message mixes for benchmarks"""
+import random
+
+CATEGORIES = (
+    'order_related', 'return_refund', 'technical_support',
+    'billing_payment', 'account_management', 'product_questions'
+)
+
+TOPICS = {
+    'order_related': ['order', 'shipping', 'delivery', 'tracking', 'package', 'address', 'courier', 'shipment'],
+    'return_refund': ['return', 'refund', 'exchange', 'cancel', 'policy', 'credit', 'label', 'warranty'],
+    'technical_support': ['laptop', 'phone', 'battery', 'screen', 'wifi', 'update', 'reset', 'charger'],
+    'billing_payment': ['payment', 'card', 'invoice', 'charge', 'paypal', 'billing', 'receipt', 'discount'],
+    'account_management': ['account', 'password', 'email', 'login', 'profile', 'subscription', 'newsletter', 'settings'],
+    'product_questions': ['model', 'color', 'size', 'stock', 'specs', 'accessory', 'bundle', 'memory']
+}
+
+OPENERS = ['how do i', 'can i', 'what is the', 'why is my', 'where can i find', 'when will my', 'do you offer', 'is there a']
+VERBS = ['change', 'check', 'get', 'update', 'fix', 'find', 'use', 'track', 'cancel', 'replace']
+FILLERS = ['please', 'thanks', 'asap', 'again', 'today', 'now', 'help', 'urgent']
+UNRELATED = ['tell me a joke', 'what is the weather', 'who won the game', 'hello', 'hi', 'good morning', 'thanks bye']
+
+
+def synthetic_faqs(size, seed=0):
+    """Generate a faqs.json-shaped corpus with `size` entries across the six categories"""
+    rng = random.Random(seed)
+    faqs = {category: [] for category in CATEGORIES}
+    for i in range(size):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        words = TOPICS[category]
+        subject = rng.sample(words, 2)
+        # A numbered variant word keeps questions distinct at large sizes
+        variant = f'{subject[0]}{i // len(CATEGORIES)}'
+        question = f"{rng.choice(OPENERS)} {rng.choice(VERBS)} my {subject[0]} {subject[1]} {variant}?"
+        faqs[category].append({
+            'question': question.capitalize(),
+            'answer': f"Answer {i}: to {rng.choice(VERBS)} your {subject[0]} {subject[1]}, visit your account page.",
+            'keywords': [f'{subject[0]} {subject[1]}', variant, rng.choice(words)]
+        })
+    return faqs
+
+
+def message_mix(faqs, count, order_numbers=(), seed=1):
+    """Realistic message mix: paraphrased FAQs, order queries, keyword-only and unrelated messages"""
+    rng = random.Random(seed)
+    entries = [faq for questions in faqs.values() for faq in questions]
+    order_numbers = list(order_numbers) or ['ORD-12345']
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.40 and entries:
+            words = rng.choice(entries)['question'].rstrip('?').lower().split()
+            rng.shuffle(words)
+            messages.append(' '.join(words[:rng.randint(3, len(words))] + [rng.choice(FILLERS)]))
+        elif roll < 0.65:
+            messages.append(f"{rng.choice(['where is my order', 'status of order', 'track order'])} {rng.choice(order_numbers)}")
+        elif roll < 0.85 and entries:
+            messages.append(f"{rng.choice(rng.choice(entries)['keywords'])} {rng.choice(FILLERS)}")
+        else:
+            messages.append(rng.choice(UNRELATED))
+    return messages
@@ -0,0 +1,8 @@
+-- Sample orders used by the demo and the test suite
+
+INSERT OR IGNORE INTO orders
+    (order_number, status, product, carrier, tracking_number, estimated_delivery, delivery_date, shipping_address)
+VALUES
+    ('ORD-12345', 'shipped', 'TechBook Pro TB2024', 'UPS', '1Z999AA10123456784', '2024-01-15', NULL, '123 Main St, City, State 12345'),
+    ('ORD-67890', 'delivered', 'SmartPhone X SPX13', 'FedEx', '789012345678', NULL, '2024-01-10', '456 Oak Ave, City, State 12345'),
+    ('ORD-11111', 'processing', 'Wireless Earbuds WE300', 'USPS', NULL, '2024-01-18', NULL, '789 Pine Rd, City, State 12345');
@@ -0,0 +1,28 @@
+-- Customer Support Bot database schema (SQLite)
+
+PRAGMA journal_mode = WAL;
+
+-- Orders, keyed by the normalized order number (e.g. ORD-12345).
+-- WITHOUT ROWID stores rows in the primary key b-tree, so a lookup is a
+-- single index seek.
+CREATE TABLE IF NOT EXISTS orders (
+    order_number       TEXT PRIMARY KEY,
+    status             TEXT NOT NULL,
+    product            TEXT NOT NULL,
+    carrier            TEXT,
+    tracking_number    TEXT,
+    estimated_delivery TEXT,
+    delivery_date      TEXT,
+    shipping_address   TEXT
+) WITHOUT ROWID;
+
+-- Conversation sessions evicted from memory, restored on their next
+-- message. turns is a JSON array of the session's most recent turns.
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    turns      TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Lets the periodic purge of old spilled sessions avoid a full scan
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
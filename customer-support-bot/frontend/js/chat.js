@@ -74,6 +74,15 @@ class Chat {
     static processUserMessage(message) {
         const typingIndicator = this.showTypingIndicator();
         
+        if (CHAT_STREAM_URL) {
+            this.streamBackendReply(message).catch(() => {
+                // Backend unavailable: answer locally instead
+                this.removeTypingIndicator();
+                this.addMessage(NLPProcessor.processMessage(message).response, 'bot', true);
+            });
+            return;
+        }
+        
         setTimeout(() => {
             this.removeTypingIndicator();
             
@@ -93,6 +102,50 @@ class Chat {
         }, 1500);
     }
 
+    static async streamBackendReply(message) {
+        const response = await fetch(CHAT_STREAM_URL, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: message })
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`Stream request failed: ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let textNode = null;
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const event = (block.match(/^event: (.*)$/m) || [])[1];
+                const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || 'null');
+                
+                if (event === 'meta') {
+                    // Intent is known: replace the typing indicator with an empty reply
+                    this.removeTypingIndicator();
+                    this.addMessage('', 'bot');
+                    const messages = document.querySelectorAll('#chatArea .bot-message');
+                    const messageDiv = messages[messages.length - 1];
+                    textNode = document.createTextNode('');
+                    messageDiv.insertBefore(textNode, messageDiv.firstChild);
+                } else if (event === 'chunk' && textNode) {
+                    textNode.textContent += data.text;
+                    document.getElementById('chatArea').scrollTop = document.getElementById('chatArea').scrollHeight;
+                }
+            }
+        }
+    }
+
     static clearChat() {
         if (confirm("Are you sure you want to clear the chat history?")) {
             document.getElementById('chatArea').innerHTML = '';
@@ -137,4 +137,8 @@ const TROUBLESHOOTING_GUIDES = {
         "Update to latest software version",
         "Check for background app activity"
     ]
-};
\ No newline at end of file
+};
+
+// Backend streaming endpoint (e.g. 'http://localhost:5000/api/chat/stream').
+// When set, replies stream in over Server-Sent Events; null keeps the local NLP replies.
+const CHAT_STREAM_URL = null;
\ No newline at end of file
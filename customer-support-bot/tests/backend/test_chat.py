@@ -7,14 +7,32 @@ import re
 # Add backend to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
 
-from app import app, find_faq_answer, get_order_status
+from app import admission, app, find_faq_answer, get_order_status
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
+    # Every test client shares one address and so one rate-limit bucket
+    if admission is not None:
+        admission.reset()
     with app.test_client() as client:
         yield client
 
+@pytest.fixture
+def app_sessions(tmp_path):
+    """Point the app at a session store in a temporary database"""
+    import app as app_module
+    from models.session_store import SessionStore
+    
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_turns=8, pool_size=2).initialize()
+    original = app_module.session_store
+    app_module.session_store = store
+    try:
+        yield store
+    finally:
+        app_module.session_store = original
+        store.close()
+
 class TestChatAPI:
     """Test cases for chat API endpoints"""
     
@@ -353,5 +371,1414 @@ class TestOrderAPI:
             # Should either return 200 or 404, not crash
             assert response.status_code in [200, 404]
 
+class TestMatcherSelection:
+    """Test cases for choosing the FAQ matcher from /api/chat"""
+    
+    def test_chat_with_tfidf_matcher(self, client):
+        """Chat can use the TF-IDF matcher and keeps the response shape"""
+        response = client.post('/api/chat', json={'message': 'What is your return policy?', 'matcher': 'tfidf'})
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['intent'] == 'faq'
+        assert data['confidence'] == 85
+        assert 'faq_question' in data
+    
+    def test_chat_with_unknown_matcher(self, client):
+        """Unknown matcher names fall back to the default matcher"""
+        response = client.post('/api/chat', json={'message': 'What is your return policy?', 'matcher': 'bogus'})
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['intent'] == 'faq'
+
+class TestChatBatchAPI:
+    """Test cases for the batch chat endpoint"""
+    
+    def test_batch_matches_single_chat(self, client):
+        """Each batch result matches what /api/chat returns for that message"""
+        messages = [
+            'Where is my order ORD-12345?',
+            'What is your return policy?',
+            'How long does shipping take?',
+            'order ORD-99999 and shipping time',
+            ''
+        ]
+        response = client.post('/api/chat/batch', json={'messages': messages})
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['count'] == len(messages)
+        for message, result in zip(messages, data['results']):
+            single = json.loads(client.post('/api/chat', json={'message': message}).data)
+            assert result == single
+    
+    def test_batch_general_and_invalid_items(self, client):
+        """Unmatched and non-string messages still get a result in order"""
+        response = client.post('/api/chat/batch', json={'messages': ['Tell me a joke', 42, '  ']})
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert [result['intent'] for result in data['results']] == ['general', 'empty', 'empty']
+    
+    def test_batch_requires_message_list(self, client):
+        """Missing or malformed messages array is rejected"""
+        assert client.post('/api/chat/batch', json={'message': 'hi'}).status_code == 400
+        assert client.post('/api/chat/batch', data='not json').status_code == 400
+    
+    def test_batch_size_limit(self, client):
+        """Batches larger than the configured limit are rejected"""
+        from app import max_batch_size
+        
+        response = client.post('/api/chat/batch', json={'messages': ['hi'] * (max_batch_size + 1)})
+        assert response.status_code == 413
+
+class TestResponseCache:
+    """Test cases for the FAQ response cache"""
+    
+    def test_cache_lru_ttl_and_counters(self):
+        """Cache evicts least recently used entries and expires old ones"""
+        from utils.cache import MISSING, ResponseCache
+        
+        now = [0.0]
+        cache = ResponseCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)  # evicts 'b', the least recently used
+        assert cache.get('b') is MISSING
+        now[0] = 11.0
+        assert cache.get('a') is MISSING
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+        assert stats['evictions'] == 1
+    
+    def test_cache_rejects_values_from_before_invalidation(self):
+        """Results computed against old data never enter the cache"""
+        from utils.cache import MISSING, ResponseCache
+        
+        cache = ResponseCache()
+        generation = cache.generation
+        cache.invalidate()
+        cache.set('key', 'stale', generation)
+        assert cache.get('key') is MISSING
+    
+    def test_repeated_faq_question_hits_cache(self, client):
+        """Repeated phrasings are served from the cache with the same answer"""
+        from app import response_cache
+        
+        first = json.loads(client.post('/api/chat', json={'message': 'How long does shipping take?'}).data)
+        hits = response_cache.hits
+        second = json.loads(client.post('/api/chat', json={'message': '  HOW LONG does shipping take?'}).data)
+        
+        assert response_cache.hits == hits + 1
+        assert first == second
+    
+    def test_order_answers_not_cached(self, client):
+        """Order status answers are always looked up fresh"""
+        from app import response_cache
+        
+        client.post('/api/chat', json={'message': 'Where is my order ORD-12345?'})
+        assert ('keyword', 'where is my order ord-12345?') not in response_cache._entries
+    
+    def test_reload_invalidates_cache(self):
+        """Swapping in reloaded data drops cached matches"""
+        import app as app_module
+        
+        app_module.find_faq_answer('What is your return policy?')
+        assert len(app_module.response_cache) > 0
+        app_module.knowledge_store.reload(force=True)
+        assert len(app_module.response_cache) == 0
+        assert app_module.find_faq_answer('What is your return policy?') is not None
+
+class TestDataReload:
+    """Test cases for hot reloading faqs.json and knowledge_base.json"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        from models.knowledge_store import KnowledgeStore
+        
+        kb_path = tmp_path / 'knowledge_base.json'
+        faqs_path = tmp_path / 'faqs.json'
+        kb_path.write_text(json.dumps({'company_info': {'name': 'Test'}}))
+        faqs_path.write_text(json.dumps({'general': [
+            {'question': 'What are your opening hours?', 'answer': 'Always open.', 'keywords': ['opening hours']}
+        ]}))
+        store = KnowledgeStore(str(kb_path), str(faqs_path))
+        store.load()
+        return store
+    
+    def test_reload_swaps_snapshot_when_files_change(self, store):
+        """Edited files are picked up and indexed into a new snapshot"""
+        old = store.snapshot
+        assert store.reload() is False  # nothing changed
+        
+        with open(store.faqs_path, 'w') as f:
+            json.dump({'general': [
+                {'question': 'Do you sell gift cards?', 'answer': 'Yes, in store.', 'keywords': ['gift card']}
+            ]}, f)
+        os.utime(store.faqs_path, ns=(0, 10 ** 9))
+        
+        assert store.reload() is True
+        assert store.snapshot is not old
+        assert store.snapshot.version == old.version + 1
+        assert store.snapshot.index.match('do you sell a gift card?')[1]['answer'] == 'Yes, in store.'
+        # The old snapshot is untouched for requests still using it
+        assert old.index.match('what are your opening hours')[1]['answer'] == 'Always open.'
+    
+    def test_reload_keeps_old_snapshot_on_bad_json(self, store):
+        """A half-written file never replaces the served data"""
+        old = store.snapshot
+        with open(store.faqs_path, 'w') as f:
+            f.write('{"general": [')
+        
+        assert store.reload(force=True) is False
+        assert store.snapshot is old
+        assert store.last_error is not None
+    
+    def test_concurrent_requests_see_complete_snapshots(self, client):
+        """Chat requests keep answering while the data is reloaded repeatedly"""
+        import threading
+        from app import knowledge_store
+        
+        errors = []
+        stop = threading.Event()
+        
+        def reloader():
+            while not stop.is_set():
+                knowledge_store.reload(force=True)
+        
+        thread = threading.Thread(target=reloader)
+        thread.start()
+        try:
+            for _ in range(50):
+                data = json.loads(client.post('/api/chat', json={'message': 'What is your return policy?'}).data)
+                if data['intent'] != 'faq':
+                    errors.append(data)
+        finally:
+            stop.set()
+            thread.join()
+        
+        assert errors == []
+    
+    def test_admin_reload_endpoint(self, client):
+        """Admin trigger reloads the data and reports the new version"""
+        from app import knowledge_store
+        
+        version = knowledge_store.snapshot.version
+        response = client.post('/api/admin/reload?force=true')
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['reloaded'] is True
+        assert data['version'] == version + 1
+        assert client.get('/api/admin/status').status_code == 200
+        
+        # Without force, unchanged files are not re-indexed
+        data = client.post('/api/admin/reload').get_json()
+        assert data['reloaded'] is False and data['version'] == version + 1
+    
+    def test_admin_routes_closed_to_remote_clients_without_token(self, client):
+        """With no ADMIN_TOKEN configured only loopback clients may use admin routes"""
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+        assert client.post('/api/admin/reload?force=true', environ_base=remote).status_code == 403
+        assert client.get('/api/admin/status', environ_base=remote).status_code == 403
+        assert client.get('/api/admin/status').status_code == 200
+    
+    def test_admin_reload_requires_token_when_configured(self, client):
+        """Admin routes check the token when one is configured"""
+        app.config['ADMIN_TOKEN'] = 'secret'
+        try:
+            assert client.post('/api/admin/reload').status_code == 403
+            response = client.post('/api/admin/reload', headers={'X-Admin-Token': 'secret'})
+            assert response.status_code == 200
+        finally:
+            app.config.pop('ADMIN_TOKEN')
+
+class TestOrderStore:
+    """Test cases for the SQLite order store"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        from models.database import OrderStore
+        
+        store = OrderStore(str(tmp_path / 'orders.db'), pool_size=2).initialize()
+        yield store
+        store.close()
+    
+    def test_sample_orders_seeded(self, store):
+        """A new database contains the sample orders with their original fields"""
+        assert store.count() == 3
+        order = store.get('ORD-11111')
+        assert order['status'] == 'processing'
+        assert 'tracking_number' not in order  # NULL columns are left out
+        assert store.get('ORD-99999') is None
+    
+    def test_insert_and_lookup_synthetic_orders(self, store):
+        """Seeded synthetic orders are found by normalized order number"""
+        from seed_orders import synthetic_orders
+        
+        store.insert_many(synthetic_orders(500))
+        assert store.count() == 503
+        assert store.get('ORD-100250')['status'] in ['processing', 'shipped', 'delivered']
+    
+    def test_pool_shared_across_threads(self, store):
+        """Concurrent lookups never open more connections than the pool size"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(store.get, ['ORD-12345'] * 200))
+        
+        assert all(result['carrier'] == 'UPS' for result in results)
+        assert store.pool._created <= 2
+    
+    def test_normalize_order_number(self):
+        """Raw order references normalize to ORD-<digits>"""
+        from utils.nlp_processor import normalize_order_number
+        
+        assert normalize_order_number('ord-12345') == 'ORD-12345'
+        assert normalize_order_number('ORD12345') == 'ORD-12345'
+        assert normalize_order_number(' order ORD-12345 ') == 'ORD-12345'
+        assert normalize_order_number('#12345') == 'ORD-12345'
+        assert normalize_order_number('TEST-ORDER') is None
+
+class TestBulkOrderLookupAPI:
+    """Test cases for the bulk order lookup endpoint"""
+    
+    def test_bulk_lookup_found_and_not_found(self, client):
+        """Each input gets a result in order, normalized like get_order_status"""
+        orders = ['ORD-12345', 'ord-67890', '#11111', 'order 12345', 'ORD-99999', 'INVALID', 42]
+        response = client.post('/api/orders/lookup', json={'orders': orders})
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['count'] == len(orders)
+        assert data['found'] == 4
+        assert [result['found'] for result in data['results']] == [True, True, True, True, False, False, False]
+        assert data['results'][1]['order_number'] == 'ORD-67890'
+        assert data['results'][2]['details']['status'] == 'processing'
+        assert data['results'][5]['order_number'] is None
+        
+        for raw, result in zip(orders[:6], data['results']):
+            assert result.get('details') == get_order_status(raw)
+    
+    def test_bulk_lookup_requires_order_list(self, client):
+        """Missing orders array is rejected"""
+        assert client.post('/api/orders/lookup', json={'order': 'ORD-12345'}).status_code == 400
+    
+    def test_get_many_spans_chunks(self, tmp_path):
+        """Lookups larger than one IN list are split and padded correctly"""
+        from models.database import OrderStore
+        from seed_orders import synthetic_orders
+        
+        store = OrderStore(str(tmp_path / 'orders.db')).initialize()
+        store.insert_many(synthetic_orders(1200))
+        wanted = [f'ORD-{100000 + i}' for i in range(0, 1300, 3)] + ['ORD-12345', 'ORD-12345']
+        found = store.get_many(wanted)
+        
+        assert set(found) == {number for number in wanted if store.get(number)}
+        assert len(found) == 401
+        store.close()
+
+class TestLiveAnalytics:
+    """Test cases for the live analytics counters"""
+    
+    def test_chat_updates_analytics(self, client):
+        """Chat messages are counted by intent and topic"""
+        before = json.loads(client.get('/api/analytics').data)
+        client.post('/api/chat', json={'message': 'What is your return policy?'})
+        client.post('/api/chat', json={'message': 'Where is my order ORD-12345?'})
+        client.post('/api/chat', json={'message': ''})
+        after = json.loads(client.get('/api/analytics').data)
+        
+        assert after['total_conversations'] == before['total_conversations'] + 3
+        assert after['intents']['faq'] == before['intents']['faq'] + 1
+        assert after['intents']['order_status'] == before['intents']['order_status'] + 1
+        assert after['intents']['empty'] == before['intents']['empty'] + 1
+        assert after['intent_counts']['refund_returns'] == before['intent_counts']['refund_returns'] + 1
+        assert after['common_intents']['refund_returns'] > 0
+        assert abs(sum(after['common_intents'].values()) - 100) <= 2
+        assert after['response_time_ms']['p99'] >= after['response_time_ms']['p50'] > 0
+        assert 'hits' in after['cache']
+    
+    def test_counters_across_threads(self):
+        """Striped counters add up exactly under concurrent increments"""
+        import threading
+        from utils.metrics import StripedCounter
+        
+        counter = StripedCounter(stripes=4)
+        threads = [threading.Thread(target=lambda: [counter.incr('x') for _ in range(1000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert counter.get('x') == 8000
+    
+    def test_latency_sketch_quantiles(self):
+        """Sketch quantiles stay within the configured relative error"""
+        import random
+        from utils.metrics import LatencySketch
+        
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(-5, 1) for _ in range(20000))
+        sketch = LatencySketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.record(value)
+        summary = sketch.summary()
+        
+        assert summary['count'] == len(values)
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(summary[q] - exact) / exact < 0.02
+
+class TestMetricsEndpoint:
+    """Test cases for stage instrumentation and /metrics"""
+    
+    def test_metrics_exposes_stages_and_routes(self, client):
+        """Chat stages and every route show up as histograms"""
+        client.post('/api/chat', json={'message': 'Where is my order ORD-12345?'})
+        client.get('/api/order/ORD-12345')
+        client.get('/health')
+        response = client.get('/metrics')
+        text = response.data.decode()
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        for stage in ['parse_json', 'entity_extraction', 'order_lookup', 'serialize']:
+            assert f'chat_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert 'http_request_duration_seconds_count{route="/api/order/<order_number>",method="GET",status="200"}' in text
+        assert 'route="/health"' in text
+        assert '# TYPE chat_messages_total counter' in text
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Bucket counts are cumulative and end with +Inf equal to the count"""
+        from utils.metrics import Histogram
+        
+        histogram = Histogram('test_seconds', 'test', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(('a',), value)
+        lines = histogram.render()
+        
+        assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="a",le="1.0"} 3' in lines
+        assert 'test_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+        assert 'test_seconds_count{stage="a"} 4' in lines
+    
+    def test_disabled_registry_records_nothing(self):
+        """Disabled metrics hand out the shared no-op timer"""
+        from utils.metrics import MetricsRegistry, NULL_TIMER
+        
+        registry = MetricsRegistry(enabled=False)
+        assert registry.stage('faq_match') is NULL_TIMER
+        with registry.stage('faq_match'):
+            pass
+        registry.observe_request('/health', 'GET', 200, 0.001)
+        assert registry.stages.collect() == {}
+        assert registry.requests.collect() == {}
+
+class TestLoadHarness:
+    """Test the asyncio load generator against a live local server"""
+    
+    @pytest.fixture
+    def live_server(self):
+        import threading
+        from werkzeug.serving import make_server
+        
+        if admission is not None:
+            admission.reset()
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f'http://127.0.0.1:{server.server_port}'
+        server.shutdown()
+    
+    @pytest.fixture
+    def loadtest(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks'))
+        import loadtest
+        return loadtest
+    
+    def test_fixed_request_count(self, live_server, loadtest):
+        """Every endpoint in the mix is exercised and nothing fails"""
+        import asyncio
+        
+        mix = loadtest.parse_mix(loadtest.DEFAULT_MIX)
+        report = asyncio.run(loadtest.run_load(live_server, mix, concurrency=4, requests=80, ramp_up=0.05))
+        
+        assert report['total_requests'] == 80
+        assert report['error_rate'] == 0
+        assert sum(endpoint['requests'] for endpoint in report['endpoints'].values()) == 80
+        for endpoint in report['endpoints'].values():
+            assert endpoint['histogram']['+Inf'] == endpoint['requests']
+    
+    def test_fixed_duration_and_bad_mix(self, live_server, loadtest):
+        """Duration mode stops on time and unknown endpoints are rejected"""
+        import asyncio
+        
+        report = asyncio.run(loadtest.run_load(live_server, {'health': 1}, concurrency=2, duration=0.3))
+        assert report['total_requests'] > 0
+        assert report['endpoints']['health']['statuses'] == {'200': report['total_requests']}
+        assert report['elapsed_seconds'] < 2
+        with pytest.raises(ValueError):
+            loadtest.parse_mix('chat=1,upload=2')
+
+class TestASGIApp:
+    """Test cases for the async serving mode"""
+    
+    def call(self, method, path, body=None, content_type='application/json', headers=None):
+        """Drive the ASGI app once and return (status, headers, body)"""
+        import asyncio
+        from asgi import app as asgi_app
+        
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'headers': [(b'content-type', content_type.encode())] + [
+                (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        }
+        payload = json.dumps(body).encode() if body is not None else b''
+        messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+        
+        asyncio.run(asgi_app(scope, receive, send))
+        headers = dict(sent[0]['headers'])
+        return sent[0]['status'], headers, sent[1]['body']
+    
+    def test_client_header_is_case_insensitive(self):
+        """A configured client header of any case keys the rate limit, as under Flask"""
+        import app as app_module
+        import asgi as asgi_module
+        from utils.admission import AdmissionController
+        
+        original_header, original_admission = app_module.admission_client_header, asgi_module.admission
+        try:
+            for configured in ('x-forwarded-for', 'X-Forwarded-For'):
+                app_module.admission_client_header = configured
+                asgi_module.admission = AdmissionController(rate=0.001, burst=1)
+                first, _, _ = self.call('GET', '/api/order/ORD-12345', headers={'X-Forwarded-For': '10.0.0.1'})
+                other, _, _ = self.call('GET', '/api/order/ORD-12345', headers={'X-Forwarded-For': '10.0.0.2'})
+                again, _, _ = self.call('GET', '/api/order/ORD-12345', headers={'X-Forwarded-For': '10.0.0.1'})
+                assert (first, other, again) == (200, 200, 429), configured
+        finally:
+            app_module.admission_client_header, asgi_module.admission = original_header, original_admission
+    
+    def test_preflight_matches_flask(self, client):
+        """OPTIONS allows the requested headers like Flask-CORS and spends no admission tokens"""
+        import app as app_module
+        import asgi as asgi_module
+        from utils.admission import AdmissionController
+        
+        preflight = {'Origin': 'http://localhost:3000', 'Access-Control-Request-Method': 'POST',
+                     'Access-Control-Request-Headers': 'content-type'}
+        closed = AdmissionController(rate=0.001, burst=0)
+        originals = app_module.admission, asgi_module.admission
+        app_module.admission = asgi_module.admission = closed
+        try:
+            flask_response = client.options('/api/chat/stream', headers=preflight)
+            status, headers, _ = self.call('OPTIONS', '/api/chat/stream', headers=preflight)
+        finally:
+            app_module.admission, asgi_module.admission = originals
+        
+        assert status == flask_response.status_code == 200
+        assert headers[b'access-control-allow-headers'].decode() == flask_response.headers['Access-Control-Allow-Headers']
+        assert b'POST' in headers[b'access-control-allow-methods']
+        assert headers[b'access-control-allow-origin'] == b'*'
+        assert closed.stats()['admitted'] == 0 and not any(closed.stats()['shed'].values())
+    
+    def test_chat_matches_flask_contract(self, client):
+        """Async /api/chat answers exactly like the Flask endpoint"""
+        message = {'message': 'Where is my order ORD-12345?'}
+        status, headers, body = self.call('POST', '/api/chat', message)
+        
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        assert headers[b'access-control-allow-origin'] == b'*'
+        assert json.loads(body) == client.post('/api/chat', json=message).get_json()
+    
+    def test_order_health_and_analytics(self, client):
+        """Order lookups keep their 200/404 codes and other routes respond"""
+        status, _, body = self.call('GET', '/api/order/ORD-12345')
+        assert status == 200
+        assert json.loads(body) == client.get('/api/order/ORD-12345').get_json()
+        
+        status, _, body = self.call('GET', '/api/order/ORD-00000')
+        assert status == 404
+        assert json.loads(body)['found'] is False
+        
+        assert json.loads(self.call('GET', '/health')[2]) == {'status': 'healthy', 'service': 'customer-support-bot'}
+        assert 'total_conversations' in json.loads(self.call('GET', '/api/analytics')[2])
+    
+    def test_bad_requests(self):
+        """Invalid JSON, wrong content types and unknown routes are rejected"""
+        assert self.call('POST', '/api/chat', content_type='text/plain')[0] == 415
+        assert self.call('GET', '/api/missing')[0] == 404
+        assert self.call('DELETE', '/api/chat')[0] == 405
+        
+        status, _, body = self.call('POST', '/api/chat', {'text': 'no message'})
+        assert status == 200
+        assert json.loads(body)['intent'] == 'empty'
+    
+    def test_metrics_label_routes_not_paths(self):
+        """Rejected, preflight and unknown requests are labelled by route template"""
+        import asgi as asgi_module
+        from app import metrics
+        from utils.admission import AdmissionController
+        
+        original = asgi_module.admission
+        asgi_module.admission = AdmissionController(rate=0.001, burst=0)
+        try:
+            status, _, _ = self.call('GET', '/api/order/ORD-REJECTED-1')
+        finally:
+            asgi_module.admission = original
+        assert status == 429
+        self.call('OPTIONS', '/api/session/preflight-session-1')
+        self.call('GET', '/no/such/path-1')
+        
+        body = metrics.render()
+        for raw in ('ORD-REJECTED-1', 'preflight-session-1', 'path-1'):
+            assert raw not in body
+        assert 'route="/api/order/<order_number>",method="GET",status="429"' in body
+        assert asgi_module.route_label('/api/session/abc') == '/api/session/<session_id>'
+        assert asgi_module.route_label('/api/order/') == 'unmatched'
+    
+    def test_matching_runs_on_worker_pool(self):
+        """Chat handling happens off the event loop thread"""
+        import threading
+        import app as app_module
+        from asgi import app as asgi_app
+        
+        threads = []
+        original = app_module.answer_message
+        
+        def spy(*args):
+            threads.append(threading.current_thread().name)
+            return original(*args)
+        
+        app_module.answer_message = spy
+        try:
+            self.call('POST', '/api/chat', {'message': 'How do I return an item?'})
+        finally:
+            app_module.answer_message = original
+        
+        assert threads and threads[0].startswith('chat-worker')
+        assert asgi_app.workers == 16
+
+class TestChatStream:
+    """Test cases for /api/chat/stream and the response generator"""
+    
+    def test_stream_sends_meta_then_chunks(self, client):
+        """Metadata comes first and the chunks rebuild the full answer"""
+        from utils.response_generator import parse_sse
+        
+        message = {'message': 'Where is my order ORD-12345?'}
+        expected = client.post('/api/chat', json=message).get_json()
+        response = client.post('/api/chat/stream', json=message)
+        events = parse_sse(response.data.decode())
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert events[0][0] == 'meta'
+        assert events[0][1]['intent'] == 'order_status'
+        assert 'response' not in events[0][1]
+        assert events[-1] == ('done', {'response': expected['response']})
+        chunks = [data['text'] for event, data in events if event == 'chunk']
+        assert len(chunks) > 1
+        assert ''.join(chunks) == expected['response']
+    
+    def test_stream_get_and_empty_message(self, client):
+        """EventSource-style GET works and empty messages still stream"""
+        from utils.response_generator import parse_sse
+        
+        events = parse_sse(client.get('/api/chat/stream?message=').data.decode())
+        assert events[0] == ('meta', {'intent': 'empty', 'confidence': 0})
+        assert events[-1][0] == 'done'
+    
+    def test_split_chunks_and_custom_source(self):
+        """Chunks respect the size limit and any text iterable can be streamed"""
+        from utils.response_generator import response_events, split_chunks
+        
+        text = 'Try holding the power button for 15 seconds, then plug in the charger.  Wait.'
+        chunks = list(split_chunks(text, max_chars=20))
+        assert ''.join(chunks) == text
+        assert all(len(chunk) <= 20 for chunk in chunks)
+        assert list(split_chunks('')) == []
+        
+        events = list(response_events({'response': 'ignored', 'intent': 'faq'}, iter(['Hel', 'lo', ''])))
+        assert events == [
+            ('meta', {'intent': 'faq'}),
+            ('chunk', {'text': 'Hel'}),
+            ('chunk', {'text': 'lo'}),
+            ('done', {'response': 'Hello'})
+        ]
+    
+    def test_asgi_stream(self):
+        """The async mode streams the same events as separate body messages"""
+        import asyncio
+        from asgi import app as asgi_app
+        from utils.response_generator import parse_sse
+        
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat/stream',
+                 'headers': [(b'content-type', b'application/json')]}
+        messages = [{'type': 'http.request', 'body': json.dumps({'message': 'How do I return an item?'}).encode()}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message)
+        
+        asyncio.run(asgi_app(scope, receive, send))
+        assert sent[0]['status'] == 200
+        assert (b'content-type', b'text/event-stream; charset=utf-8') in sent[0]['headers']
+        events = parse_sse(b''.join(message['body'] for message in sent[1:]).decode())
+        assert [event for event, _ in events][0] == 'meta'
+        assert events[-1][0] == 'done'
+        assert sent[-1].get('more_body', False) is False    
+    def test_asgi_stream_get(self):
+        """The async mode serves the EventSource GET form like Flask does"""
+        import asyncio
+        from asgi import app as asgi_app
+        from utils.response_generator import parse_sse
+        
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/chat/stream',
+                 'query_string': b'message=How+do+I+return+an+item%3F', 'headers': []}
+        sent = []
+        
+        async def receive():
+            return {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+        
+        asyncio.run(asgi_app(scope, receive, send))
+        assert sent[0]['status'] == 200
+        events = parse_sse(b''.join(message['body'] for message in sent[1:]).decode())
+        assert events[0][0] == 'meta' and events[0][1]['intent'] == 'faq'
+        assert events[-1][0] == 'done'
+
+
+class TestSessions:
+    """Test cases for conversation sessions and follow-up questions"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        from models.session_store import SessionStore
+        
+        now = [0.0]
+        store = SessionStore(str(tmp_path / 'sessions.db'), max_active=3, max_turns=4, ttl=60,
+                             pool_size=2, clock=lambda: now[0]).initialize()
+        store.now = now
+        yield store
+        store.close()
+    
+    def test_follow_up_uses_last_order(self, client, app_sessions):
+        """'and when will it arrive?' answers about the order from the previous turn"""
+        session_id = f'test-{os.getpid()}-follow-up'
+        first = client.post('/api/chat', json={'message': 'Where is my order ORD-12345?', 'session_id': session_id})
+        follow_up = client.post('/api/chat', json={'message': 'and when will it arrive?', 'session_id': session_id})
+        
+        assert first.get_json()['session_id'] == session_id
+        assert follow_up.get_json()['intent'] == 'order_status'
+        assert 'ORD-12345' in follow_up.get_json()['response']
+        
+        # Without a session the same question has no context
+        stateless = client.post('/api/chat', json={'message': 'and when will it arrive?'}).get_json()
+        assert stateless['intent'] != 'order_status'
+        assert 'session_id' not in stateless
+    
+    def test_session_endpoint(self, client, app_sessions):
+        """GET /api/session/<id> lists the recent turns once history_endpoint is enabled"""
+        import app as app_module
+        
+        session_id = f'test-{os.getpid()}-history'
+        client.post('/api/chat', json={'message': 'What is your return policy?', 'session_id': session_id})
+        assert client.get(f'/api/session/{session_id}').status_code == 404
+        
+        app_module.SESSION_HISTORY_ENABLED = True
+        try:
+            data = client.get(f'/api/session/{session_id}').get_json()
+            missing = client.get('/api/session/never-seen')
+        finally:
+            app_module.SESSION_HISTORY_ENABLED = False
+        
+        assert data['found'] is True
+        assert data['turns'][-1]['message'] == 'What is your return policy?'
+        assert data['turns'][-1]['intent'] == 'faq'
+        assert missing.status_code == 404
+    
+    def test_ring_buffer_keeps_recent_turns(self, store):
+        """Only the last max_turns turns are kept, oldest first"""
+        from models.session_store import Turn
+        
+        for i in range(6):
+            store.record('a', Turn(f'message {i}', 'general'))
+        session = store.get('a')
+        
+        assert [turn.message for turn in session.history()] == ['message 2', 'message 3', 'message 4', 'message 5']
+        assert session.last().message == 'message 5'
+        assert not hasattr(session.last(), '__dict__')
+    
+    def test_lru_eviction_spills_and_restores(self, store):
+        """Sessions beyond max_active go to SQLite and come back intact"""
+        from models.session_store import Turn
+        
+        for name in ['a', 'b', 'c', 'd']:
+            store.record(name, Turn(f'hello from {name}', 'general', order_number='ORD-12345'))
+        
+        assert len(store) == 3
+        assert store.stats()['spilled'] == 1
+        restored = store.get('a')
+        assert restored.last().message == 'hello from a'
+        assert restored.last().order_number == 'ORD-12345'
+        assert store.stats()['restored'] == 1
+        assert len(store) == 3
+    
+    def test_idle_sessions_expire(self, store):
+        """Sessions idle past the TTL leave memory but are not lost"""
+        from models.session_store import Turn
+        
+        store.record('idle', Turn('hi', 'general'))
+        store.now[0] = 30.0
+        store.record('busy', Turn('hi', 'general'))
+        store.now[0] = 75.0
+        
+        assert store.expire() == 1
+        assert len(store) == 1
+        assert store.get('idle').last().message == 'hi'
+        assert store.get('missing') is None
+    
+    def test_concurrent_turns_survive_eviction(self, store):
+        """Turns recorded while other sessions force spills are never lost"""
+        import threading
+        from models.session_store import Turn
+        
+        store.max_turns = 1000
+        
+        def talk(name):
+            for i in range(50):
+                store.record(name, Turn(f'{name} {i}', 'general'))
+        
+        threads = [threading.Thread(target=talk, args=(f's{n}',)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for n in range(6):
+            assert len(store.get(f's{n}').history()) == 50
+    
+    def test_purge_deletes_old_spilled_sessions(self, tmp_path):
+        """Spilled sessions untouched for longer than retention are deleted"""
+        from models.session_store import SessionStore, Turn
+        
+        now = [1000.0]
+        store = SessionStore(str(tmp_path / 'sessions.db'), max_active=1, retention=60, pool_size=2,
+                             wall_clock=lambda: now[0]).initialize()
+        try:
+            store.record('old', Turn('hi', 'general'))
+            store.record('new', Turn('hi', 'general'))
+            now[0] = 1030.0
+            store.record('newer', Turn('hi', 'general'))
+            now[0] = 1070.0
+            
+            assert store.purge() == 1
+            assert store.stats()['purged'] == 1
+            assert store.get('old') is None
+            assert store.get('new').last().message == 'hi'
+        finally:
+            store.close()
+    
+    def test_maintenance_thread_expires_sessions(self, store):
+        """start_maintenance spills idle sessions without any request arriving"""
+        import time
+        from models.session_store import Turn
+        
+        store.record('idle', Turn('hi', 'general'))
+        store.now[0] = 120.0
+        store.start_maintenance(0.01)
+        try:
+            deadline = time.time() + 2
+            while len(store) and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            store.stop_maintenance()
+        
+        assert len(store) == 0
+        assert store.stats()['spilled'] == 1
+
+class TestPreparedResponses:
+    """Test cases for pre-encoded response bodies"""
+    
+    def test_faq_hits_reuse_one_encoded_body(self, client):
+        """Every hit on a FAQ writes the same bytes, encoded once per snapshot"""
+        import app as app_module
+        
+        first = client.post('/api/chat', json={'message': 'What is your return policy?'})
+        second = client.post('/api/chat', json={'message': 'what is your return policy'})
+        data = first.get_json()
+        
+        assert first.mimetype == 'application/json'
+        assert first.data == second.data
+        assert data['intent'] == 'faq' and data['confidence'] == 85 and data['source'] == 'faq_database'
+        
+        faq = app_module.find_faq_answer('What is your return policy?')
+        assert app_module.build_faq_response(faq) is app_module.build_faq_response(faq)
+        assert app_module.build_faq_response(faq).body == first.data
+    
+    def test_sessions_do_not_modify_shared_response(self, client, app_sessions):
+        """Adding session_id copies the prepared response"""
+        import app as app_module
+        
+        data = client.post('/api/chat', json={'message': 'What is your return policy?',
+                                              'session_id': f'test-{os.getpid()}-prepared'}).get_json()
+        faq = app_module.find_faq_answer('What is your return policy?')
+        
+        assert data['session_id'].endswith('-prepared')
+        assert 'session_id' not in app_module.build_faq_response(faq)
+        assert b'session_id' not in app_module.build_faq_response(faq).body
+    
+    def test_static_bodies(self, client):
+        """/, /api/test and /health serve their pre-encoded bodies"""
+        from app import HEALTH_RESPONSE
+        
+        response = client.get('/health')
+        assert response.data == HEALTH_RESPONSE.body
+        assert response.get_json() == {'status': 'healthy', 'service': 'customer-support-bot'}
+        assert response.headers['Access-Control-Allow-Origin'] == '*'
+        assert client.get('/').get_json()['status'] == 'active'
+        assert client.get('/api/test').get_json()['status'] == 'success'
+    
+    def test_artifact_bodies_come_from_the_file(self, tmp_path):
+        """A mapped artifact supplies each FAQ's body without re-encoding"""
+        from models.faq_artifact import build_artifact
+        from models.knowledge_store import KnowledgeStore
+        from utils.response_generator import encode_json, faq_response_fields
+        
+        data_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'data')
+        artifact = str(tmp_path / 'faq_index.bin')
+        faqs_path = os.path.join(data_dir, 'faqs.json')
+        knowledge_base_path = os.path.join(data_dir, 'knowledge_base.json')
+        build_artifact(faqs_path, knowledge_base_path, artifact)
+        snapshot = KnowledgeStore(knowledge_base_path, faqs_path, artifact_path=artifact).load()
+        
+        _, faq = snapshot.index.match('How can I track my order?')
+        response = snapshot.faq_response(faq)
+        assert snapshot.origin == 'artifact'
+        assert response.body == encode_json(faq_response_fields(faq))
+        assert snapshot.faq_response(faq) is response
+        
+        # A FAQ from other data is answered but not cached
+        foreign = {'question': 'q', 'answer': 'a'}
+        assert snapshot.faq_response(foreign)['response'] == 'a'
+        assert snapshot.faq_response(foreign) is not snapshot.faq_response(foreign)
+
+class TestStartup:
+    """Test cases for the app factory, warm-up phases and readiness"""
+    
+    def test_ready_after_sync_warm_up(self, client):
+        """/ready reports 200 with a timing for every start-up phase"""
+        response = client.get('/ready')
+        data = response.get_json()
+        
+        assert response.status_code == 200
+        assert data['ready'] is True and data['error'] is None
+        assert data['faq_count'] > 0
+        for phase in ('config', 'app', 'knowledge', 'orders', 'matchers'):
+            assert phase in data['phases_ms']
+        assert data['total_ms'] >= 0
+    
+    def test_steps_run_once_in_the_background(self):
+        """A background warm-up runs each step once and flips readiness at the end"""
+        import threading
+        from utils.startup import Startup
+        
+        startup = Startup()
+        release = threading.Event()
+        calls = []
+        startup.step('slow')(lambda: (calls.append('slow'), release.wait(5)))
+        startup.step('fast')(lambda: calls.append('fast'))
+        
+        thread = startup.start()
+        assert startup.wait(0.05) is False
+        assert startup.report()['ready'] is False
+        # Later calls do not run the steps again
+        startup.warm_up()
+        release.set()
+        thread.join(5)
+        
+        assert startup.wait(1) is True
+        assert calls == ['slow', 'fast']
+        assert list(startup.report()['phases_ms']) == ['slow', 'fast']
+    
+    def test_failed_step_is_reported(self):
+        """A step that raises leaves the service not ready with the error recorded"""
+        from utils.startup import Startup
+        
+        startup = Startup()
+        
+        @startup.step('broken')
+        def broken():
+            raise OSError('disk gone')
+        
+        with pytest.raises(OSError):
+            startup.warm_up()
+        report = startup.report()
+        assert report['ready'] is False
+        assert report['error'] == 'OSError: disk gone'
+    
+    def test_failed_warm_up_answers_at_once(self):
+        """After a failed warm-up, requests get 503 without waiting out the timeout"""
+        import threading
+        import time
+        import app as app_module
+        from utils.startup import Startup
+        
+        failing = Startup()
+        started = threading.Event()
+        
+        @failing.step('broken')
+        def broken():
+            started.set()
+            time.sleep(0.1)
+            raise OSError('disk gone')
+        
+        # A request waiting on a warm-up in progress is released when it fails
+        failing.start()
+        started.wait(1)
+        start = time.monotonic()
+        assert failing.wait(5) is False
+        assert time.monotonic() - start < 1
+        
+        original = app_module.startup
+        app_module.startup = failing
+        try:
+            start = time.monotonic()
+            assert app_module.ensure_ready() is False
+            response = app_module.app.test_client().post('/api/chat', json={'message': 'hello'})
+            assert response.status_code == 503
+            assert time.monotonic() - start < 1
+        finally:
+            app_module.startup = original
+    
+    def test_factory_builds_independent_apps(self):
+        """create_app returns a fresh app sharing the loaded data"""
+        from app import app as default_app, create_app
+        
+        other = create_app('lazy')
+        assert other is not default_app
+        assert other.test_client().get('/health').status_code == 200
+        response = other.test_client().post('/api/chat', json={'message': 'Where is my order ORD-12345?'})
+        assert response.get_json()['intent'] == 'order_status'
+
+class TestAdmission:
+    """Test cases for rate limiting and load shedding on chat and order routes"""
+    
+    class Clock:
+        def __init__(self):
+            self.now = 0.0
+        
+        def __call__(self):
+            return self.now
+    
+    def test_token_bucket_refills(self):
+        """A client gets burst requests, then 429 until tokens refill"""
+        from utils.admission import AdmissionController
+        
+        clock = self.Clock()
+        controller = AdmissionController(rate=2, burst=3, clock=clock)
+        for _ in range(3):
+            assert controller.admit('a') is None
+            controller.release(0.01)
+        
+        rejection = controller.admit('a')
+        assert rejection.status == 429 and rejection.retry_after == 1
+        # Other clients have their own bucket
+        assert controller.admit('b') is None
+        controller.release()
+        
+        clock.now = 0.5
+        assert controller.admit('a') is None
+        controller.release()
+        assert controller.stats()['shed'] == {'rate_limited': 1, 'overloaded': 0}
+    
+    def test_sheds_over_capacity(self):
+        """Past the in-flight cap or the latency budget requests get 503"""
+        from utils.admission import AdmissionController
+        
+        controller = AdmissionController(rate=0, max_in_flight=3, concurrency=2, latency_budget=10)
+        for _ in range(3):
+            assert controller.admit('a') is None
+        assert controller.admit('a').status == 503
+        for _ in range(3):
+            controller.release(1.0)
+        
+        # One second per request on two workers: the fourth waits 1s, over a 0.6s budget
+        controller.latency_budget = 0.6
+        for _ in range(2):
+            assert controller.admit('a') is None
+        assert controller.admit('a') is None
+        rejection = controller.admit('a')
+        assert rejection.status == 503 and rejection.reason == 'overloaded'
+        assert controller.stats()['in_flight'] == 3
+    
+    def test_routes_return_retry_after(self, client):
+        """Refused chat requests carry Retry-After; health and metrics are never limited"""
+        import app as app_module
+        from utils.admission import AdmissionController
+        
+        original = app_module.admission
+        app_module.admission = AdmissionController(rate=0.001, burst=1)
+        try:
+            assert client.post('/api/chat', json={'message': 'hello'}).status_code == 200
+            response = client.post('/api/chat', json={'message': 'hello'})
+            assert response.status_code == 429
+            assert int(response.headers['Retry-After']) >= 1
+            assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+            assert client.get('/api/order/ORD-12345').status_code == 429
+            for _ in range(3):
+                assert client.get('/health').status_code == 200
+            assert app_module.admission.stats()['in_flight'] == 0
+        finally:
+            app_module.admission = original
+    
+    def test_metrics_report_admission(self, client):
+        """Admitted and shed counters appear in /metrics"""
+        client.post('/api/chat', json={'message': 'hello'})
+        body = client.get('/metrics').get_data(as_text=True)
+        
+        assert 'admission_admitted_total' in body
+        assert 'admission_shed_total{reason="rate_limited"}' in body
+        assert 'admission_shed_total{reason="overloaded"}' in body
+
+class TestOrderLookupCoalescing:
+    """Test cases for shared in-flight order queries and the order cache"""
+    
+    def test_single_flight_shares_result_and_errors(self):
+        """Concurrent callers for one key run the function once"""
+        import threading
+        import time
+        from utils.cache import SingleFlight
+        
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        
+        def slow(key):
+            calls.append(key)
+            release.wait(5)
+            return {'key': key}
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('a', slow, 'a'))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()['shared'] < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert calls == ['a'] and len(results) == 6
+        assert all(result is results[0] for result in results)
+        assert flight.stats() == {'calls': 1, 'shared': 5, 'in_flight': 0}
+        
+        def fail():
+            raise ValueError('database down')
+        with pytest.raises(ValueError):
+            flight.do('b', fail)
+        assert flight.stats()['in_flight'] == 0
+    
+    def test_concurrent_lookups_query_once(self):
+        """Spellings of one order number share a query and then the cache"""
+        import threading
+        import time
+        import app as app_module
+        
+        app_module.order_cache.invalidate()
+        original = app_module.order_store.get
+        queried = []
+        
+        def slow_get(order_number):
+            queried.append(order_number)
+            time.sleep(0.05)
+            return original(order_number)
+        
+        app_module.order_store.get = slow_get
+        try:
+            results = []
+            threads = [threading.Thread(target=lambda number=number: results.append(get_order_status(number)))
+                       for number in ['ORD-12345', 'ord-12345', '#12345', '12345'] * 3]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            assert queried == ['ORD-12345']
+            assert len(results) == 12 and all(result['status'] == 'shipped' for result in results)
+            
+            # Unknown orders are cached too, so repeats do not reach the database
+            assert get_order_status('ORD-99999') is None
+            assert get_order_status('ORD-99999') is None
+            assert queried == ['ORD-12345', 'ORD-99999']
+        finally:
+            app_module.order_store.get = original
+            app_module.order_cache.invalidate()
+    
+    def test_order_cache_expires(self):
+        """Cached order results are dropped after their short TTL"""
+        from utils.cache import MISSING, ResponseCache
+        
+        now = [0.0]
+        cache = ResponseCache(ttl=2, clock=lambda: now[0])
+        cache.set('ORD-12345', {'status': 'shipped'})
+        now[0] = 1.5
+        assert cache.get('ORD-12345') == {'status': 'shipped'}
+        now[0] = 2.5
+        assert cache.get('ORD-12345') is MISSING
+    
+    def test_metrics_report_order_lookups(self, client):
+        """Order query and cache counters appear in /metrics"""
+        client.get('/api/order/ORD-67890')
+        body = client.get('/metrics').get_data(as_text=True)
+        
+        for name in ('order_cache_hits_total', 'order_queries_total', 'order_queries_shared_total'):
+            assert name in body
+
+class TestAnswerGenerator:
+    """Test cases for the generated fallback answers against a local stub backend"""
+    
+    @pytest.fixture
+    def backend(self):
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        state = {'requests': [], 'delays': [], 'status': 200}
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                state['requests'].append((body, self.headers.get('Authorization')))
+                delay = state['delays'].pop(0) if state['delays'] else 0
+                time.sleep(delay)
+                question = body['messages'][-1]['content']
+                if body.get('stream'):
+                    self.send_response(state['status'])
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.end_headers()
+                    for piece in ['Answer ', 'to ', question]:
+                        delta = {'choices': [{'delta': {'content': piece}}]}
+                        self.wfile.write(f'data: {json.dumps(delta)}\n\n'.encode())
+                        self.wfile.flush()
+                        time.sleep(state.get('piece_delay', 0))
+                    self.wfile.write(b'data: [DONE]\n\n')
+                    return
+                payload = json.dumps({'choices': [{'message': {
+                    'role': 'assistant', 'content': f' Answer to {question} after {delay}s '}}]}).encode()
+                self.send_response(state['status'])
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        state['url'] = f'http://127.0.0.1:{server.server_port}/v1/chat/completions'
+        yield state
+        server.shutdown()
+        server.server_close()
+    
+    def test_http_generator(self, backend):
+        """Questions are posted as chat completions and the reply text returned"""
+        from utils.response_generator import HTTPAnswerGenerator
+        
+        generator = HTTPAnswerGenerator(backend['url'], model='stub-model', api_key='sk-test')
+        assert generator.generate('Do you sell gift cards?') == 'Answer to Do you sell gift cards? after 0s'
+        body, authorization = backend['requests'][0]
+        assert body['model'] == 'stub-model' and body['messages'][0]['role'] == 'system'
+        assert authorization == 'Bearer sk-test'
+    
+    def test_timeout_falls_back_without_blocking(self, backend):
+        """A slow backend costs callers the timeout, not the backend's latency"""
+        import time
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        backend['delays'] = [0.5]
+        pool = GeneratorPool(HTTPAnswerGenerator(backend['url'], timeout=1.0), timeout=0.1)
+        start = time.monotonic()
+        assert pool.answer('Do you sell gift cards?') is None
+        assert time.monotonic() - start < 0.4
+        assert pool.stats()['timeouts'] == 1
+        pool.close()
+    
+    def test_pool_is_bounded(self, backend):
+        """Past max_pending calls, callers fall back at once instead of queueing"""
+        import threading
+        import time
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        backend['delays'] = [0.3, 0.3]
+        pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), workers=2, max_pending=2, timeout=1.0)
+        threads = [threading.Thread(target=pool.answer, args=(f'question {i}',)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        while len(backend['requests']) < 2:
+            time.sleep(0.005)
+        
+        start = time.monotonic()
+        assert pool.answer('one more question') is None
+        assert time.monotonic() - start < 0.1
+        for thread in threads:
+            thread.join()
+        assert pool.stats()['rejected'] == 1 and pool.stats()['generated'] == 2
+        pool.close()
+    
+    def test_hedged_attempt_wins(self, backend):
+        """A hedged second attempt answers when the first is slow"""
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        backend['delays'] = [0.8, 0]
+        pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), timeout=0.5, hedge_after=0.05)
+        assert pool.answer('Do you sell gift cards?') == 'Answer to Do you sell gift cards? after 0s'
+        assert pool.stats()['hedged'] == 1
+        pool.close()
+    
+    def test_answers_cached_by_normalized_question(self, backend):
+        """Repeats of a question, in any case or spacing, reuse the first answer"""
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), timeout=1.0)
+        first = pool.answer('Do you sell gift cards?')
+        assert pool.answer('  do you SELL gift   cards? ') == first
+        assert pool.answer_many(['DO YOU SELL GIFT CARDS?', 'Any student discount?']) == [
+            first, 'Answer to Any student discount? after 0s']
+        assert len(backend['requests']) == 2
+        
+        # Failures are not cached
+        backend['status'] = 500
+        assert pool.answer('Is there a loyalty program?') is None
+        backend['status'] = 200
+        assert pool.answer('Is there a loyalty program?') is not None
+        pool.close()
+    
+    def test_stream_relays_generated_pieces(self, backend):
+        """meta is sent before generation starts, then the backend's pieces as they arrive"""
+        import time
+        import app as app_module
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        backend['delays'] = [0.3]
+        original = app_module.answer_pool
+        app_module.answer_pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), timeout=1.0)
+        try:
+            start = time.monotonic()
+            response, _, events = app_module.chat_stream_events({'message': 'Tell me a joke'})
+            assert next(events) == ('meta', {'intent': 'general', 'confidence': 50})
+            assert time.monotonic() - start < 0.2
+            
+            rest = list(events)
+            assert [data['text'] for event, data in rest if event == 'chunk'] == ['Answer ', 'to ', 'Tell me a joke']
+            assert rest[-1] == ('done', {'response': 'Answer to Tell me a joke',
+                                         'source': 'generator', 'confidence': 60})
+            assert backend['requests'][0][0]['stream'] is True
+            
+            # The finished answer is cached for /api/chat and later streams
+            assert app_module.answer_pool.answer('tell me a JOKE') == 'Answer to Tell me a joke'
+            _, _, events = app_module.chat_stream_events({'message': 'Tell me a joke'})
+            assert [event for event, _ in events] == ['meta', 'chunk', 'done']
+            assert len(backend['requests']) == 1
+            
+            # Without an answer in time the stream falls back to a canned reply
+            backend['delays'] = [0.5]
+            app_module.answer_pool.timeout = 0.1
+            _, _, events = app_module.chat_stream_events({'message': 'Any student discount?'})
+            done = list(events)[-1]
+            assert done[1]['response'] in app_module.GENERAL_RESPONSES and 'source' not in done[1]
+        finally:
+            app_module.answer_pool.close()
+            app_module.answer_pool = original
+    
+    def test_generator_must_implement_generate(self):
+        """AnswerGenerator is abstract; subclasses only need generate() to stream"""
+        from utils.response_generator import AnswerGenerator
+        
+        class Incomplete(AnswerGenerator):
+            pass
+        
+        class Echo(AnswerGenerator):
+            def generate(self, question):
+                return question
+        
+        with pytest.raises(TypeError):
+            Incomplete()
+        assert list(Echo().stream('hello')) == ['hello']
+    
+    def test_lifespan_shutdown_closes_pool(self, backend):
+        """The ASGI lifespan shutdown closes the generator pool; later calls fall back"""
+        import asyncio
+        import asgi as asgi_module
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), timeout=1.0)
+        messages = [{'type': 'lifespan.shutdown'}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message)
+        
+        original = asgi_module.answer_pool
+        asgi_module.answer_pool = pool
+        try:
+            asyncio.run(asgi_module.ChatASGIApp()({'type': 'lifespan'}, receive, send))
+        finally:
+            asgi_module.answer_pool = original
+        
+        assert sent == [{'type': 'lifespan.shutdown.complete'}]
+        assert pool.answer('Do you sell gift cards?') is None
+        assert pool.stream('Do you sell gift cards?') is None
+        assert pool.counts['rejected'] == 2
+        assert backend['requests'] == []
+    
+    def test_chat_uses_generator(self, client, backend):
+        """Unmatched chat messages get generated answers, canned ones when it fails"""
+        import app as app_module
+        from utils.response_generator import GeneratorPool, HTTPAnswerGenerator
+        
+        original = app_module.answer_pool
+        app_module.answer_pool = GeneratorPool(HTTPAnswerGenerator(backend['url']), timeout=1.0)
+        try:
+            data = client.post('/api/chat', json={'message': 'Tell me a joke'}).get_json()
+            assert data['intent'] == 'general' and data['source'] == 'generator'
+            assert data['response'] == 'Answer to Tell me a joke after 0s'
+            
+            results = client.post('/api/chat/batch', json={
+                'messages': ['Any student discount?', 'What is your return policy?']}).get_json()['results']
+            assert results[0]['source'] == 'generator' and results[1]['intent'] == 'faq'
+            
+            backend['status'] = 500
+            data = client.post('/api/chat', json={'message': 'Is there a loyalty program?'}).get_json()
+            assert data['response'] in app_module.GENERAL_RESPONSES and 'source' not in data
+        finally:
+            app_module.answer_pool.close()
+            app_module.answer_pool = original
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file
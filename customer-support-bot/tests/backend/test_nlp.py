@@ -316,5 +316,575 @@ class TestPerformance:
         # Should be able to handle reasonable number of FAQs
         assert total_faqs < 1000, "Too many FAQs for efficient matching"
 
+class TestFAQIndex:
+    """Test cases for the precompiled FAQ index"""
+    
+    @staticmethod
+    def reference_match(faqs, message):
+        """Original linear-scan scoring, kept here as the behavioural reference"""
+        message_lower = message.lower().strip()
+        if len(message_lower) < 3 or message_lower in ['hello', 'hi', 'hey']:
+            return None
+        
+        best_match = None
+        highest_score = 0
+        for category, questions in faqs.items():
+            for faq in questions:
+                score = 0
+                question_words = faq['question'].lower().split()
+                if len(question_words) > 3:
+                    matching_words = sum(1 for word in question_words[:5] if word in message_lower)
+                    if matching_words >= 2:
+                        score += 3
+                keyword_matches = 0
+                for keyword in faq.get('keywords', []):
+                    if keyword in message_lower:
+                        keyword_matches += 1
+                        score += 1
+                if keyword_matches >= 2:
+                    score += 2
+                question_similarity = len(set(message_lower.split()) & set(faq['question'].lower().split()))
+                if question_similarity < 1:
+                    score -= 2
+                if score > highest_score and score >= 2:
+                    highest_score = score
+                    best_match = faq
+        return best_match
+    
+    def test_index_matches_reference_on_real_faqs(self):
+        """Index must pick exactly the FAQ the linear scan picks"""
+        import random
+        from app import faqs
+        
+        vocabulary = set()
+        for questions in faqs.values():
+            for faq in questions:
+                vocabulary.update(faq['question'].lower().split())
+                for keyword in faq['keywords']:
+                    vocabulary.update(keyword.split())
+        vocabulary = sorted(vocabulary) + ['please', 'thanks', 'xyz', 'where', 'is', 'my']
+        
+        rng = random.Random(1234)
+        messages = [faq['question'] for questions in faqs.values() for faq in questions]
+        messages += [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 10))) for _ in range(2000)]
+        
+        for message in messages:
+            assert find_faq_answer(message) is self.reference_match(faqs, message), message
+    
+    def test_index_matches_reference_on_synthetic_faqs(self):
+        """Overlapping keywords, repeated words and ties behave like the linear scan"""
+        import random
+        from utils.nlp_processor import FAQIndex
+        
+        rng = random.Random(99)
+        words = ['ship', 'shipping', 'hip', 'order', 'or', 'red', 'pay', 'repay', 'a', 'an', 'card', 'car']
+        synthetic = {}
+        for c in range(4):
+            synthetic[f'cat{c}'] = [
+                {
+                    'question': ' '.join(rng.choice(words) for _ in range(rng.randint(2, 7))),
+                    'answer': f'answer {c}-{i}',
+                    'keywords': [' '.join(rng.choice(words) for _ in range(rng.randint(1, 2)))
+                                 for _ in range(rng.randint(1, 4))]
+                }
+                for i in range(25)
+            ]
+        index = FAQIndex.from_faqs(synthetic)
+        
+        for _ in range(2000):
+            message = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+            expected = self.reference_match(synthetic, message)
+            match = index.match(message)
+            assert (match[1] if match else None) is expected, message
+    
+    def test_typos_match_with_edit_distance(self):
+        """Misspelt words are corrected to the FAQ vocabulary when nothing matches exactly"""
+        from app import knowledge_store
+        
+        index = knowledge_store.snapshot.index
+        assert index.match('trak my ordr') is None
+        match = index.match('trak my ordr', max_edit_distance=2)
+        assert match is not None and 'track' in match[1]['question'].lower()
+        assert find_faq_answer('i want a refnd please') is not None
+        
+        corrector = index.corrector(2)
+        assert corrector.correct_word('ordr') == 'order'
+        assert corrector.correct_word('retrun') == 'return'
+        # Short words and words too far from the vocabulary stay as they are
+        assert corrector.correct_word('ord') is None
+        assert corrector.correct_word('zzzzzzz') is None
+        assert corrector.correct('where is my order') is None
+    
+    def test_real_words_are_not_corrected(self):
+        """Correctly spelt words near the FAQ vocabulary never turn into FAQ answers"""
+        from app import knowledge_store
+        
+        index = knowledge_store.snapshot.index
+        for message in ('this is terrible service', 'I was charged twice',
+                        'the charger is missing from the box'):
+            assert index.match(message, max_edit_distance=2) is None, message
+            assert find_faq_answer(message) is None, message
+        
+        corrector = index.corrector(2)
+        assert corrector.correct_word('service') is None
+        assert corrector.correct_word('charged') is None
+        # Words under TWO_EDIT_LENGTH get a single edit
+        assert corrector.correct_word('devce') == 'device'
+        assert corrector.correct_word('dvce') is None
+    
+    def test_warm_up_builds_corrector(self):
+        """The keyword matcher's corrector is ready before the first typo"""
+        import app as app_module
+        
+        index = app_module.knowledge_store.snapshot.index
+        index._correctors.clear()
+        app_module.warm_matchers()
+        assert app_module.max_edit_distance in index._correctors
+    
+    def test_edit_distance_bounds(self):
+        """Transpositions count as one edit and distances stop at the limit"""
+        from utils.nlp_processor import edit_distance
+        
+        assert edit_distance('order', 'order', 2) == 0
+        assert edit_distance('retrun', 'return', 2) == 1
+        assert edit_distance('refnd', 'refund', 2) == 1
+        assert edit_distance('abcdef', 'uvwxyz', 2) == 3
+        assert edit_distance('ab', 'abcdef', 2) == 3
+
+class TestFAQRetriever:
+    """Test cases for the TF-IDF FAQ retriever"""
+    
+    def test_tfidf_matches_common_questions(self):
+        """TF-IDF matcher finds the obvious FAQ for common questions"""
+        test_cases = [
+            ('How can I track my order?', 'track'),
+            ('What is your return policy?', 'return'),
+            ('How long does shipping take?', 'shipping')
+        ]
+        
+        for message, expected_keyword in test_cases:
+            result = find_faq_answer(message, 'tfidf')
+            assert result is not None, f"Should match FAQ for: {message}"
+            assert expected_keyword in result['answer'].lower()
+    
+    def test_tfidf_top_k_scores(self):
+        """Search returns at most k hits with descending cosine scores"""
+        from app import get_faq_retriever
+        
+        hits = get_faq_retriever().search('refund for my return', k=3)
+        assert 0 < len(hits) <= 3
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+        assert all(0 < score <= 1.0001 for score in scores)
+    
+    def test_tfidf_batch_matches_single(self):
+        """Batch scoring gives the same result as scoring one message at a time"""
+        from app import get_faq_retriever
+        
+        retriever = get_faq_retriever()
+        messages = ['track my package', 'reset my password', 'Tell me a joke', 'warranty on laptop']
+        assert retriever.search_many(messages) == [retriever.search(message) for message in messages]
+    
+    def test_tfidf_no_match(self):
+        """Unrelated messages and greetings do not match"""
+        assert find_faq_answer('hello', 'tfidf') is None
+        assert find_faq_answer('qwerty zxcvb', 'tfidf') is None
+
+class TestSemanticMatcher:
+    """Test cases for the embedding-based FAQ matcher"""
+    
+    def test_semantic_matches_paraphrases_and_typos(self):
+        """Rephrased and misspelt questions still find their FAQ"""
+        test_cases = [
+            ('what payment methods do you take', 'payment'),
+            ('can I send back an item I bought', 'return'),
+            ('reset my pasword', 'password')
+        ]
+        
+        for message, expected_keyword in test_cases:
+            result = find_faq_answer(message, 'semantic')
+            assert result is not None, f"Should match FAQ for: {message}"
+            assert expected_keyword in (result['question'] + result['answer']).lower()
+    
+    def test_semantic_no_match(self):
+        """Unrelated messages and greetings do not match"""
+        assert find_faq_answer('hello', 'semantic') is None
+        assert find_faq_answer('asdfgh qwerty', 'semantic') is None
+        assert find_faq_answer('what is the weather on mars', 'semantic') is None
+    
+    def test_lsh_agrees_with_exact_search(self):
+        """Bucketed search finds the same best FAQ as a full scan"""
+        sys.path.insert(0, os.path.join(project_root, 'benchmarks'))
+        from synthetic import synthetic_faqs
+        from models.nlp_model import SemanticMatcher
+        
+        entries = [(category, faq) for category, faqs in synthetic_faqs(2000, seed=3).items() for faq in faqs]
+        exact = SemanticMatcher(entries)
+        bucketed = SemanticMatcher(entries, exact_limit=100)
+        assert not exact.tables and bucketed.tables
+        
+        questions = [faq['question'] for _, faq in entries[::40]]
+        agree = sum(a[0][0] == b[0][0] for a, b in zip(exact.search_many(questions, 1), bucketed.search_many(questions, 1)))
+        assert agree >= 0.9 * len(questions)
+        assert bucketed.search('') == []
+
+class TestIntentRouting:
+    """Test cases for the intent classifier and category-sharded matching"""
+    
+    @staticmethod
+    def synthetic_snapshot(size=3000):
+        sys.path.insert(0, os.path.join(project_root, 'benchmarks'))
+        from synthetic import synthetic_faqs
+        from models.knowledge_store import DataSnapshot
+        
+        faqs = synthetic_faqs(size, seed=4)
+        return faqs, DataSnapshot(faqs, {})
+    
+    def test_classifier_routes_to_category(self):
+        """Category-specific words route to that category; vague messages fall back to a full scan"""
+        from models.nlp_model import IntentClassifier
+        
+        faqs, _ = self.synthetic_snapshot()
+        classifier = IntentClassifier.train(faqs)
+        assert classifier.categories == list(faqs)
+        
+        assert classifier.route('how do i track my package delivery') == ['order_related']
+        assert classifier.route('refund for my return label') == ['return_refund']
+        assert classifier.route('hello') is None
+        probabilities = [probability for _, probability in classifier.predict('paypal invoice')]
+        assert probabilities == sorted(probabilities, reverse=True)
+        assert abs(sum(probabilities) - 1) < 1e-5
+    
+    def test_two_categories(self, tmp_path):
+        """A binary fit still predicts both categories, and a store with two categories loads"""
+        import json
+        from sklearn.linear_model import LogisticRegression
+        from models.knowledge_store import KnowledgeStore
+        from models.nlp_model import IntentClassifier
+        
+        faqs, _ = self.synthetic_snapshot(600)
+        faqs = {category: faqs[category] for category in ['return_refund', 'order_related']}
+        classifier = IntentClassifier.train(faqs)
+        assert classifier.categories == ['return_refund', 'order_related']
+        assert classifier.weights.shape[1] == 2
+        assert classifier.route('how do i track my package delivery') == ['order_related']
+        assert classifier.route('refund for my return label') == ['return_refund']
+        probabilities = dict(classifier.predict('refund for my return label'))
+        assert abs(sum(probabilities.values()) - 1) < 1e-5
+        
+        faqs_path = tmp_path / 'faqs.json'
+        kb_path = tmp_path / 'knowledge_base.json'
+        faqs_path.write_text(json.dumps(faqs))
+        kb_path.write_text(json.dumps({}))
+        store = KnowledgeStore(str(kb_path), str(faqs_path), artifact_path=str(tmp_path / 'faqs.artifact'),
+                               build_artifact=True, intent_model_path=str(tmp_path / 'intent_model.npz'),
+                               intent_min_faqs=100)
+        store.load()
+        assert store.snapshot.intent_classifier().categories == ['return_refund', 'order_related']
+        assert store.snapshot.route('how do i track my package delivery') == [store.snapshot.shards['order_related']]
+    
+    def test_saved_model_round_trip_and_staleness(self, tmp_path):
+        """A saved model predicts the same; it is rejected once faqs.json changes"""
+        import json
+        from models.faq_artifact import ArtifactError, source_fingerprint
+        from models.nlp_model import IntentClassifier, ensure_intent_model
+        
+        faqs, _ = self.synthetic_snapshot(600)
+        faqs_path = tmp_path / 'faqs.json'
+        faqs_path.write_text(json.dumps(faqs))
+        model_path = str(tmp_path / 'intent_model.npz')
+        
+        assert ensure_intent_model(str(faqs_path), model_path) is True
+        assert ensure_intent_model(str(faqs_path), model_path) is False
+        loaded = IntentClassifier.load(model_path, str(faqs_path))
+        trained = IntentClassifier.train(faqs, sources={'faqs': source_fingerprint(str(faqs_path))})
+        assert loaded.predict('screen battery charger') == trained.predict('screen battery charger')
+        
+        faqs['order_related'].pop()
+        faqs_path.write_text(json.dumps(faqs))
+        with pytest.raises(ArtifactError):
+            IntentClassifier.load(model_path, str(faqs_path))
+        with pytest.raises(ArtifactError):
+            IntentClassifier.load(str(tmp_path / 'missing.npz'))
+    
+    def test_sharded_scoring_matches_category_index(self):
+        """Scoring one shard gives what an index of that category alone gives"""
+        import random
+        from utils.nlp_processor import FAQIndex
+        
+        faqs, snapshot = self.synthetic_snapshot(1200)
+        start, end = snapshot.shards['billing_payment']
+        alone = FAQIndex.from_faqs({'billing_payment': faqs['billing_payment']})
+        
+        rng = random.Random(7)
+        entries = [faq for questions in faqs.values() for faq in questions]
+        for _ in range(200):
+            words = rng.choice(entries)['question'].lower().rstrip('?').split()
+            message = ' '.join(rng.sample(words, rng.randint(2, len(words))))
+            sharded = snapshot.index.match(message, shards=[(start, end)])
+            expected = alone.match(message)
+            assert (sharded[1] if sharded else None) is (expected[1] if expected else None), message
+    
+    def test_tfidf_shards_limit_positions(self):
+        """TF-IDF search over shards only returns FAQs inside them"""
+        from models.nlp_model import FAQRetriever
+        
+        _, snapshot = self.synthetic_snapshot(1200)
+        retriever = FAQRetriever(snapshot.entries)
+        shards = sorted([snapshot.shards['order_related'], snapshot.shards['account_management']])
+        hits = retriever.search('update my account password email', k=20, shards=shards)
+        assert hits
+        assert all(any(start <= position < end for start, end in shards) for position, _ in hits)
+        assert retriever.search_many(['track my order'], shards=None) == retriever.search_many(['track my order'])
+
+class TestFAQArtifact:
+    """Test cases for the compiled binary FAQ artifact"""
+    
+    @pytest.fixture
+    def data_files(self, tmp_path):
+        backend_dir = os.path.join(project_root, 'backend', 'data')
+        paths = {}
+        for name in ('faqs.json', 'knowledge_base.json'):
+            target = tmp_path / name
+            with open(os.path.join(backend_dir, name), 'rb') as f:
+                target.write_bytes(f.read())
+            paths[name] = str(target)
+        paths['artifact'] = str(tmp_path / 'faq_index.bin')
+        return paths
+    
+    def test_artifact_round_trip_matches_json_index(self, data_files):
+        """A mapped artifact answers exactly like an index built from JSON"""
+        import json
+        from models.faq_artifact import build_artifact, load_artifact
+        from utils.nlp_processor import FAQIndex
+        
+        build_artifact(data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        mapped, knowledge_base, header = load_artifact(
+            data_files['artifact'], data_files['faqs.json'], data_files['knowledge_base.json'])
+        with open(data_files['faqs.json']) as f:
+            built = FAQIndex.from_faqs(json.load(f))
+        
+        assert header['faq_count'] == len(built)
+        assert knowledge_base['company_info']['name'] == 'TechShop Inc.'
+        messages = ['How can I track my order?', 'refund please', 'laptop wont turn on', 'hello', 'what is your return policy']
+        for message in messages:
+            expected = built.match(message)
+            got = mapped.match(message)
+            assert (got[1] if got else None) == (expected[1] if expected else None)
+    
+    def test_mapped_corrector_uses_compiled_deletes(self, data_files):
+        """The spelling corrector reads the artifact's delete table instead of building its own"""
+        import json
+        from models.faq_artifact import build_artifact, load_artifact
+        from utils.nlp_processor import FAQIndex
+        
+        build_artifact(data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        mapped, _, _ = load_artifact(data_files['artifact'], data_files['faqs.json'], data_files['knowledge_base.json'])
+        with open(data_files['faqs.json']) as f:
+            built = FAQIndex.from_faqs(json.load(f))
+        
+        corrector = mapped.corrector(2)
+        assert isinstance(corrector.delete_words, memoryview)
+        assert isinstance(corrector.deletes.blob, memoryview)
+        for word in ('ordr', 'retrun', 'devce', 'service', 'zzzzzzz'):
+            assert corrector.correct_word(word) == built.corrector(2).correct_word(word), word
+        got = mapped.match('trak my ordr', max_edit_distance=2)
+        expected = built.match('trak my ordr', max_edit_distance=2)
+        assert got is not None and got[1] == expected[1]
+    
+    def test_concurrent_decoding_shares_one_entry(self, data_files):
+        """Threads racing on one entry get the same dict and its own response body"""
+        import json
+        import threading
+        from models.faq_artifact import build_artifact, load_artifact
+        from models.knowledge_store import DataSnapshot
+        
+        build_artifact(data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        index, knowledge_base, header = load_artifact(
+            data_files['artifact'], data_files['faqs.json'], data_files['knowledge_base.json'])
+        snapshot = DataSnapshot(None, knowledge_base, index=index, origin='artifact', header=header)
+        
+        barrier = threading.Barrier(8)
+        seen = []
+        
+        def decode(position):
+            barrier.wait()
+            seen.append(index.entries[position])
+        
+        threads = [threading.Thread(target=decode, args=(3,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert all(entry is seen[0] for entry in seen)
+        faq = seen[0][1]
+        assert index.entries.position(faq) == 3
+        assert json.loads(snapshot.faq_response(faq).body)['faq_question'] == faq['question']
+        
+        # An equal dict from elsewhere is answered but never takes a cached body
+        copy = dict(faq)
+        assert index.entries.position(copy) is None and snapshot.faq_position(copy) is None
+        assert snapshot.faq_response(copy) is not snapshot.faq_response(faq)
+        assert snapshot.faq_response(faq) is snapshot.faq_response(faq)
+    
+    def test_stale_or_corrupt_artifact_is_rejected(self, data_files):
+        """Edited sources or a damaged file make the artifact unusable"""
+        from models.faq_artifact import ArtifactError, build_artifact, load_artifact
+        
+        build_artifact(data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        with open(data_files['faqs.json'], 'a') as f:
+            f.write('\n')
+        with pytest.raises(ArtifactError):
+            load_artifact(data_files['artifact'], data_files['faqs.json'], data_files['knowledge_base.json'])
+        
+        with open(data_files['artifact'], 'wb') as f:
+            f.write(b'garbage')
+        with pytest.raises(ArtifactError):
+            load_artifact(data_files['artifact'], data_files['faqs.json'], data_files['knowledge_base.json'])
+    
+    def test_store_prefers_fresh_artifact_and_falls_back_to_json(self, data_files):
+        """KnowledgeStore maps a fresh artifact and uses the JSON otherwise"""
+        from models.faq_artifact import build_artifact
+        from models.knowledge_store import KnowledgeStore
+        
+        store = KnowledgeStore(data_files['knowledge_base.json'], data_files['faqs.json'],
+                               artifact_path=data_files['artifact'])
+        assert store.load().origin == 'json'
+        
+        build_artifact(data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        assert store.reload(force=True) is True
+        assert store.snapshot.origin == 'artifact'
+        assert 'order_related' in store.snapshot.faqs
+        assert store.snapshot.index.match('How can I track my order?') is not None
+    
+    def test_concurrent_workers_build_once(self, data_files):
+        """Processes starting together build the artifact exactly once"""
+        import multiprocessing
+        from models.faq_artifact import ensure_artifact
+        
+        args = (data_files['faqs.json'], data_files['knowledge_base.json'], data_files['artifact'])
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            built = pool.starmap(ensure_artifact, [args] * 4)
+        
+        assert built.count(True) == 1
+        assert ensure_artifact(*args) is False
+    
+    def test_workers_remap_replaced_artifact(self, data_files):
+        """A rebuilt artifact is picked up by every store without decoding entries"""
+        import json
+        from models.knowledge_store import KnowledgeStore
+        
+        workers = [
+            KnowledgeStore(data_files['knowledge_base.json'], data_files['faqs.json'],
+                           artifact_path=data_files['artifact'], build_artifact=True)
+            for _ in range(2)
+        ]
+        for store in workers:
+            assert store.load().origin == 'artifact'
+        assert workers[0].status()['artifact_built_at'] == workers[1].status()['artifact_built_at']
+        assert 'order_related' in workers[0].status()['categories']
+        assert all(entry is None for entry in workers[0].snapshot.index.entries._decoded)
+        
+        with open(data_files['faqs.json']) as f:
+            faqs = json.load(f)
+        faqs['gift_cards'] = [{'question': 'Do you sell gift cards?', 'answer': 'Yes, from $10.', 'keywords': ['gift card']}]
+        with open(data_files['faqs.json'], 'w') as f:
+            json.dump(faqs, f)
+        
+        assert workers[0].reload() is True
+        assert workers[1].reload() is True
+        for store in workers:
+            assert store.snapshot.origin == 'artifact'
+            assert store.snapshot.index.match('do you sell a gift card?')[0] == 'gift_cards'
+        assert workers[0].status()['artifact_built_at'] == workers[1].status()['artifact_built_at']
+
+class TestEntityExtractor:
+    """Test cases for the single-pass entity extractor"""
+    
+    @pytest.fixture
+    def extractor(self):
+        from app import knowledge_base
+        from utils.nlp_processor import EntityExtractor
+        return EntityExtractor(knowledge_base)
+    
+    def test_order_number_matches_inline_regex(self, extractor):
+        """The first order mention is the one the old chat regex found"""
+        old_pattern = r'(?:order|ord)\s*(?:number)?\s*[#]?\s*([a-z0-9]{3,}-?[a-z0-9]+)'
+        messages = [
+            'Where is my order ORD-12345?',
+            'Order #ORD-67890 is urgent',
+            'status of order number 11111',
+            'track ORD12345',
+            'ordering a laptop',
+            'my order is late',
+            'How can I track my order?',
+            'order12345@x.com',
+            'reach me at sam.order12345@mail.com about order 67890'
+        ]
+        
+        for message in messages:
+            match = re.search(old_pattern, message, re.IGNORECASE)
+            assert extractor.extract(message).order_number == (match.group(1) if match else None), message
+        # The email holding the mention is still reported
+        assert extractor.extract('order12345@x.com').emails == ['order12345@x.com']
+    
+    def test_all_entities_in_one_message(self, extractor):
+        """Emails, products, models, issues and urgency come out of one scan"""
+        entities = extractor.extract(
+            'URGENT: my TechBook Pro TB2024 Max wont turn on and is very slow, '
+            'order ORD-12345, email test.user+tag@company.co.uk')
+        
+        assert entities.order_number == 'ORD-12345'
+        assert entities.emails == ['test.user+tag@company.co.uk']
+        assert entities.products == ['TechBook Pro']
+        assert entities.models == ['TB2024 Max']
+        assert entities.issues == ['device_not_turning_on', 'slow_performance']
+        assert entities.urgent is True
+    
+    def test_product_and_urgency_detection(self, extractor):
+        """Product mentions and urgency from the keyword tests are detected"""
+        assert extractor.extract('I want to buy gamerx laptop').products == ['GamerX Laptop']
+        assert extractor.extract('The device keeps crashing').devices == ['device']
+        assert extractor.extract('The device keeps crashing').issues == ['crashing']
+        assert extractor.extract('Need help asap with order').urgent is True
+        assert extractor.extract('Tell me a joke').to_dict()['urgent'] is False
+
+class TestBenchmarkSuite:
+    """Smoke tests for the benchmark suite helpers"""
+    
+    @pytest.fixture
+    def bench(self):
+        sys.path.insert(0, os.path.join(project_root, 'benchmarks'))
+        import run_benchmarks
+        import synthetic
+        return run_benchmarks, synthetic
+    
+    def test_synthetic_corpus_is_valid_faq_data(self, bench):
+        """Generated corpora have the faqs.json shape and can be indexed"""
+        from utils.nlp_processor import FAQIndex
+        _, synthetic = bench
+        
+        faqs = synthetic.synthetic_faqs(120)
+        assert set(faqs) == set(synthetic.CATEGORIES)
+        assert sum(len(questions) for questions in faqs.values()) == 120
+        index = FAQIndex.from_faqs(faqs)
+        messages = synthetic.message_mix(faqs, 50, ['ORD-100001'])
+        assert len(messages) == 50
+        assert any(index.match(message) for message in messages)
+    
+    def test_measure_and_regression_check(self, bench):
+        """Results carry percentiles and slower p95s are flagged"""
+        run_benchmarks, _ = bench
+        
+        result = run_benchmarks.measure('noop', lambda item: None, range(100), faqs=10)
+        assert result['operations'] == 100
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99']
+        
+        baseline = {'results': [dict(result, latency_ms=dict(result['latency_ms'], p95=0.001))]}
+        slower = {'results': [dict(result, latency_ms=dict(result['latency_ms'], p95=0.002))]}
+        assert run_benchmarks.compare(slower, baseline, max_regression=20)
+        assert not run_benchmarks.compare(baseline, baseline, max_regression=20)
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file